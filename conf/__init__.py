@@ -23,6 +23,12 @@ and any user provided settings file.
 import copy
 import os
 import re
+import sys
+import time
+import types
+import hashlib
+import importlib
+import pickle
 import logging
 import pprint
 import ast
@@ -43,11 +49,182 @@ _EXTRA_TEST_PARAMS = ['TUNNEL_TYPE']
 #   #EVAL(2*#VMINDEX)
 _PARSE_PATTERN = r'(#[A-Z]+)(\(([^(),]+)(,([0-9]+))?\))?'
 
+# placeholder of #VMINDEX macro used inside compiled VM settings templates
+_VMINDEX_PLACEHOLDER = '\x00'
+
+# name of the module shared by all configuration files loaded by load_from_file()
+_CONF_MODULE = 'custom_settings'
+
+# directory with precompiled configuration, see Settings.load_from_dir()
+_CONF_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vsperf')
+
+# configuration files, which import conf module, depend on runtime values
+# of settings and thus they can't be cached
+_CONF_IMPORT_PATTERN = re.compile(rb'^\s*(from|import)\s+conf\b', re.MULTILINE)
+
+# marks settings items, which didn't exist before they were set inside a layer
+_MISSING = object()
+
+def _copy_value(value):
+    """Return a copy of resolved settings value with fresh containers
+
+    Values resolved by ``Settings._eval_param`` consist of new lists and
+    dicts, so callers are used to modify them freely. Cached values must
+    be protected from such modifications, but leaf objects are shared
+    exactly as they were before the cache was introduced.
+    """
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    elif isinstance(value, dict):
+        return {key: _copy_value(item) for (key, item) in value.items()}
+    return value
+
+class _ConfPickler(pickle.Pickler):
+    """Pickler, which stores modules imported by .conf files by their name
+    """
+    def persistent_id(self, obj):
+        if isinstance(obj, types.ModuleType):
+            return obj.__name__
+        return None
+
+class _ConfUnpickler(pickle.Unpickler):
+    """Unpickler, which imports modules stored by _ConfPickler
+    """
+    def persistent_load(self, pid):
+        return importlib.import_module(pid)
+
+class _VmSettingsTemplate(object):
+    """Value of VM settings item with configuration macros compiled
+    for repeated expansion.
+
+    Template is parsed only once and it can be expanded for any VM index.
+    Expansion gives the same result as a sequential replacement of #VMINDEX
+    macro followed by replacement of all other macros.
+    """
+    def __init__(self, value, key):
+        """Compile given string ``value`` of settings item ``key``
+        """
+        self._parts = []
+        value = value.replace('#VMINDEX', _VMINDEX_PLACEHOLDER)
+        pos = 0
+        for match in re.finditer(_PARSE_PATTERN, value):
+            macro, _, param, _, step = match.groups()
+            if macro not in ('#EVAL', '#MAC', '#IP'):
+                raise RuntimeError('Unknown configuration macro {} in {}'.format(macro, key))
+            self._add_text(value[pos:match.start()])
+            pos = match.end()
+            multi = int(step) if step and int(step) else 1
+            if _VMINDEX_PLACEHOLDER in param or macro == '#EVAL':
+                base = None
+            elif macro == '#MAC':
+                base = netaddr.EUI(param).value
+            else:
+                base = netaddr.IPAddress(param).value
+            self._parts.append((macro, param, base, multi))
+        self._add_text(value[pos:])
+
+    def _add_text(self, text):
+        """Append plain text part of the template
+        """
+        if text:
+            self._parts.append((None, text, None, None))
+
+    def __call__(self, vmindex):
+        """Return template expanded for VM with given index
+        """
+        result = []
+        index_str = str(vmindex)
+        for (macro, param, base, multi) in self._parts:
+            param = param.replace(_VMINDEX_PLACEHOLDER, index_str)
+            if macro is None:
+                result.append(param)
+            elif macro == '#EVAL':
+                # pylint: disable=eval-used
+                result.append(str(eval(param)))
+            elif macro == '#MAC':
+                if base is None:
+                    base = netaddr.EUI(param).value
+                mac = netaddr.EUI(base + vmindex * multi)
+                mac.dialect = netaddr.mac_unix_expanded
+                result.append(str(mac))
+            else:
+                if base is None:
+                    base = netaddr.IPAddress(param).value
+                result.append(str(netaddr.IPAddress(base + vmindex * multi)))
+        return ''.join(result)
+
+def _get_conf_cache_key(file_paths):
+    """Return a digest of given .conf files or None if they can't be cached
+
+    Digest covers python version, file paths, their modification times
+    and their content.
+    """
+    digest = hashlib.sha256(sys.version.encode())
+    for path in file_paths:
+        with open(path, 'rb') as conf_file:
+            content = conf_file.read()
+        if _CONF_IMPORT_PATTERN.search(content):
+            return None
+        digest.update(os.path.realpath(path).encode())
+        digest.update(str(os.stat(path).st_mtime_ns).encode())
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+def _get_conf_cache_file(dir_path):
+    """Return path to the cache file of given configuration directory
+    """
+    name = hashlib.sha256(os.path.realpath(dir_path).encode()).hexdigest()
+    return os.path.join(_CONF_CACHE_DIR, name + '.pickle')
+
+def _read_conf_cache(dir_path, key):
+    """Return cached namespace of configuration directory and time needed
+       to load it from .conf files. (None, None) is returned if cache is
+       not available or it is outdated.
+    """
+    try:
+        with open(_get_conf_cache_file(dir_path), 'rb') as cache_file:
+            cache = _ConfUnpickler(cache_file).load()
+        if cache['key'] == key:
+            return (cache['namespace'], cache['load_time'])
+    except FileNotFoundError:
+        pass
+    # pylint: disable=broad-except
+    except Exception as ex:
+        _LOGGER.debug('Configuration cache of %s can\'t be read: %s', dir_path, ex)
+    return (None, None)
+
+def _write_conf_cache(dir_path, key, namespace, load_time):
+    """Store namespace of configuration directory into the cache
+    """
+    cache_path = _get_conf_cache_file(dir_path)
+    tmp_path = '{}.{}'.format(cache_path, os.getpid())
+    try:
+        os.makedirs(_CONF_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as cache_file:
+            _ConfPickler(cache_file, pickle.HIGHEST_PROTOCOL).dump(
+                {'key': key, 'namespace': namespace, 'load_time': load_time})
+        os.replace(tmp_path, cache_path)
+    # pylint: disable=broad-except
+    except Exception as ex:
+        _LOGGER.debug('Configuration cache of %s can\'t be written: %s', dir_path, ex)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 class Settings(object):
     """Holding class for settings.
     """
+    # cache and layer related attributes are kept outside of __dict__, so they
+    # are not treated as configuration options
+    __slots__ = ('__dict__', '_cache', '_cache_stats', '_layers', '_conf_stats',
+                 '_vm_templates', '_vm_expansions')
+
     def __init__(self):
-        pass
+        object.__setattr__(self, '_cache', {})
+        object.__setattr__(self, '_cache_stats', {'hits': 0, 'misses': 0})
+        object.__setattr__(self, '_layers', [])
+        object.__setattr__(self, '_conf_stats', [])
+        object.__setattr__(self, '_vm_templates', {})
+        object.__setattr__(self, '_vm_expansions', {})
 
     def _eval_param(self, param):
         # pylint: disable=invalid-name
@@ -83,31 +260,105 @@ class Settings(object):
         else:
             return param
 
+    def _resolve_value(self, attr):
+        """Return a value of settings item with applied TEST_PARAMS
+           and expanded macros
+        """
+        master_value = getattr(self, attr)
+        # Check if parameter value was modified by CLI option
+        cli_value = self._get_test_params().get(attr, None)
+        if cli_value is not None:
+            # TRAFFIC dictionary is not overridden by CLI option
+            # but only updated by specified values
+            if attr == 'TRAFFIC':
+                tmp_value = copy.deepcopy(master_value)
+                tmp_value = merge_spec(tmp_value, cli_value)
+                return self._eval_param(tmp_value)
+            else:
+                return self._eval_param(cli_value)
+        else:
+            return self._eval_param(master_value)
+
+    def _get_test_params(self):
+        """Return TEST_PARAMS without invalidation of the cache
+        """
+        return self.__dict__.get('TEST_PARAMS', None) or {}
+
     def getValue(self, attr):
         """Return a settings item value
+
+        Resolved values are cached until any settings item is modified.
         """
         if attr in self.__dict__:
             if attr == 'TEST_PARAMS':
+                # caller gets a reference to TEST_PARAMS and it can be
+                # modified in place, so cached values can't be trusted anymore
+                self._save_to_layer(attr, modify=True)
+                self.invalidate_cache()
                 return getattr(self, attr)
             else:
-                master_value = getattr(self, attr)
-                # Check if parameter value was modified by CLI option
-                cli_value = get_test_param(attr, None)
-                if cli_value is not None:
-                    # TRAFFIC dictionary is not overridden by CLI option
-                    # but only updated by specified values
-                    if attr == 'TRAFFIC':
-                        tmp_value = copy.deepcopy(master_value)
-                        tmp_value = merge_spec(tmp_value, cli_value)
-                        return self._eval_param(tmp_value)
-                    else:
-                        return self._eval_param(cli_value)
-                else:
-                    return self._eval_param(master_value)
+                try:
+                    value = self._cache[attr]
+                    self._cache_stats['hits'] += 1
+                except KeyError:
+                    self._cache_stats['misses'] += 1
+                    value = self._resolve_value(attr)
+                    self._cache[attr] = value
+                return _copy_value(value)
         else:
             raise AttributeError("%r object has no attribute %r" %
                                  (self.__class__, attr))
 
+    def invalidate_cache(self):
+        """Drop all cached values of settings items
+        """
+        self._cache.clear()
+
+    def get_cache_stats(self):
+        """Return number of cache hits and misses of getValue() calls
+        """
+        return dict(self._cache_stats)
+
+    def push_layer(self):
+        """Start a new settings layer
+
+        All settings items modified after the call can be reverted
+        to their previous values by ``pop_layer()``. Layers can be nested.
+        """
+        self._layers.append({})
+
+    def pop_layer(self):
+        """Drop the topmost settings layer
+
+        Settings items modified since the matching ``push_layer()`` call
+        are restored and items created since then are removed.
+        """
+        layer = self._layers.pop()
+        for (key, value) in layer.items():
+            if value is _MISSING:
+                self.__dict__.pop(key, None)
+            else:
+                self.__dict__[key] = value
+        self.invalidate_cache()
+
+    def _save_to_layer(self, attr, modify=False):
+        """Remember original value of settings item in the topmost layer
+
+        Only the first modification of given item inside the layer is
+        recorded. Replaced values are kept by reference. In case that
+        item is going to be modified in place, i.e. ``modify`` is True,
+        then a copy of its value is stored.
+        """
+        if not self._layers or attr in self._layers[-1]:
+            return
+        if attr not in self.__dict__:
+            value = _MISSING
+        elif modify:
+            value = copy.deepcopy(self.__dict__[attr])
+        else:
+            value = self.__dict__[attr]
+        self._layers[-1][attr] = value
+
     def hasValue(self, attr):
         """Return true if key exists
         """
@@ -123,33 +374,39 @@ class Settings(object):
             return
 
         # we can assume all uppercase keys are valid settings
+        self._save_to_layer(name)
         super(Settings, self).__setattr__(name, value)
+        self.invalidate_cache()
 
     def setValue(self, name, value):
         """Set a value
         """
         if name is not None and value is not None:
+            self._save_to_layer(name)
             super(Settings, self).__setattr__(name, value)
+            self.invalidate_cache()
 
     def resetValue(self, attr):
         """If parameter was overridden by TEST_PARAMS, then it will
            be set to its original value.
         """
         if attr in self.__dict__['TEST_PARAMS']:
+            self._save_to_layer('TEST_PARAMS', modify=True)
             self.__dict__['TEST_PARAMS'].pop(attr)
+            self.invalidate_cache()
 
     def load_from_file(self, path):
         """Update ``settings`` with values found in module at ``path``.
         """
         import imp
 
-        custom_settings = imp.load_source('custom_settings', path)
+        custom_settings = imp.load_source(_CONF_MODULE, path)
 
         for key in dir(custom_settings):
             if getattr(custom_settings, key) is not None:
                 setattr(self, key, getattr(custom_settings, key))
 
-    def load_from_dir(self, dir_path):
+    def load_from_dir(self, dir_path, use_cache=False):
         """Update ``settings`` with contents of the .conf files at ``path``.
 
         Each file must be named Nfilename.conf, where N is a single or
@@ -157,8 +414,15 @@ class Settings(object):
         N - so if a configuration item exists in more that one file the setting
         in the file with the largest value of N takes precedence.
 
+        If ``use_cache`` is True, then evaluated configuration is stored
+        into the cache and it is reused until any of .conf files is modified.
+        As all .conf files share one namespace, only the directory loaded
+        first can be cached. Directories with .conf files importing conf
+        module are never cached.
+
         :param dir_path: The full path to the dir from which to load the .conf
             files.
+        :param use_cache: Use precompiled configuration cache if possible.
 
         :returns: None
         """
@@ -184,9 +448,49 @@ class Settings(object):
         # sort ascending on the leading digits and afla (e.g. 03_, 05a_)
         file_paths.sort(key=get_prefix)
 
-        # load settings from each file in turn
-        for filepath in file_paths:
-            self.load_from_file(filepath)
+        start = time.time()
+        cache_key = None
+        if use_cache and _CONF_MODULE not in sys.modules:
+            cache_key = _get_conf_cache_key(file_paths)
+
+        namespace, full_load_time = (None, None)
+        if cache_key:
+            namespace, full_load_time = _read_conf_cache(dir_path, cache_key)
+
+        if namespace is not None:
+            # restore shared namespace, so it can be used by other .conf files
+            custom_settings = types.ModuleType(_CONF_MODULE)
+            custom_settings.__dict__.update(namespace)
+            sys.modules[_CONF_MODULE] = custom_settings
+            for key in namespace:
+                if namespace[key] is not None:
+                    setattr(self, key, namespace[key])
+        else:
+            # load settings from each file in turn
+            for filepath in file_paths:
+                self.load_from_file(filepath)
+
+        load_time = time.time() - start
+        if namespace is not None:
+            saved_time = full_load_time - load_time
+        else:
+            saved_time = 0
+            if cache_key and file_paths:
+                _write_conf_cache(dir_path, cache_key,
+                                  {key: value for (key, value)
+                                   in vars(sys.modules[_CONF_MODULE]).items()
+                                   if not key.startswith('__')},
+                                  load_time)
+
+        self._conf_stats.append({'path': dir_path,
+                                 'cached': namespace is not None,
+                                 'load_time': load_time,
+                                 'saved_time': saved_time})
+
+    def get_conf_load_stats(self):
+        """Return list with details about load of configuration directories
+        """
+        return copy.deepcopy(self._conf_stats)
 
     def load_from_dict(self, conf):
         """
@@ -198,6 +502,7 @@ class Settings(object):
             if conf[key] is not None:
                 if isinstance(conf[key], dict):
                     # recursively update dict items, e.g. TEST_PARAMS
+                    self._save_to_layer(key.upper(), modify=True)
                     setattr(self, key.upper(),
                             merge_spec(getattr(self, key.upper()), conf[key]))
                 else:
@@ -210,7 +515,10 @@ class Settings(object):
         Method will drop all configuration options and restore their
         values from conf dictionary
         """
+        for key in set(self.__dict__) | set(conf):
+            self._save_to_layer(key)
         self.__dict__.clear()
+        self.invalidate_cache()
         tmp_conf = copy.deepcopy(conf)
         for key in tmp_conf:
             self.setValue(key, tmp_conf[key])
@@ -274,33 +582,15 @@ class Settings(object):
             scalar = False
             master_value = tmp_value[0]
 
+        self._save_to_layer(key, modify=True)
         master_value_str = str(master_value)
         if master_value_str.find('#') >= 0:
-            self.__dict__[key] = []
-            for vmindex in range(vm_number):
-                value = master_value_str.replace('#VMINDEX', str(vmindex))
-                for macro, args, param, _, step in re.findall(_PARSE_PATTERN, value):
-                    multi = int(step) if step and int(step) else 1
-                    if macro == '#EVAL':
-                        # pylint: disable=eval-used
-                        tmp_result = str(eval(param))
-                    elif macro == '#MAC':
-                        mac_value = netaddr.EUI(param).value
-                        mac = netaddr.EUI(mac_value + vmindex * multi)
-                        mac.dialect = netaddr.mac_unix_expanded
-                        tmp_result = str(mac)
-                    elif macro == '#IP':
-                        ip_value = netaddr.IPAddress(param).value
-                        tmp_result = str(netaddr.IPAddress(ip_value + vmindex * multi))
-                    else:
-                        raise RuntimeError('Unknown configuration macro {} in {}'.format(macro, key))
-
-                    value = value.replace("{}{}".format(macro, args), tmp_result)
-
-                # retype value to original type if needed
-                if not isinstance(master_value, str):
-                    value = ast.literal_eval(value)
-                self.__dict__[key].append(value)
+            expansion = self._vm_expansions.get((key, vm_number))
+            if not expansion or expansion[0] != master_value_str:
+                expansion = (master_value_str,
+                             self._get_vm_expansion(key, master_value, vm_number))
+                self._vm_expansions[(key, vm_number)] = expansion
+            self.__dict__[key] = _copy_value(expansion[1])
         else:
             for vmindex in range(len(tmp_value), vm_number):
                 self.__dict__[key].append(master_value)
@@ -308,8 +598,30 @@ class Settings(object):
         if scalar:
             self.__dict__[key] = self.__dict__[key][0]
 
+        self.invalidate_cache()
+
         _LOGGER.debug("Expanding option: %s = %s", key, self.__dict__[key])
 
+    def _get_vm_expansion(self, key, master_value, vm_number):
+        """
+        Return list of ``master_value`` expansions for given number of VMs.
+        Macros are compiled into a template only once per unique value.
+        """
+        master_value_str = str(master_value)
+        template = self._vm_templates.get(master_value_str)
+        if not template:
+            template = _VmSettingsTemplate(master_value_str, key)
+            self._vm_templates[master_value_str] = template
+
+        result = []
+        for vmindex in range(vm_number):
+            value = template(vmindex)
+            # retype value to original type if needed
+            if not isinstance(master_value, str):
+                value = ast.literal_eval(value)
+            result.append(value)
+        return result
+
     def __str__(self):
         """Provide settings as a human-readable string.
 
@@ -357,8 +669,8 @@ def get_test_param(key, default=None):
 
     :returns: Value for ``key`` if found, else ``default``.
     """
-    test_params = settings.getValue('TEST_PARAMS')
-    return test_params.get(key, default) if test_params else default
+    # pylint: disable=protected-access
+    return settings._get_test_params().get(key, default)
 
 def merge_spec(orig, new):
     """Merges ``new`` dict with ``orig`` dict, and returns orig.
@@ -68,6 +68,26 @@ class ResultsConstants(object):
     TEST_RUN_TIME = "test_execution_time"
     TEST_START_TIME = "start_time"
     TEST_STOP_TIME = "stop_time"
+    # duration of vSwitch startup phase in seconds; {} is replaced by phase name
+    VSWITCH_STARTUP_TIME = "vswitch_startup_{}_time"
+
+    # RFC2544 throughput search driven by VSPERF
+    SEARCH_TRIALS = "search_trials"
+    SEARCH_TRIAL_TIME = "search_trial_time"
+    SEARCH_TIME = "search_time"
+    SEARCH_TIME_SAVED = "search_time_saved"
+    SEARCH_HISTORY_PERCENT = "search_history_percent"
+
+    # NDR and PDR search; {} is replaced by 'ndr' or 'pdr'
+    NDRPDR_RX_FPS = "{}_rx_fps"
+    NDRPDR_LOWER_PERCENT = "{}_lower_bound_percent"
+    NDRPDR_UPPER_PERCENT = "{}_upper_bound_percent"
+    NDRPDR_TRIALS = "{}_trials"
+
+    # PMD rxq layout search
+    PMD_RXQ_LAYOUT = "pmd_rxq_layout"
+    PMD_RXQ_MAPPING = "pmd_rxq_mapping"
+    PMD_RXQ_LAYOUT_RX_FPS = "pmd_rxq_layout_{}_rx_fps"
 
     # files with traffic capture
     CAPTURE_TX = "capture_tx"
@@ -0,0 +1,92 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""History of RFC2544 throughput found by previous test runs
+
+Throughput found by the search driven by VSPERF is appended to a local
+index, i.e. a file with one JSON record per line. Records are identified
+by a key made of testcase name, deployment, vswitch version and
+TEST_PARAMS together with frame size. The most recent matching record is
+used to warm start the search of the next run of the same testcase.
+"""
+
+import json
+import logging
+import os
+import time
+
+from conf import settings
+
+_LOGGER = logging.getLogger(__name__)
+
+def get_key(testcase, deployment, vswitch_version, test_params):
+    """Return key identifying throughput of testcase in the history
+
+    :param testcase: Name of the testcase
+    :param deployment: Name of the deployment
+    :param vswitch_version: Version of the vswitch as string
+    :param test_params: Dictionary with TEST_PARAMS of the testcase
+    """
+    return json.dumps({'testcase': testcase, 'deployment': deployment,
+                       'vswitch_version': vswitch_version, 'test_params': test_params},
+                      sort_keys=True, default=str)
+
+def get_index_file():
+    """Return path to the index configured by TRAFFICGEN_RFC2544_SEARCH_HISTORY_INDEX
+    """
+    return settings.getValue('TRAFFICGEN_RFC2544_SEARCH_HISTORY_INDEX') or \
+        os.path.join(settings.getValue('LOG_DIR'), 'vsperf_search_history.json')
+
+class SearchHistory(object):
+    """Index of throughput found by previous test runs
+    """
+    def __init__(self, index_file=None):
+        """
+        :param index_file: Path to the index; configured index by default
+        """
+        self._index_file = index_file or get_index_file()
+
+    def lookup(self, key, framesize):
+        """Return the most recent throughput of given key and frame size
+
+        :returns: Rate in % of line rate or None if it is not known
+        """
+        rate = None
+        try:
+            with open(self._index_file) as index:
+                for line in index:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('key') == key and record.get('framesize') == str(framesize):
+                        rate = record.get('rate')
+        except IOError:
+            return None
+        return rate
+
+    def record(self, key, framesize, rate, result):
+        """Append throughput of given key and frame size to the index
+
+        :param rate: Rate in % of line rate
+        :param result: Dictionary with results of the trial at given rate
+        """
+        record = {'key': key, 'framesize': str(framesize), 'rate': rate,
+                  'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'result': result}
+        try:
+            with open(self._index_file, 'a') as index:
+                index.write(json.dumps(record, default=str) + '\n')
+        except IOError as ex:
+            _LOGGER.warning('Throughput can not be stored to search history %s: %s',
+                            self._index_file, ex)
@@ -0,0 +1,613 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""RFC2544 throughput search independent of traffic generator
+
+The search drives a traffic generator by a single primitive, i.e. a trial
+sending traffic at given frame rate (in % of line rate) for given number
+of seconds. The rate of the next trial is chosen by a search strategy:
+
+* ``binary``: bisection of the interval between the highest passing and
+  the lowest failing rate
+* ``exponential``: steps down from the maximum rate by exponentially
+  growing steps until the first trial passes, then bisection; it is
+  efficient if throughput is close to the line rate
+* ``secant``: estimation of the rate with acceptable frame loss from the
+  loss curve of failing trials, safeguarded by bisection
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from core.results.results_constants import ResultsConstants
+
+_LOGGER = logging.getLogger(__name__)
+
+# preamble, start of frame delimiter and interframe gap in bytes
+_FRAME_OVERHEAD = 20
+
+def _to_float(value):
+    """Return value reported by traffic generator as float or None
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class Trial(object):
+    """Result of a single trial
+    """
+    def __init__(self, index, rate, duration, result, elapsed):
+        """Evaluate trial results
+
+        :param index: Index of the trial within the search
+        :param rate: Frame rate in % of line rate
+        :param duration: Trial duration in seconds
+        :param result: Results of continuous traffic as returned
+            by traffic generator
+        :param elapsed: Wall time of the trial in seconds
+        """
+        self.index = index
+        self.rate = rate
+        self.duration = duration
+        self.result = result
+        self.elapsed = elapsed
+        self.loss = 100.0
+        self.received = False
+
+        tx_frames = _to_float(result.get(ResultsConstants.TX_FRAMES))
+        rx_frames = _to_float(result.get(ResultsConstants.RX_FRAMES))
+        tx_fps = _to_float(result.get(ResultsConstants.TX_RATE_FPS))
+        rx_fps = _to_float(result.get(ResultsConstants.THROUGHPUT_RX_FPS))
+        loss = _to_float(result.get(ResultsConstants.FRAME_LOSS_PERCENT))
+        # frame counters are the most precise source of frame loss
+        if tx_frames and rx_frames is not None:
+            self.loss = max(0.0, (tx_frames - rx_frames) * 100.0 / tx_frames)
+            self.received = rx_frames > 0
+        elif tx_fps and rx_fps is not None:
+            self.loss = max(0.0, (tx_fps - rx_fps) * 100.0 / tx_fps)
+            self.received = rx_fps > 0
+        elif loss is not None:
+            self.loss = loss
+            self.received = loss < 100.0
+
+    def passed(self, lossrate):
+        """Return True if frame loss doesn't exceed ``lossrate`` percentage
+        """
+        return self.loss <= lossrate
+
+class ISearchStrategy(object):
+    """Interface of throughput search strategies
+    """
+    def next_rate(self, search):
+        """Return frame rate of the next trial
+
+        :param search: ThroughputSearch instance with the current bracket,
+            i.e. ``lower`` and ``upper`` rates, and the list of ``trials``
+        """
+        raise NotImplementedError('Please call an implementation.')
+
+    def reset(self):
+        """Forget state of the previous search
+        """
+        pass
+
+class BinarySearch(ISearchStrategy):
+    """Bisection of the search bracket
+    """
+    def next_rate(self, search):
+        """See ISearchStrategy for description
+        """
+        return (search.lower + search.upper) / 2
+
+class ExponentialSearch(ISearchStrategy):
+    """Exponentially growing steps down from the maximum rate followed
+    by bisection
+    """
+    def __init__(self, step=1.0):
+        """
+        :param step: The first step in % of line rate
+        """
+        self._step = step
+
+    def next_rate(self, search):
+        """See ISearchStrategy for description
+        """
+        if not any(trial.passed(search.lossrate) for trial in search.trials):
+            rate = search.upper - self._step * 2 ** (len(search.trials) - 1)
+            if rate > search.lower:
+                return rate
+        return (search.lower + search.upper) / 2
+
+class SecantSearch(ISearchStrategy):
+    """Interpolation of the loss curve safeguarded by bisection
+
+    A failing trial estimates forwarding capacity of the DUT, i.e.
+    ``rate * (1 - loss)``, and two failing trials define a secant of the
+    loss curve; the higher of both estimates is used. If the estimated rate
+    passes, the rate just above it is probed once, which finishes the search
+    for DUTs with a sharp loss curve. Rates are projected towards the middle
+    of the bracket like in the ITP method, so in the worst case the search
+    needs only a few trials more than bisection.
+    """
+    def __init__(self, slack=1):
+        """
+        :param slack: Number of interpolation steps allowed above bisection
+        """
+        self._slack = slack
+        self._max_steps = None
+        self._steps = 0
+        self._estimate_rate = None
+        self._estimated = False
+        self._probed = False
+
+    def reset(self):
+        """See ISearchStrategy for description
+        """
+        self.__init__(self._slack)
+
+    def next_rate(self, search):
+        """See ISearchStrategy for description
+        """
+        width = search.upper - search.lower
+        middle = (search.lower + search.upper) / 2
+        margin = min(search.threshold, width) / 2
+        (estimated, self._estimated) = (self._estimated, False)
+        if estimated and not self._probed and search.trials[-1].passed(search.lossrate):
+            self._probed = True
+            return min(search.lower + margin, search.upper - margin)
+
+        if self._max_steps is None:
+            self._max_steps = math.ceil(math.log2(max(width / search.threshold, 1))) + self._slack
+        radius = max(0.0, search.threshold / 2 * 2 ** (self._max_steps - self._steps) - width / 2)
+        self._steps += 1
+        estimate = self.estimate(search)
+        if estimate is None or estimate == self._estimate_rate or \
+                estimate <= search.lower + margin:
+            return middle
+        (self._estimate_rate, self._estimated) = (estimate, True)
+        # trials are kept inside of the bracket, so it always shrinks
+        return min(max(estimate, middle - radius, search.lower + margin),
+                   middle + radius, search.upper - margin)
+
+    @staticmethod
+    def estimate(search):
+        """Return rate with acceptable frame loss estimated from failing trials
+        """
+        fails = sorted((trial for trial in search.trials
+                        if not trial.passed(search.lossrate) and trial.received),
+                       key=lambda trial: trial.rate)
+        if not fails:
+            return None
+        first = fails[0]
+        estimate = first.rate * (100.0 - first.loss) / (100.0 - search.lossrate)
+        second = fails[1] if len(fails) > 1 else None
+        if second and second.rate > first.rate and second.loss > first.loss:
+            slope = (second.loss - first.loss) / (second.rate - first.rate)
+            estimate = max(estimate, first.rate - (first.loss - search.lossrate) / slope)
+        return estimate
+
+STRATEGIES = {
+    'binary': BinarySearch,
+    'exponential': ExponentialSearch,
+    'secant': SecantSearch,
+}
+
+def get_strategy(name):
+    """Return instance of search strategy with given name
+    """
+    if name not in STRATEGIES:
+        raise RuntimeError('Unknown throughput search strategy {}; supported strategies '
+                           'are: {}'.format(name, ', '.join(sorted(STRATEGIES))))
+    return STRATEGIES[name]()
+
+def empty_result():
+    """Return throughput results of a search without any passing trial
+    """
+    result = OrderedDict()
+    for key in (ResultsConstants.TX_RATE_FPS, ResultsConstants.THROUGHPUT_RX_FPS,
+                ResultsConstants.TX_RATE_MBPS, ResultsConstants.THROUGHPUT_RX_MBPS,
+                ResultsConstants.TX_RATE_PERCENT, ResultsConstants.THROUGHPUT_RX_PERCENT):
+        result[key] = 0
+    return result
+
+def seed_bracket(framesize, results, max_rate=100.0):
+    """Return expected bracket of throughput of given frame size
+
+    Throughput of other frame sizes limits throughput of given frame size,
+    because frame rate usually decreases with frame size, while bit rate
+    including Ethernet overhead increases. So throughput of a smaller frame
+    size is a lower bound and the same frame rate converted to % of line
+    rate of given frame size is an upper bound; a larger frame size gives
+    bounds in the opposite way.
+
+    :param framesize: Frame size in bytes
+    :param results: List of tuples (framesize, rate) with throughput of
+        other frame sizes in % of line rate
+    :param max_rate: Maximum rate in % of line rate
+
+    :returns: Tuple (lower, upper) or None if results can't be used
+    """
+    lower = 0.0
+    upper = max_rate
+    for (size, rate) in results:
+        if size <= 0 or size == framesize:
+            continue
+        same_fps = rate * (framesize + _FRAME_OVERHEAD) / (size + _FRAME_OVERHEAD)
+        if size < framesize:
+            (lower, upper) = (max(lower, rate), min(upper, same_fps))
+        else:
+            (lower, upper) = (max(lower, same_fps), min(upper, rate))
+    if lower > upper or (lower, upper) == (0.0, max_rate):
+        return None
+    return (lower, upper)
+
+class ThroughputSearch(object):
+    """Search for the highest frame rate with acceptable frame loss
+
+    If ``min_duration`` is set, durations of trials ramp up geometrically
+    from ``min_duration`` to the full duration as the bracket narrows, and
+    the final candidate is confirmed by a trial of full duration. If the
+    confirmation fails, short trials are not trusted anymore, so the rest
+    of the search uses full duration and the bracket is widened downwards
+    by exponentially growing steps. The search can also start from an
+    expected bracket, which is widened in the same way if it doesn't hold.
+    """
+    def __init__(self, trial, lossrate, threshold, strategy=None, max_trials=0, max_repeat=0,
+                 min_duration=0):
+        """Initialize search
+
+        :param trial: Function ``trial(rate, duration)`` sending traffic
+            at given rate in % of line rate for given number of seconds;
+            it returns dictionary with results of continuous traffic
+        :param lossrate: Acceptable frame loss percentage
+        :param threshold: The search ends when difference between passing
+            and failing rates is not higher than threshold
+        :param strategy: ISearchStrategy instance; binary search by default
+        :param max_trials: Maximum number of trials; 0 for unlimited
+        :param max_repeat: Number of repetitions of a failing trial before
+            the failure is accepted; it filters out sporadic frame loss
+        :param min_duration: Duration of the first trial in seconds; 0
+            disables the duration ramp
+        """
+        self._trial = trial
+        self.lossrate = lossrate
+        self.threshold = threshold
+        self.strategy = strategy or BinarySearch()
+        self._max_trials = max_trials
+        self._max_repeat = max_repeat
+        self._min_duration = min_duration
+        self._duration = 0
+        self._width = 0.0
+        self._ramp = False
+        self.trials = []
+        self.lower = 0.0
+        self.upper = 0.0
+        self.best = None
+        self.search_time = 0.0
+
+    @property
+    def trial_time(self):
+        """Sum of wall times of all trials in seconds
+        """
+        return sum(trial.elapsed for trial in self.trials)
+
+    @property
+    def time_saved(self):
+        """Seconds of traffic saved by trials shorter than full duration
+        """
+        return sum(self._duration - trial.duration for trial in self.trials)
+
+    def get_duration(self, duration, final=False):
+        """Return duration of the next trial
+
+        :param duration: Full trial duration in seconds
+        :param final: True for confirmation of the final candidate
+        """
+        if final or not self._ramp or self._min_duration >= duration:
+            return duration
+        width = self.upper - self.lower
+        if self._width <= self.threshold or width <= self.threshold:
+            progress = 1.0
+        else:
+            progress = max(0.0, math.log(self._width / width) /
+                           math.log(self._width / self.threshold))
+        ramp = self._min_duration * (duration / self._min_duration) ** progress
+        return max(self._min_duration, min(duration, int(round(ramp))))
+
+    def search(self, max_rate, duration, min_rate=0.0, initial_rate=None, bracket=None):
+        """Search for throughput
+
+        :param max_rate: Maximum rate in % of line rate
+        :param duration: Trial duration in seconds
+        :param min_rate: Minimum rate in % of line rate
+        :param initial_rate: Rate of the first trial; the upper bound by default
+        :param bracket: Tuple (lower, upper) with expected bounds of the
+            throughput; bounds are verified by trials and the bracket is
+            widened by exponentially growing steps if they don't hold
+
+        :returns: Trial with the highest passing rate or None if there
+            was no passing trial
+        """
+        start = time.time()
+        self.trials = []
+        self.lower = min_rate
+        self.upper = max_rate
+        self.best = None
+        self.strategy.reset()
+        self._duration = duration
+        self._width = max_rate - min_rate
+        self._ramp = bool(self._min_duration)
+        if bracket:
+            self.upper = max(min_rate, min(max_rate, bracket[1]))
+            self.lower = max(min_rate, min(self.upper, bracket[0]))
+        # True if the lower bound has passed a trial
+        verified = self.lower <= min_rate
+        # True if the lower bound has passed at full duration
+        confirmed = verified
+        # True if the upper bound has failed
+        bounded = self.upper >= max_rate
+        rate = self.upper if initial_rate is None else initial_rate
+        step = self.threshold
+        repeat = 0
+        while True:
+            if self._max_trials and len(self.trials) >= self._max_trials:
+                _LOGGER.warning('Throughput search has reached maximum number of trials %s',
+                                self._max_trials)
+                break
+            trial = self.run_trial(rate, self.get_duration(duration, final=rate == self.lower))
+            if not trial.received:
+                _LOGGER.error('No packets received. Test failed')
+                self.best = None
+                break
+            if trial.passed(self.lossrate):
+                repeat = 0
+                probe = not verified and rate == self.lower
+                verified = True
+                self.lower = rate
+                self.best = trial
+                confirmed = trial.duration >= duration
+                if rate >= self.upper and not bounded:
+                    # the upper bound doesn't hold, so the bracket is widened upwards
+                    self.upper = min(max_rate, rate + step)
+                    bounded = self.upper >= max_rate
+                    step *= 2
+                    rate = self.upper
+                    continue
+                if rate >= self.upper and confirmed:
+                    break
+                if probe and self.upper - rate > self.threshold:
+                    # throughput is often just above the newly verified lower bound
+                    rate += self.threshold / 2
+                    continue
+            elif repeat < self._max_repeat:
+                repeat += 1
+                continue
+            elif rate <= self.lower:
+                # the lower bound doesn't hold, so the bracket is widened downwards
+                repeat = 0
+                if self.best and self.best.rate == self.lower:
+                    # the final candidate has passed only shorter trials, so
+                    # the rest of the search uses full duration
+                    self._ramp = False
+                (self.upper, bounded) = (rate, True)
+                # forwarding capacity shown by the failing trial is tried first
+                capacity = rate * (100.0 - trial.loss) / (100.0 - self.lossrate)
+                self.lower = max(min_rate, min(rate - step, capacity))
+                self.best = None
+                verified = confirmed = self.lower <= min_rate
+                step *= 2
+            else:
+                repeat = 0
+                (self.upper, bounded) = (rate, True)
+            if self.upper - self.lower <= self.threshold:
+                if not bounded:
+                    rate = self.upper
+                elif confirmed:
+                    break
+                else:
+                    rate = self.lower
+            elif not verified:
+                # the lower bound is verified before the bracket is searched
+                rate = self.lower
+            else:
+                rate = self.strategy.next_rate(self)
+        self.search_time = time.time() - start
+        if self._min_duration:
+            _LOGGER.info('Throughput search has finished after %.3f s; %s s of traffic was saved '
+                         'by shorter trials', self.search_time, self.time_saved)
+        return self.best
+
+    def run_trial(self, rate, duration):
+        """Run a single trial and log its results
+        """
+        start = time.time()
+        result = self._trial(rate, duration)
+        trial = Trial(len(self.trials) + 1, rate, duration, result, time.time() - start)
+        self.trials.append(trial)
+        _LOGGER.debug('Trial: %s, frame rate: %.3f, duration: %s, throughput_rx_fps: %s, '
+                      'frame_loss_percent: %.3f', trial.index, rate, duration,
+                      result.get(ResultsConstants.THROUGHPUT_RX_FPS), trial.loss)
+        return trial
+
+class _Target(object):
+    """State of a single loss rate target of NdrPdrSearch
+
+    Attributes used by search strategies have the same meaning as
+    attributes of ThroughputSearch.
+    """
+    def __init__(self, name, lossrate, threshold, strategy):
+        self.name = name
+        self.lossrate = lossrate
+        self.threshold = threshold
+        self.strategy = strategy
+        self.trials = []
+        self.lower = None
+        self.upper = None
+        self.best = None
+        self.trial_count = 0
+
+    def update(self, trials, duration):
+        """Derive bounds of the target from all trials of given duration
+        """
+        self.trials = [trial for trial in trials if trial.duration == duration]
+        failing = [trial.rate for trial in self.trials if not trial.passed(self.lossrate)]
+        self.upper = min(failing) if failing else None
+        passing = [trial for trial in self.trials if trial.passed(self.lossrate) and
+                   (self.upper is None or trial.rate < self.upper)]
+        self.best = max(passing, key=lambda trial: trial.rate) if passing else None
+        self.lower = self.best.rate if self.best else None
+
+class NdrPdrSearch(object):
+    """Search for the highest frame rates of several loss rate targets at once
+
+    It is used to find e.g. no drop rate (NDR) and partial drop rate (PDR)
+    by a single search. Every trial is evaluated against all targets, so
+    targets share their trials. The search consists of phases with trial
+    duration growing geometrically from ``min_duration`` to the full
+    duration and with width of the bracket halved in every phase. Every
+    phase starts from bounds found by the previous phase, which are
+    widened if they don't hold for longer trials.
+    """
+    def __init__(self, trial, targets, threshold, strategy='binary', min_duration=1,
+                 phases=1, max_trials=0):
+        """Initialize search
+
+        :param trial: Function ``trial(rate, duration)``, see ThroughputSearch
+        :param targets: List of (name, lossrate) tuples with names of targets
+            and their acceptable frame loss percentages
+        :param threshold: Width of the bracket in the final phase
+        :param strategy: Name of the search strategy used inside of brackets
+        :param min_duration: Trial duration in the first phase in seconds
+        :param phases: Number of search phases
+        :param max_trials: Maximum number of trials; 0 for unlimited
+        """
+        self._trial = trial
+        names = [name for (name, _) in targets]
+        if len(set(names)) != len(names):
+            raise RuntimeError('Names of throughput search targets must be unique: '
+                               '{}'.format(names))
+        # targets with higher loss rate are searched first, so their trials
+        # bound the search of targets with lower loss rate
+        self._targets = sorted(targets, key=lambda target: target[1], reverse=True)
+        self.threshold = threshold
+        self._strategy = strategy
+        self._min_duration = min_duration
+        self._phases = phases
+        self._max_trials = max_trials
+        self.trials = []
+
+    @property
+    def trial_time(self):
+        """Sum of wall times of all trials in seconds
+        """
+        return sum(trial.elapsed for trial in self.trials)
+
+    def get_phases(self, duration):
+        """Return list of (duration, threshold) tuples of search phases
+        """
+        if self._phases < 2 or self._min_duration >= duration:
+            return [(duration, self.threshold)]
+        phases = []
+        for phase in range(self._phases):
+            phase_duration = int(round(self._min_duration * (duration / self._min_duration) **
+                                       (phase / (self._phases - 1))))
+            threshold = self.threshold * 2 ** (self._phases - 1 - phase)
+            if phases and phases[-1][0] == phase_duration:
+                phases[-1] = (phase_duration, threshold)
+            else:
+                phases.append((phase_duration, threshold))
+        return phases
+
+    def search(self, max_rate, duration):
+        """Search for throughput of all loss rate targets
+
+        :param max_rate: Maximum rate in % of line rate
+        :param duration: Trial duration of the final phase in seconds
+
+        :returns: Dictionary of targets indexed by name; every target
+            has attributes ``lower`` and ``upper`` with bounds of the
+            throughput, ``best`` with the trial at the lower bound and
+            ``trial_count`` with the number of trials run for the target
+        """
+        self.trials = []
+        targets = [_Target(name, lossrate, self.threshold, get_strategy(self._strategy))
+                   for (name, lossrate) in self._targets]
+        for (phase_duration, threshold) in self.get_phases(duration):
+            _LOGGER.debug('Search phase with trial duration %s and threshold %s',
+                          phase_duration, threshold)
+            for target in targets:
+                if not self._search_target(target, max_rate, phase_duration, threshold):
+                    return {target.name: target for target in targets}
+        return {target.name: target for target in targets}
+
+    def _search_target(self, target, max_rate, duration, threshold):
+        """Narrow bounds of the target for trials of given duration
+
+        :returns: False if the search can't continue
+        """
+        (hint_lower, hint_upper) = (target.lower, target.upper)
+        target.threshold = threshold
+        target.strategy.reset()
+        # bounds, which don't hold for longer trials, are widened by steps
+        # growing from width of the previous phase
+        step = threshold
+        if hint_lower is not None and hint_upper is not None:
+            step = max(step, hint_upper - hint_lower)
+        while True:
+            target.update(self.trials, duration)
+            (lower, upper) = (target.lower, target.upper)
+            if lower is not None and (upper - lower <= threshold if upper is not None
+                                      else lower >= max_rate):
+                return True
+            if self._max_trials and len(self.trials) >= self._max_trials:
+                _LOGGER.warning('Throughput search has reached maximum number of trials %s',
+                                self._max_trials)
+                return False
+            hints = [hint for hint in (hint_lower, hint_upper) if hint is not None and
+                     hint <= max_rate and (lower is None or hint > lower) and
+                     (upper is None or hint < upper) and
+                     hint not in [trial.rate for trial in target.trials]]
+            if hints:
+                # bounds of the previous phase are verified first
+                rate = hints[0]
+            elif lower is None and upper is None:
+                rate = max_rate
+            elif lower is None:
+                if upper <= threshold:
+                    _LOGGER.error('No rate with frame loss %s%% was found', target.lossrate)
+                    return False
+                # all trials have failed, so step down; [0, upper] is bisected
+                # if the step gets below zero and lower rate estimated from
+                # failing trials is preferred
+                rate = upper - step if upper - step > 0 else upper / 2
+                estimate = SecantSearch.estimate(target)
+                if estimate is not None and 0 < estimate < rate:
+                    rate = estimate
+                step *= 2
+            elif upper is None:
+                # all trials have passed, so step up
+                rate = min(max_rate, lower + step)
+                step *= 2
+            else:
+                rate = target.strategy.next_rate(target)
+            trial = self.run_trial(rate, duration)
+            target.trial_count += 1
+            if not trial.received:
+                _LOGGER.error('No packets received. Test failed')
+                return False
+
+    run_trial = ThroughputSearch.run_trial
@@ -15,6 +15,7 @@
 """Base class for traffic controllers
 """
 
+import copy
 import logging
 import os
 import time
@@ -149,6 +150,28 @@ class TrafficController(object):
                            str(self._traffic_gen_class))
         self.configure(traffic)
 
+    def send_calibration_traffic(self, traffic, duration):
+        """Send continuous traffic at the line rate to measure forwarding
+           capacity of the deployment.
+
+        The first packet size from TRAFFICGEN_PKT_SIZES is used. This is
+        a blocking function.
+
+        :param traffic: A dictionary describing the traffic to send.
+        :param duration: Duration of the traffic in seconds.
+
+        :returns: Received frame rate or None if traffic generator is
+            not controlled by VSPERF.
+        """
+        if self._mode in ('trafficgen-off', 'trafficgen-pause'):
+            return None
+        self.configure(traffic)
+        tmp_traffic = copy.deepcopy(traffic)
+        tmp_traffic['l2'] = dict(traffic.get('l2', {}), framesize=self._packet_sizes[0])
+        tmp_traffic['frame_rate'] = 100
+        result = self._traffic_gen_class.send_cont_traffic(tmp_traffic, duration=duration)
+        return float(result[ResultsConstants.THROUGHPUT_RX_FPS])
+
     def stop_traffic(self):
         """Kills traffic being sent from the traffic generator.
         """
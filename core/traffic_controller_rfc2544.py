@@ -13,8 +13,13 @@
 # limitations under the License.
 """RFC2544 Traffic Controller implementation.
 """
+import copy
+
+from core import search_history
+from core import throughput_search
 from core.traffic_controller import TrafficController
 from core.results.results import IResults
+from core.results.results_constants import ResultsConstants
 from conf import settings
 
 
@@ -33,6 +38,7 @@ class TrafficControllerRFC2544(TrafficController, IResults):
         super().__init__(traffic_gen_class)
         self._type = 'rfc2544'
         self._tests = None
+        self._seeds = []
 
     def configure(self, traffic):
         """See TrafficController for description
@@ -47,6 +53,7 @@ class TrafficControllerRFC2544(TrafficController, IResults):
             return
 
         super().send_traffic(traffic)
+        self._seeds = []
 
         for packet_size in self._packet_sizes:
             # Merge framesize with the default traffic definition
@@ -66,8 +73,14 @@ class TrafficControllerRFC2544(TrafficController, IResults):
                 result = self._traffic_gen_class.send_burst_traffic(
                     traffic, duration=self._duration)
             elif traffic['traffic_type'] == 'rfc2544_throughput':
-                result = self._traffic_gen_class.send_rfc2544_throughput(
-                    traffic, tests=self._tests, duration=self._duration, lossrate=self._lossrate)
+                if settings.getValue('TRAFFICGEN_RFC2544_SEARCH'):
+                    result = self._search_throughput(traffic)
+                else:
+                    result = self._traffic_gen_class.send_rfc2544_throughput(
+                        traffic, tests=self._tests, duration=self._duration,
+                        lossrate=self._lossrate)
+            elif traffic['traffic_type'] == 'rfc2544_ndrpdr':
+                result = self._search_ndrpdr(traffic)
             else:
                 raise RuntimeError("Unsupported traffic type {} was "
                                    "detected".format(traffic['traffic_type']))
@@ -75,6 +88,96 @@ class TrafficControllerRFC2544(TrafficController, IResults):
             result = self._append_results(result, packet_size)
             self._results.append(result)
 
+    def _send_trial(self, traffic, rate, duration):
+        """Send continuous traffic at given rate as a trial of throughput search
+        """
+        trial_traffic = copy.deepcopy(traffic)
+        trial_traffic['frame_rate'] = rate
+        return self._traffic_gen_class.send_cont_traffic(trial_traffic, duration=duration)
+
+    def _search_throughput(self, traffic):
+        """Search for RFC2544 throughput by continuous traffic trials
+
+        :returns: Results of the trial with the highest passing rate
+        """
+        threshold = float(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_THRESHOLD'))
+        search = throughput_search.ThroughputSearch(
+            lambda rate, duration: self._send_trial(traffic, rate, duration),
+            self._lossrate, threshold,
+            strategy=throughput_search.get_strategy(settings.getValue('TRAFFICGEN_RFC2544_SEARCH')),
+            max_trials=int(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_MAX_TRIALS')),
+            max_repeat=int(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_MAX_REPEAT')),
+            min_duration=int(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_MIN_DURATION')))
+        framesize = traffic['l2']['framesize']
+        bracket = None
+        # key of the testcase is set by the testcase if the history is enabled
+        history_key = settings.getValue('_SEARCH_HISTORY_KEY')
+        history = search_history.SearchHistory() if history_key else None
+        history_rate = history.lookup(history_key, framesize) if history else None
+        if history_rate is not None:
+            # the search starts from throughput found by the previous run
+            bracket = (history_rate, history_rate + threshold)
+            self._logger.info('Throughput search of frame size %s starts from throughput '
+                              '%.3f%% found by the previous run', framesize, history_rate)
+        elif settings.getValue('TRAFFICGEN_RFC2544_SEARCH_SEED') and framesize:
+            # throughput of frame sizes searched so far limits the search
+            bracket = throughput_search.seed_bracket(framesize, self._seeds,
+                                                     traffic['frame_rate'])
+            if bracket:
+                self._logger.info('Throughput search of frame size %s is seeded by bracket '
+                                  '[%.3f, %.3f]', framesize, *bracket)
+        best = search.search(traffic['frame_rate'], self._duration, bracket=bracket)
+        if best and framesize:
+            self._seeds.append((framesize, best.rate))
+        if best and history:
+            history.record(history_key, framesize, best.rate, best.result)
+        if history_rate is not None and (not best or best.rate < history_rate - threshold):
+            self._logger.warning('Throughput of frame size %s has decreased from %.3f%% to '
+                                 '%.3f%% of line rate', framesize, history_rate,
+                                 best.rate if best else 0)
+        result = copy.copy(best.result) if best else throughput_search.empty_result()
+        result[ResultsConstants.SEARCH_TRIALS] = len(search.trials)
+        result[ResultsConstants.SEARCH_TRIAL_TIME] = '{:.3f}'.format(search.trial_time)
+        result[ResultsConstants.SEARCH_TIME] = '{:.3f}'.format(search.search_time)
+        result[ResultsConstants.SEARCH_TIME_SAVED] = search.time_saved
+        if history_rate is not None:
+            result[ResultsConstants.SEARCH_HISTORY_PERCENT] = history_rate
+        self._logger.info('Throughput search by %s strategy has finished after %s trials',
+                          settings.getValue('TRAFFICGEN_RFC2544_SEARCH'), len(search.trials))
+        return result
+
+    def _search_ndrpdr(self, traffic):
+        """Search for no drop rate (NDR) and partial drop rate (PDR) at once
+
+        :returns: Results of the trial at NDR lower bound together with
+            bounds and trial counts of NDR and PDR
+        """
+        targets = [('ndr', self._lossrate),
+                   ('pdr', float(settings.getValue('TRAFFICGEN_RFC2544_PDR_LOSSRATE')))]
+        search = throughput_search.NdrPdrSearch(
+            lambda rate, duration: self._send_trial(traffic, rate, duration),
+            targets,
+            float(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_THRESHOLD')),
+            strategy=settings.getValue('TRAFFICGEN_RFC2544_SEARCH') or 'binary',
+            min_duration=int(settings.getValue('TRAFFICGEN_RFC2544_NDRPDR_MIN_DURATION')),
+            phases=int(settings.getValue('TRAFFICGEN_RFC2544_NDRPDR_PHASES')),
+            max_trials=int(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_MAX_TRIALS')))
+        found = search.search(traffic['frame_rate'], self._duration)
+        ndr = found['ndr'].best
+        result = copy.copy(ndr.result) if ndr else throughput_search.empty_result()
+        for (name, _) in targets:
+            target = found[name]
+            result[ResultsConstants.NDRPDR_RX_FPS.format(name)] = \
+                target.best.result.get(ResultsConstants.THROUGHPUT_RX_FPS, 0) if target.best else 0
+            result[ResultsConstants.NDRPDR_LOWER_PERCENT.format(name)] = target.lower or 0
+            result[ResultsConstants.NDRPDR_UPPER_PERCENT.format(name)] = \
+                target.upper if target.upper is not None else (target.lower or 0)
+            result[ResultsConstants.NDRPDR_TRIALS.format(name)] = target.trial_count
+        result[ResultsConstants.SEARCH_TRIALS] = len(search.trials)
+        result[ResultsConstants.SEARCH_TRIAL_TIME] = '{:.3f}'.format(search.trial_time)
+        self._logger.info('NDR and PDR search has finished after %s trials', len(search.trials))
+        return result
+
     def send_traffic_async(self, traffic, function):
         """See TrafficController for description
         """
@@ -15,6 +15,48 @@
 """
 import logging
 
+from conf import settings
+
+# vSwitch kept running between testcases, see VSWITCH_KEEP_WARM
+_WARM_VSWITCH = {'vswitch': None}
+
+def get_vswitch(vswitch_class):
+    """Return vSwitch instance to be used by the testcase
+
+    vSwitch kept warm by previous testcase is returned if it is of the
+    same class and it can be reused with the current configuration.
+    Otherwise warm vSwitch is terminated and a new instance is created.
+
+    :param vswitch_class: Reference to vSwitch class to be used.
+    """
+    warm = _WARM_VSWITCH['vswitch']
+    if warm is not None:
+        if warm.__class__ is vswitch_class and warm.can_reuse_warm():
+            return warm
+        stop_warm_vswitch()
+
+    vswitch = vswitch_class()
+    if settings.getValue('VSWITCH_KEEP_WARM') and vswitch.get_warm_signature() is not None:
+        _WARM_VSWITCH['vswitch'] = vswitch
+    return vswitch
+
+def is_vswitch_warm():
+    """Check if vSwitch processes are kept running between testcases
+    """
+    return _WARM_VSWITCH['vswitch'] is not None and _WARM_VSWITCH['vswitch'].is_warm()
+
+def stop_warm_vswitch():
+    """Terminate vSwitch kept running between testcases
+
+    :returns: True if warm vSwitch was terminated
+    """
+    vswitch = _WARM_VSWITCH['vswitch']
+    _WARM_VSWITCH['vswitch'] = None
+    if vswitch is None or not vswitch.is_warm():
+        return False
+    vswitch.terminate()
+    return True
+
 class IVswitchController(object):
     """Interface class for a vSwitch controller object
 
@@ -30,7 +72,7 @@ class IVswitchController(object):
         """
         self._logger = logging.getLogger(__name__)
         self._vswitch_class = vswitch_class
-        self._vswitch = vswitch_class()
+        self._vswitch = get_vswitch(vswitch_class)
         self._deployment_scenario = deployment
         self._logger.debug('Creation using %s', str(self._vswitch_class))
         self._traffic = traffic.copy()
@@ -58,6 +100,14 @@ class IVswitchController(object):
         """
         self.stop()
 
+    def _get_port_number(self, switch_name, port_name):
+        """Return port number of ``port_name`` reported by the vSwitch
+
+        It is used to get valid port numbers of ports created
+        inside of vSwitch batch context.
+        """
+        return dict(self._vswitch.get_ports(switch_name))[port_name]
+
     def get_vswitch(self):
         """Get the controlled vSwitch
 
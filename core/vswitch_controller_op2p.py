@@ -68,11 +68,14 @@ class VswitchControllerOP2P(IVswitchController):
             tunnel_type = self._traffic['tunnel_type']
 
             self._vswitch.add_switch(bridge_ext)
-            (_, phy1_number) = self._vswitch.add_phy_port(bridge)
-            (_, phy2_number) = self._vswitch.add_tunnel_port(bridge,
-                                                             vtep_ip2,
-                                                             tunnel_type)
-            self._vswitch.add_phy_port(bridge_ext)
+            with self._vswitch.batch():
+                (phy1, _) = self._vswitch.add_phy_port(bridge)
+                (phy2, _) = self._vswitch.add_tunnel_port(bridge,
+                                                          vtep_ip2,
+                                                          tunnel_type)
+                self._vswitch.add_phy_port(bridge_ext)
+            phy1_number = self._get_port_number(bridge, phy1)
+            phy2_number = self._get_port_number(bridge, phy2)
 
             tasks.run_task(['sudo', 'ip', 'addr', 'add',
                             bridge_ext_ip,
@@ -132,18 +135,21 @@ class VswitchControllerOP2P(IVswitchController):
             tunnel_type = self._traffic['tunnel_type']
 
             self._vswitch.add_switch(bridge_ext)
-            self._vswitch.add_phy_port(bridge)
-            (_, phy2_number) = self._vswitch.add_phy_port(bridge_ext)
-            if tunnel_type == "vxlan":
-                vxlan_vni = 'options:key=' + S.getValue('VXLAN_VNI')
-                (_, phy3_number) = self._vswitch.add_tunnel_port(bridge_ext,
-                                                                 tgen_ip1,
-                                                                 tunnel_type,
-                                                                 params=[vxlan_vni])
-            else:
-                (_, phy3_number) = self._vswitch.add_tunnel_port(bridge_ext,
-                                                                 tgen_ip1,
-                                                                 tunnel_type)
+            with self._vswitch.batch():
+                self._vswitch.add_phy_port(bridge)
+                (phy2, _) = self._vswitch.add_phy_port(bridge_ext)
+                if tunnel_type == "vxlan":
+                    vxlan_vni = 'options:key=' + S.getValue('VXLAN_VNI')
+                    (phy3, _) = self._vswitch.add_tunnel_port(bridge_ext,
+                                                              tgen_ip1,
+                                                              tunnel_type,
+                                                              params=[vxlan_vni])
+                else:
+                    (phy3, _) = self._vswitch.add_tunnel_port(bridge_ext,
+                                                              tgen_ip1,
+                                                              tunnel_type)
+            phy2_number = self._get_port_number(bridge_ext, phy2)
+            phy3_number = self._get_port_number(bridge_ext, phy3)
             tasks.run_task(['sudo', 'ip', 'addr', 'add',
                             bridge_ext_ip,
                             'dev', bridge_ext],
@@ -192,15 +198,17 @@ class VswitchControllerOP2P(IVswitchController):
             tunnel_type = self._traffic['tunnel_type']
 
             self._vswitch.add_switch(bridge_ext)
-            self._vswitch.add_phy_port(bridge_ext)
-            (_, phy2_number) = self._vswitch.add_phy_port(bridge)
-
-            if tunnel_type == "vxlan":
-                vxlan_vni = 'options:key=' + S.getValue('VXLAN_VNI')
-                self._vswitch.add_tunnel_port(bridge, tgen_ip1, tunnel_type,
-                                              params=[vxlan_vni])
-            else:
-                self._vswitch.add_tunnel_port(bridge, tgen_ip1, tunnel_type)
+            with self._vswitch.batch():
+                self._vswitch.add_phy_port(bridge_ext)
+                (phy2, _) = self._vswitch.add_phy_port(bridge)
+
+                if tunnel_type == "vxlan":
+                    vxlan_vni = 'options:key=' + S.getValue('VXLAN_VNI')
+                    self._vswitch.add_tunnel_port(bridge, tgen_ip1, tunnel_type,
+                                                  params=[vxlan_vni])
+                else:
+                    self._vswitch.add_tunnel_port(bridge, tgen_ip1, tunnel_type)
+            phy2_number = self._get_port_number(bridge, phy2)
 
             tasks.run_task(['sudo', 'ip', 'addr', 'add',
                             bridge_ext_ip,
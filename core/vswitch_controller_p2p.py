@@ -42,12 +42,14 @@ class VswitchControllerP2P(IVswitchController):
 
             self._vswitch.add_switch(self._bridge)
 
-            (port1, _) = self._vswitch.add_phy_port(self._bridge)
-            (port2, _) = self._vswitch.add_phy_port(self._bridge)
+            with self._vswitch.batch():
+                (port1, _) = self._vswitch.add_phy_port(self._bridge)
+                (port2, _) = self._vswitch.add_phy_port(self._bridge)
 
             if not settings.getValue('K8S'):
-                self._vswitch.add_connection(self._bridge, port1, port2, self._traffic)
-                self._vswitch.add_connection(self._bridge, port2, port1, self._traffic)
+                with self._vswitch.reconcile_connections():
+                    self._vswitch.add_connection(self._bridge, port1, port2, self._traffic)
+                    self._vswitch.add_connection(self._bridge, port2, port1, self._traffic)
 
         except:
             self._vswitch.stop()
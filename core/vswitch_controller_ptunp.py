@@ -123,20 +123,27 @@ class VswitchControllerPtunP(IVswitchController):
             self._vswitch.set_tunnel_arp(vxlan_rem_ip2, str(vxlan_rem_mac2),
                                          self.bridge_mod2)
 
-            # Lets add the ports to bridges
-            (_, phy1_number) = self._vswitch.add_phy_port(self.bridge_phy1)
-            (_, phy2_number) = self._vswitch.add_phy_port(self.bridge_phy2)
-            vxlan_vni = 'options:key=' + settings.getValue('VXLAN_VNI')
-            (_, phy3_number) = self._vswitch.add_tunnel_port(self.bridge_phy1,
-                                                             vxlan_rem_ip1,
-                                                             "vxlan",
-                                                             params=[vxlan_vni])
-            (_, phy4_number) = self._vswitch.add_tunnel_port(self.bridge_phy2,
-                                                             vxlan_rem_ip2,
-                                                             "vxlan",
-                                                             params=[vxlan_vni])
-            [(_, phy5_number), (_, phy6_number)] = \
-                     self._vswitch.add_veth_pair_port(self.bridge_mod1, self.bridge_mod2)
+            # Lets add the ports to bridges by a single transaction
+            with self._vswitch.batch():
+                (phy1, _) = self._vswitch.add_phy_port(self.bridge_phy1)
+                (phy2, _) = self._vswitch.add_phy_port(self.bridge_phy2)
+                vxlan_vni = 'options:key=' + settings.getValue('VXLAN_VNI')
+                (phy3, _) = self._vswitch.add_tunnel_port(self.bridge_phy1,
+                                                          vxlan_rem_ip1,
+                                                          "vxlan",
+                                                          params=[vxlan_vni])
+                (phy4, _) = self._vswitch.add_tunnel_port(self.bridge_phy2,
+                                                          vxlan_rem_ip2,
+                                                          "vxlan",
+                                                          params=[vxlan_vni])
+                [(phy5, _), (phy6, _)] = \
+                         self._vswitch.add_veth_pair_port(self.bridge_mod1, self.bridge_mod2)
+            phy1_number = self._get_port_number(self.bridge_phy1, phy1)
+            phy2_number = self._get_port_number(self.bridge_phy2, phy2)
+            phy3_number = self._get_port_number(self.bridge_phy1, phy3)
+            phy4_number = self._get_port_number(self.bridge_phy2, phy4)
+            phy5_number = self._get_port_number(self.bridge_mod1, phy5)
+            phy6_number = self._get_port_number(self.bridge_mod2, phy6)
 
             # Set up flows for the switches
             self._vswitch.del_flow(self.bridge_phy1)
@@ -145,20 +152,20 @@ class VswitchControllerPtunP(IVswitchController):
             self._vswitch.del_flow(self.bridge_mod2)
             flow = add_ports_to_flow(settings.getValue('OVS_FLOW_TEMPLATE'), phy1_number,
                                      phy3_number)
-            self._vswitch.add_flow(self.bridge_phy1, flow)
+            self._vswitch.add_flow(self.bridge_phy1, flow, cache='on')
             flow = add_ports_to_flow(settings.getValue('OVS_FLOW_TEMPLATE'), phy3_number,
                                      phy1_number)
-            self._vswitch.add_flow(self.bridge_phy1, flow)
+            self._vswitch.add_flow(self.bridge_phy1, flow, cache='on')
 
             flow = add_ports_to_flow(settings.getValue('OVS_FLOW_TEMPLATE'), phy2_number,
                                      phy4_number)
-            self._vswitch.add_flow(self.bridge_phy2, flow)
+            self._vswitch.add_flow(self.bridge_phy2, flow, cache='on')
             flow = add_ports_to_flow(settings.getValue('OVS_FLOW_TEMPLATE'), phy4_number,
                                      phy2_number)
-            self._vswitch.add_flow(self.bridge_phy2, flow)
+            self._vswitch.add_flow(self.bridge_phy2, flow, cache='on')
             flow = add_ports_to_flow(settings.getValue('OVS_FLOW_TEMPLATE'), phy5_number,
                                      'LOCAL')
-            self._vswitch.add_flow(self.bridge_mod1, flow)
+            self._vswitch.add_flow(self.bridge_mod1, flow, cache='on')
             mod_flow_template = settings.getValue('OVS_FLOW_TEMPLATE').copy()
             mod_flow_template.update({'ip':'',
                                       'actions':
@@ -169,10 +176,10 @@ class VswitchControllerPtunP(IVswitchController):
                                       ]
                                      })
             flow = add_ports_to_flow(mod_flow_template, 'LOCAL', phy5_number)
-            self._vswitch.add_flow(self.bridge_mod1, flow)
+            self._vswitch.add_flow(self.bridge_mod1, flow, cache='on')
             flow = add_ports_to_flow(settings.getValue('OVS_FLOW_TEMPLATE'), phy6_number,
                                      'LOCAL')
-            self._vswitch.add_flow(self.bridge_mod2, flow)
+            self._vswitch.add_flow(self.bridge_mod2, flow, cache='on')
             mod_flow_template = settings.getValue('OVS_FLOW_TEMPLATE').copy()
             mod_flow_template.update({'ip':'',
                                       'actions':
@@ -182,7 +189,9 @@ class VswitchControllerPtunP(IVswitchController):
                                        'mod_nw_dst:' + vxlan_local_ip1]
                                      })
             flow = add_ports_to_flow(mod_flow_template, 'LOCAL', phy6_number)
-            self._vswitch.add_flow(self.bridge_mod2, flow)
+            self._vswitch.add_flow(self.bridge_mod2, flow, cache='on')
+            # install flows of all bridges concurrently
+            self._vswitch.flush_flows()
 
         except:
             self._vswitch.stop()
@@ -0,0 +1,91 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generator of stream specific flows for the multistream feature.
+
+Flows are generated lazily as ``ovs-ofctl`` flow strings, so they can be
+written directly into a :class FlowSpool: without creating a dictionary
+and netaddr object for every stream. Only the value of a single field
+differs among flows of one connection, so all other parts of the flow
+string are formatted once and stream values are computed arithmetically
+in batches.
+"""
+
+import socket
+import struct
+
+import netaddr
+
+# number of flow strings created at once
+_BATCH_SIZE = 10000
+
+def _format_mac(value):
+    """Format integer as MAC address in ``netaddr.mac_unix_expanded`` dialect
+    """
+    mac = '{:012x}'.format(value)
+    return ':'.join((mac[0:2], mac[2:4], mac[4:6], mac[6:8], mac[8:10], mac[10:12]))
+
+def _format_ipv4(value):
+    """Format integer as IPv4 address
+    """
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+def get_stream_field(traffic):
+    """Return description of the flow field, which identifies a stream
+
+    :param traffic: Traffic dictionary with ``stream_type`` and
+        L2/L3/L4 details
+
+    :return: Tuple (fixed fields, field name, first value, modulo,
+        formatting function); fixed fields is a dictionary of fields,
+        which must be added to the flow template
+    """
+    if traffic['stream_type'] == 'L2':
+        return ({}, 'dl_dst', netaddr.EUI(traffic['l2']['dstmac']).value,
+                2 ** 48, _format_mac)
+    elif traffic['stream_type'] == 'L3':
+        return ({'dl_type': '0x0800'}, 'nw_dst',
+                netaddr.IPAddress(traffic['l3']['dstip']).value, 2 ** 32, _format_ipv4)
+    elif traffic['stream_type'] == 'L4':
+        return ({'dl_type': '0x0800',
+                 'nw_proto': socket.getprotobyname(traffic['l3']['proto'].lower())},
+                'tp_dst', traffic['l4']['dstport'], 65536, str)
+    raise RuntimeError('Unknown stream_type {}'.format(traffic['stream_type']))
+
+def multistream_flows(flow, traffic, batch_size=_BATCH_SIZE):
+    """Generate stream specific flows
+
+    Generated flow strings are equal to those created by ``flow_key()``
+    for flow dictionaries with stream specific field values.
+
+    :param flow: Flow template as a dictionary with actions
+    :param traffic: Traffic dictionary with ``multistream``, ``stream_type``
+        and L2/L3/L4 details
+    :param batch_size: Number of flow strings created at once
+
+    :return: Generator of flow strings
+    """
+    (fixed, field, first, modulo, formatter) = get_stream_field(traffic)
+    fields = dict(flow)
+    actions = fields.pop('actions')
+    fields.update(fixed)
+    fields.pop(field, None)
+    prefix = ''.join('{}={},'.format(key, value) for (key, value) in fields.items())
+    prefix += field + '='
+    suffix = ',action=' + ','.join(actions)
+
+    streams = traffic['multistream']
+    for start in range(0, streams, batch_size):
+        values = range(first + start, first + min(start + batch_size, streams))
+        yield from [prefix + formatter(value % modulo) + suffix for value in values]
@@ -19,21 +19,66 @@ Much of this code is based on ``ovs-lib.py`` from Open Stack:
 
 https://github.com/openstack/neutron/blob/6eac1dc99124ca024d6a69b3abfa3bc69c735667/neutron/agent/linux/ovs_lib.py
 """
+import os
+import time
 import logging
 import string
 import re
+import contextlib
+import tempfile
 import netaddr
 
 from tools import tasks
 from conf import settings as S
+from src.ovs import ovsdb
 
 _OVS_BRIDGE_NAME = S.getValue('VSWITCH_BRIDGE_NAME')
 _OVS_CMD_TIMEOUT = S.getValue('OVS_CMD_TIMEOUT')
 
-_CACHE_FILE_NAME = '/tmp/vsperf_flows_cache'
-
 # only simple regex is used; validity of IPv4 is not checked by regex
 _IPV4_REGEX = r"([0-9]{1,3}(\.[0-9]{1,3}){3}(\/[0-9]{1,2})?)"
+_IPV4_VALUE_REGEX = re.compile('^' + _IPV4_REGEX + '$')
+_NUMBER_REGEX = re.compile(r'^([0-9]+|0x[0-9a-fA-F]+)$')
+
+# e.g. "pmd thread numa_id 0 core_id 2:"
+_PMD_THREAD_REGEX = re.compile(r'^pmd thread numa_id \d+ core_id (\d+):')
+# e.g. "  port: dpdk0   queue-id:  0 (enabled)   pmd usage: 45 %"
+_PMD_RXQ_REGEX = re.compile(r'^\s+port:\s+(\S+)\s+queue-id:\s+(\d+)(?:.*pmd usage:\s*(\d+) %)?')
+
+# shorthand notations used by ovs-ofctl dump-flows
+_FLOW_SHORTHANDS = {
+    'ip': (('dl_type', '2048'),),
+    'icmp': (('dl_type', '2048'), ('nw_proto', '1')),
+    'tcp': (('dl_type', '2048'), ('nw_proto', '6')),
+    'udp': (('dl_type', '2048'), ('nw_proto', '17')),
+    'sctp': (('dl_type', '2048'), ('nw_proto', '132')),
+    'arp': (('dl_type', '2054'),),
+    'ipv6': (('dl_type', '34525'),),
+    'tcp6': (('dl_type', '34525'), ('nw_proto', '6')),
+    'udp6': (('dl_type', '34525'), ('nw_proto', '17')),
+}
+
+# synonyms of match fields
+_FLOW_FIELDS = {
+    'udp_src': 'tp_src', 'udp_dst': 'tp_dst',
+    'tcp_src': 'tp_src', 'tcp_dst': 'tp_dst',
+    'sctp_src': 'tp_src', 'sctp_dst': 'tp_dst',
+    'ip_src': 'nw_src', 'ip_dst': 'nw_dst',
+    'eth_src': 'dl_src', 'eth_dst': 'dl_dst', 'eth_type': 'dl_type',
+    'ip_proto': 'nw_proto',
+}
+
+# flow attributes, which are not part of the match
+_FLOW_NON_MATCH = frozenset([
+    'cookie', 'duration', 'table', 'n_packets', 'n_bytes', 'idle_timeout',
+    'hard_timeout', 'idle_age', 'hard_age', 'priority', 'importance',
+    'send_flow_rem', 'check_overlap', 'reset_counts', 'no_packet_counts',
+    'no_byte_counts', 'out_port', 'out_group'])
+
+_DEFAULT_PRIORITY = '32768'
+
+# cookie of flows managed by OFBridge.reconcile_flows(); ASCII 'vsperf'
+_RECONCILE_COOKIE = 0x767370657266
 
 class OFBase(object):
     """Add/remove/show datapaths using ``ovs-ofctl``.
@@ -61,6 +106,18 @@ class OFBase(object):
 
         :return: None
         """
+        # custom OVS_VSCTL_ARGS can't be honored by native OVSDB client
+        client = ovsdb.get_client()
+        if client and not S.getValue('OVS_VSCTL_ARGS'):
+            try:
+                return self._run_ovsdb(client, args, check_error)
+            except ovsdb.UnsupportedCommand:
+                pass
+            except OSError as exc:
+                self.logger.warning('Native OVSDB client has failed, ovs-vsctl '
+                                    'will be used: %s', exc)
+                ovsdb.disconnect()
+
         if self.timeout == -1:
             cmd = ['sudo', S.getValue('TOOLS')['ovs-vsctl'], '--no-wait'] + \
                   S.getValue('OVS_VSCTL_ARGS') + args
@@ -70,6 +127,27 @@ class OFBase(object):
         return tasks.run_task(
             cmd, self.logger, 'Running ovs-vsctl...', check_error)
 
+    def _run_ovsdb(self, client, args, check_error=False):
+        """Execute ``ovs-vsctl`` arguments by native OVSDB client.
+
+        :param client: Instance of :class ovsdb.OVSDBClient:
+        :param args: Arguments to pass to ``ovs-vsctl``
+        :param check_error: Throw exception on error
+
+        :return: (stdout, stderr) as if ``ovs-vsctl`` was executed
+        """
+        self.logger.debug('Running ovs-vsctl by native OVSDB client: %s', ' '.join(args))
+        try:
+            if self.timeout == -1:
+                output = client.run_vsctl(args, wait=False)
+            else:
+                output = client.run_vsctl(args, timeout=self.timeout)
+        except ovsdb.OVSDBError as exc:
+            self.logger.error('ovs-vsctl %s: %s', ' '.join(args), exc)
+            if check_error:
+                raise
+            return ('', str(exc))
+        return (output, '')
 
     def run_appctl(self, args, check_error=False):
         """Run ``ovs-appctl`` with supplied arguments.
@@ -153,8 +231,12 @@ class OFBridge(OFBase):
         """
         super(OFBridge, self).__init__(timeout)
         self.br_name = br_name
+        self._params = []
         self._ports = {}
-        self._cache_file = None
+        self._kept_ports = {}
+        self._unread_ports = set()
+        self._spool = None
+        self._batch = None
 
     # helpers
 
@@ -172,6 +254,23 @@ class OFBridge(OFBase):
         return tasks.run_task(
             cmd, self.logger, 'Running ovs-ofctl...', check_error)
 
+    def get_add_flows_cmd(self, file_name):
+        """Return ``ovs-ofctl add-flows`` command installing flows from the file.
+
+        Flows are installed atomically by a single OpenFlow bundle if
+        OVS_FLOW_BUNDLE is enabled.
+
+        :param file_name: Name of file with one flow per line
+
+        :return: Command as a list of strings
+        """
+        args = S.getValue('OVS_OFCTL_ARGS')
+        if S.getValue('OVS_FLOW_BUNDLE'):
+            args = _get_bundle_args(args)
+        return ['sudo', S.getValue('TOOLS')['ovs-ofctl'], '--timeout',
+                str(S.getValue('OVS_FLOW_INSTALL_TIMEOUT'))] + args + \
+               ['add-flows', self.br_name, file_name]
+
     def create(self, params=None):
         """Create bridge.
         """
@@ -180,11 +279,20 @@ class OFBridge(OFBase):
 
         self.logger.debug('create bridge')
         self.add_br(self.br_name, params=params)
+        self._params = params
+
+    def get_params(self):
+        """Return additional parameters used to create the bridge.
+        """
+        return self._params
 
     def destroy(self):
         """Destroy bridge.
         """
         self.logger.debug('destroy bridge')
+        if self._spool:
+            self._spool.remove()
+            self._spool = None
         self.del_br(self.br_name)
 
     def reset(self):
@@ -194,24 +302,107 @@ class OFBridge(OFBase):
         self.destroy()
         self.create()
 
+    # batch management
+
+    def begin_batch(self, commands=None):
+        """Start accumulation of ``ovs-vsctl`` commands.
+
+        Port, interface and attribute changes are not executed until
+        the batch is finished, see :func:`batch`.
+
+        :param commands: List to accumulate commands in; It can be shared
+            by several bridges to change them by a single transaction.
+
+        :return: None
+        """
+        self._batch = [] if commands is None else commands
+
+    def end_batch(self):
+        """Stop accumulation of ``ovs-vsctl`` commands.
+
+        :return: List of accumulated commands
+        """
+        commands = self._batch
+        self._batch = None
+        return commands
+
+    def in_batch(self):
+        """Check if ``ovs-vsctl`` commands are being accumulated.
+        """
+        return self._batch is not None
+
+    def run_batch(self, commands):
+        """Execute accumulated commands by a single ``ovs-vsctl`` transaction.
+
+        :param commands: List of ``ovs-vsctl`` commands (lists of arguments)
+
+        :return: None
+        """
+        args = []
+        for command in commands:
+            args += ['--'] + command
+        if args:
+            self.logger.debug('executing batch of %s commands', len(commands))
+            self.run_vsctl(args[1:])
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager applying all changes by a single transaction.
+
+        OpenFlow port numbers returned by :func:`add_port` inside the batch
+        are provisional. Real port numbers are available by :func:`get_ports`
+        after the batch is finished.
+        """
+        if self.in_batch():
+            yield
+            return
+        self.begin_batch()
+        try:
+            yield
+        finally:
+            commands = self.end_batch()
+        self.run_batch(commands)
+        self.update_ofports()
+
+    def _run_command(self, args):
+        """Run ``ovs-vsctl`` command or add it into the active batch.
+        """
+        if self.in_batch():
+            self._batch.append(args)
+        else:
+            self.run_vsctl(args)
+
     # port management
 
     def add_port(self, port_name, params):
         """Add port to bridge.
 
+        Port kept by :func:`keep_ports` is reused if its parameters
+        are the same.
+
         :param port_name: Name of port
         :param params: Additional list of parameters to add-port
 
-        :return: OpenFlow port number for the port
+        :return: OpenFlow port number for the port; Provisional number
+            is returned for a new port and the real one is read back
+            by :func:`get_ports`
         """
+        kept = self._kept_ports.pop(port_name, None)
+        if kept is not None and kept[1] == params:
+            self.logger.debug('reuse port')
+            self._ports[port_name] = kept
+            return kept[0]
+        if kept is not None:
+            self._run_command(['del-port', self.br_name, port_name])
+
         self.logger.debug('add port')
-        self.run_vsctl(['add-port', self.br_name, port_name]+params)
+        self._run_command(['add-port', self.br_name, port_name]+params)
 
-        # This is how port number allocation works currently
-        # This possibly will not work correctly if there are port deletions
-        # in between
+        # provisional port number is used until the real one is read back;
+        # it possibly will not be correct if there are port deletions in between
         of_port = len(self._ports) + 1
         self._ports[port_name] = (of_port, params)
+        self._unread_ports.add(port_name)
         return of_port
 
     def del_port(self, port_name):
@@ -222,8 +413,68 @@ class OFBridge(OFBase):
         :return: None
         """
         self.logger.debug('delete port')
-        self.run_vsctl(['del-port', self.br_name, port_name])
+        self._run_command(['del-port', self.br_name, port_name])
         self._ports.pop(port_name)
+        self._unread_ports.discard(port_name)
+
+    def keep_ports(self):
+        """Keep all ports of the bridge for its next use.
+
+        Kept port is reused by :func:`add_port` if it is added again with
+        the same parameters. Kept ports, which are not added again, are
+        removed by :func:`del_kept_ports`.
+
+        :return: None
+        """
+        self._kept_ports.update(self._ports)
+        self._ports = {}
+
+    def del_kept_ports(self):
+        """Remove kept ports, which were not added again.
+
+        :return: List of names of removed ports
+        """
+        port_names = sorted(self._kept_ports)
+        for port_name in port_names:
+            self._run_command(['del-port', self.br_name, port_name])
+        self._unread_ports.difference_update(port_names)
+        self._kept_ports = {}
+        return port_names
+
+    def update_ofports(self, port_names=None):
+        """Read OpenFlow port numbers assigned by ovs-vswitchd.
+
+        Numbers are not read if ovs-vsctl doesn't wait for ovs-vswitchd,
+        i.e. if timeout is set to -1. Provisional numbers are kept for ports,
+        which have not been assigned a valid number.
+
+        :param port_names: List of port names; All ports are updated by default
+
+        :return: None
+        """
+        names = list(self._ports) if port_names is None else port_names
+        self._unread_ports.difference_update(names)
+        if not names or self.timeout == -1:
+            return
+        client = ovsdb.get_client()
+        if client and not S.getValue('OVS_VSCTL_ARGS'):
+            client.poll()
+            rows = [client.find_row('Interface', name) for name in names]
+            of_ports = {row['name']: row.get('ofport') for row in rows if row}
+        else:
+            output = self.run_vsctl(['--format=csv', '--data=bare', '--no-headings',
+                                     '--columns=name,ofport', 'list', 'Interface'] + names)
+            of_ports = {}
+            for line in output[0].splitlines():
+                (name, _, of_port) = line.rpartition(',')
+                of_ports[name] = int(of_port) if of_port.isdigit() else None
+        for name in names:
+            of_port = of_ports.get(name)
+            if isinstance(of_port, int) and 0 < of_port < 0xff00:
+                self._ports[name] = (of_port, self._ports[name][1])
+            else:
+                self.logger.debug('OpenFlow port number of %s is not available, '
+                                  '%s is used', name, self._ports[name][0])
 
     def set_db_attribute(self, table_name, record, column, value):
         """Set database attribute.
@@ -236,11 +487,14 @@ class OFBridge(OFBase):
         :return: None
         """
         self.logger.debug('set attribute')
-        self.run_vsctl(['set', table_name, record, '%s=%s' % (column, value)])
+        self._run_command(['set', table_name, record, '%s=%s' % (column, value)])
 
     def get_ports(self):
         """Get the ports of this bridge
 
+        OpenFlow port numbers of ports added outside of a batch are read
+        back by a single query at the first call after they were added.
+
         Structure of the returned ports dictionary is
         'portname': (openflow_port_number, extra_parameters)
 
@@ -255,6 +509,9 @@ class OFBridge(OFBase):
 
         :return: Dictionary of ports
         """
+        names = self._unread_ports.intersection(self._ports)
+        if names and not self.in_batch():
+            self.update_ofports(sorted(names))
         return self._ports
 
     def clear_db_attribute(self, table_name, record, column):
@@ -267,7 +524,7 @@ class OFBridge(OFBase):
         :return: None
         """
         self.logger.debug('clear attribute')
-        self.run_vsctl(['clear', table_name, record, column])
+        self._run_command(['clear', table_name, record, column])
 
     # flow mangement
 
@@ -276,18 +533,18 @@ class OFBridge(OFBase):
 
         :param flow: Flow description as a dictionary
         For flow dictionary structure, see function flow_key
+        :param cache: 'off' to install the flow immediately, 'on' to add
+            it into the spool of the bridge or 'flush' to install all
+            spooled flows
 
         :return: None
         """
         # insert flows from cache into OVS if needed
         if cache == 'flush':
-            if self._cache_file is None:
+            if self._spool is None:
                 self.logger.error('flow cache flush called, but nothing is cached')
                 return
-            self.logger.debug('flows cached in %s will be added to the bridge', _CACHE_FILE_NAME)
-            self._cache_file.close()
-            self._cache_file = None
-            self.run_ofctl(['add-flows', self.br_name, _CACHE_FILE_NAME], timeout=600)
+            install_flows([self])
             return
 
         if not flow.get('actions'):
@@ -299,13 +556,123 @@ class OFBridge(OFBase):
 
         # insert flow to the cache or OVS
         if cache == 'on':
-            # create and open cache file if needed
-            if self._cache_file is None:
-                self._cache_file = open(_CACHE_FILE_NAME, 'w')
-            self._cache_file.write(_flow_key + '\n')
+            self._get_spool().write(_flow_key)
         else:
             self.run_ofctl(['add-flow', self.br_name, _flow_key])
 
+    def add_flows(self, flow_strs):
+        """Add flows to bridge.
+
+        A single flow is installed immediately. Otherwise flows are streamed
+        into the spool of the bridge and all spooled flows are installed
+        at once, so flows can be consumed from a generator without keeping
+        them in memory.
+
+        :param flow_strs: Iterable of flow strings created by ``flow_key()``
+
+        :return: Number of added flows
+        """
+        flow_strs = iter(flow_strs)
+        first = next(flow_strs, None)
+        second = next(flow_strs, None)
+        if second is None:
+            if first is not None:
+                self.run_ofctl(['add-flow', self.br_name, first])
+            return int(first is not None)
+
+        spool = self._get_spool()
+        count = spool.count
+        spool.write(first)
+        spool.write(second)
+        for flow_str in flow_strs:
+            spool.write(flow_str)
+        count = spool.count - count
+        install_flows([self])
+        return count
+
+    def _get_spool(self):
+        """Return spool of cached flows; new spool is created if needed
+        """
+        if self._spool is None:
+            self._spool = FlowSpool(self.br_name, S.getValue('OVS_FLOW_BUNDLE_SIZE'))
+        return self._spool
+
+    def take_spool(self):
+        """Return spool of cached flows and start a new one.
+
+        :return: Instance of :class FlowSpool: or None if no flow is cached
+        """
+        spool = self._spool
+        self._spool = None
+        return spool
+
+    def get_reconcile_spool(self, flows):
+        """Return spool with changes needed to reach the desired set of flows.
+
+        Desired flows missing in the bridge or having different actions
+        are added. Flows added by previous reconciliation, which are not
+        desired anymore, are deleted. Other flows are not touched, so
+        reconciliation doesn't interfere with flows added by add_flow().
+
+        Desired flows are consumed only once and they are not kept in
+        memory. If there is no flow added by previous reconciliation, they
+        are streamed into the spool without parsing. Otherwise only their
+        normalized (table, priority, match) keys are kept.
+
+        :param flows: Iterable of desired flows as flow strings created
+            by ``flow_key()``
+
+        :return: Instance of :class FlowSpool: or None if no change is needed
+        """
+        flow_table = self.get_flow_table()
+        current = flow_table.get_flows()
+        reconciled = [key for key in current
+                      if flow_table.get_cookie(key) == _RECONCILE_COOKIE]
+        spool = FlowSpool(self.br_name)
+        cookie = 'cookie={},'.format(hex(_RECONCILE_COOKIE))
+        if not reconciled:
+            for flow_str in flows:
+                spool.write('add ' + cookie + flow_str)
+            self.logger.info('Reconciliation of flows of %s: %s added',
+                             self.br_name, spool.count)
+        else:
+            desired = set()
+            # keys of installed flows are reused to save memory
+            keys = {key: key for key in reconciled}
+            kept = 0
+            for flow_str in flows:
+                (key, actions) = parse_flow(flow_str)
+                key = keys.get(key, key)
+                if key in desired:
+                    continue
+                desired.add(key)
+                if current.get(key) == actions:
+                    kept += 1
+                else:
+                    spool.write('add ' + cookie + flow_str)
+            added = spool.count
+            for key in reconciled:
+                if key not in desired:
+                    spool.write('delete_strict ' + flow_table.get_match_str(key))
+            self.logger.info('Reconciliation of %s flows of %s: %s added, %s deleted, %s kept',
+                             len(desired), self.br_name, added, spool.count - added, kept)
+        if not spool.count:
+            spool.remove()
+            return None
+        return spool
+
+    def reconcile_flows(self, flows):
+        """Install only the difference between current and desired flows.
+
+        All changes are installed by a single bundle if OVS_FLOW_BUNDLE
+        is enabled. See :func:`get_reconcile_spool` for details.
+
+        :param flows: Iterable of desired flows as flow strings
+
+        :return: Tuple of (number of changes, installation time in seconds)
+        """
+        return install_spools([(self, self.get_reconcile_spool(flows))])
+
     def del_flow(self, flow):
         """Delete flow from bridge.
 
@@ -332,6 +699,15 @@ class OFBridge(OFBase):
         self.logger.debug('dump flows')
         self.run_ofctl(['dump-flows', self.br_name], timeout=120)
 
+    def get_flow_table(self):
+        """Return snapshot of all flows of the bridge.
+
+        :return: Instance of :class FlowTable:
+        """
+        self.logger.debug('get flow table')
+        output = self.run_ofctl(['dump-flows', self.br_name], check_error=True, timeout=120)
+        return FlowTable(output[0])
+
     def set_stp(self, enable=True):
         """
         Set stp status
@@ -340,7 +716,7 @@ class OFBridge(OFBase):
         """
         self.logger.debug(
             'Setting stp on bridge to %s', 'on' if enable else 'off')
-        self.run_vsctl(
+        self._run_command(
             ['set', 'Bridge', self.br_name, 'stp_enable={}'.format(
                 'true' if enable else 'false')])
 
@@ -352,7 +728,7 @@ class OFBridge(OFBase):
         """
         self.logger.debug(
             'Setting rstp on bridge to %s', 'on' if enable else 'off')
-        self.run_vsctl(
+        self._run_command(
             ['set', 'Bridge', self.br_name, 'rstp_enable={}'.format(
                 'true' if enable else 'false')])
 
@@ -363,10 +739,302 @@ class OFBridge(OFBase):
         """
         return self.run_vsctl(['list', 'bridge', self.br_name])
 
+class FlowSpool(object):
+    """Temporary files with flows to be installed by ``ovs-ofctl add-flows``.
+
+    Flows are split into files of ``bundle_size`` flows, so content of
+    every file is installed by a single OpenFlow bundle.
+    """
+    def __init__(self, br_name, bundle_size=0):
+        """Initialise spool.
+
+        :param br_name: Name of bridge, which will be used in file names
+        :param bundle_size: Maximum number of flows per file; 0 means unlimited
+        """
+        self.br_name = br_name
+        self.bundle_size = bundle_size
+        self.count = 0
+        self.files = []
+        self._file = None
+
+    def write(self, flow_str):
+        """Append a flow string created by ``flow_key()``.
+        """
+        if self._file is None or (self.bundle_size and self.files[-1][1] >= self.bundle_size):
+            self._open()
+        self._file.write(flow_str + '\n')
+        self.files[-1][1] += 1
+        self.count += 1
+
+    def _open(self):
+        """Close the current file and open a new one.
+        """
+        self.close()
+        (handle, file_name) = tempfile.mkstemp(
+            prefix='vsperf_flows_{}_'.format(self.br_name), suffix='.txt')
+        self._file = os.fdopen(handle, 'w')
+        self.files.append([file_name, 0])
+
+    def close(self):
+        """Close the current file, so it can be read by ``ovs-ofctl``.
+        """
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Close and remove all files.
+        """
+        self.close()
+        for (file_name, _) in self.files:
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+        self.files = []
+
+def install_flows(bridges):
+    """Install flows cached by given bridges.
+
+    :param bridges: List of :class OFBridge: instances
+
+    :return: Tuple of (number of flows, installation time in seconds)
+    """
+    return install_spools([(bridge, bridge.take_spool()) for bridge in bridges])
+
+def install_spools(spools):
+    """Install flows from spools into their bridges.
+
+    Flows of all bridges are installed concurrently. In case that
+    spooled flows are split into several bundles, then bundles are
+    installed in rounds and progress is reported after every round.
+
+    :param spools: List of (:class OFBridge:, :class FlowSpool:) tuples;
+        Spool can be None if there is nothing to install.
+
+    :return: Tuple of (number of flows, installation time in seconds)
+    """
+    logger = logging.getLogger(__name__)
+    spools = [(bridge, spool) for (bridge, spool) in spools if spool]
+    total = sum(spool.count for (_, spool) in spools)
+    if not total:
+        return (0, 0.0)
+
+    logger.info('Installing %s flows into %s...', total,
+                ', '.join(bridge.br_name for (bridge, _) in spools))
+    start = time.time()
+    installed = 0
+    try:
+        for spool in (spool for (_, spool) in spools):
+            spool.close()
+        for index in range(max(len(spool.files) for (_, spool) in spools)):
+            cmds = []
+            for (bridge, spool) in spools:
+                if index < len(spool.files):
+                    cmds.append(bridge.get_add_flows_cmd(spool.files[index][0]))
+                    installed += spool.files[index][1]
+            tasks.run_tasks_concurrently(cmds, logger)
+            if installed < total:
+                duration = time.time() - start
+                logger.info('Installed %s/%s flows (%.0f flows/s)', installed, total,
+                            installed / duration if duration else 0)
+    finally:
+        for (_, spool) in spools:
+            spool.remove()
+    duration = time.time() - start
+    logger.info('%s flows installed in %.2f s (%.0f flows/s)', total, duration,
+                total / duration if duration else 0)
+    return (total, duration)
+
+class FlowTable(object):
+    """Snapshot of OpenFlow tables of the bridge.
+
+    Output of ``ovs-ofctl dump-flows`` is parsed once into normalized
+    flows. Flows are indexed by (table, priority, match) and every match
+    field is indexed too, so any number of flows can be verified against
+    a single dump by hash lookups.
+    """
+    def __init__(self, flow_dump=''):
+        """Parse output of ``ovs-ofctl dump-flows``.
+
+        :param flow_dump: Output of ``ovs-ofctl dump-flows``
+        """
+        self._flows = {}
+        self._fields = {}
+        self._cookies = {}
+        self._match_strs = {}
+        for line in flow_dump.splitlines():
+            if 'actions=' in line:
+                self.add(line)
+
+    def __len__(self):
+        return len(self._flows)
+
+    def add(self, flow_str):
+        """Add flow into the snapshot.
+
+        :param flow_str: Line of ``ovs-ofctl dump-flows`` output or a flow
+            string created by ``flow_key()``
+
+        :return: (table, priority, match) key of the flow
+        """
+        (key, actions) = parse_flow(flow_str)
+        self._flows[key] = actions
+        for field in key[2]:
+            self._fields.setdefault(field, set()).add(key)
+        fields = flow_str.replace('action=', 'actions=').partition('actions=')[0]
+        match_str = []
+        for field in fields.replace(' ', ',').split(','):
+            name = field.partition('=')[0]
+            if name == 'cookie':
+                self._cookies[key] = int(field.partition('=')[2].partition('/')[0], 0)
+            elif field and (name in ('table', 'priority') or name not in _FLOW_NON_MATCH):
+                match_str.append(field)
+        self._match_strs[key] = ','.join(match_str)
+        return key
+
+    def get_cookie(self, key):
+        """Return cookie of the flow identified by (table, priority, match) key.
+        """
+        return self._cookies.get(key, 0)
+
+    def get_match_str(self, key):
+        """Return table, priority and match of the flow as a flow string.
+
+        It can be used by ``ovs-ofctl`` strict commands, e.g. ``delete_strict``.
+        """
+        return self._match_strs[key]
+
+    def get_flows(self):
+        """Return dictionary of flows {(table, priority, match): actions}.
+
+        Match is a frozenset of normalized (field, value) tuples and actions
+        are a tuple of strings.
+        """
+        return self._flows
+
+    def find(self, flow):
+        """Find flows matching the flow description.
+
+        Flow matches if its match contains all fields of ``flow`` and its
+        table, priority and actions are equal to those specified by ``flow``.
+
+        :param flow: Flow description as a dictionary or a flow string
+            created by ``flow_key()``
+
+        :return: List of (table, priority, match) keys of matching flows
+        """
+        flow_str = flow if isinstance(flow, str) else flow_key(flow)
+        ((table, priority, match), actions) = parse_flow(flow_str, None)
+        key = (table, priority or _DEFAULT_PRIORITY, match)
+        if key in self._flows:
+            keys = [key]
+        elif match:
+            keys = set.intersection(*[self._fields.get(field, set()) for field in match])
+        else:
+            keys = self._flows.keys()
+        return [key for key in keys
+                if key[0] == table and (priority is None or key[1] == priority) and
+                (actions is None or self._flows[key] == actions)]
+
+    def contains(self, flow):
+        """Check if the flow is present in the snapshot.
+
+        :param flow: Flow description as a dictionary or a flow string
+            created by ``flow_key()``
+        """
+        return bool(self.find(flow))
+
 #
 # helper functions
 #
 
+def _split_actions(actions):
+    """Split list of actions by commas, which are not enclosed in brackets.
+    """
+    result = []
+    depth = 0
+    start = 0
+    for (index, char) in enumerate(actions):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and not depth:
+            result.append(actions[start:index].strip())
+            start = index + 1
+    result.append(actions[start:].strip())
+    return tuple(action for action in result if action)
+
+def _normalize_value(value):
+    """Return value of match field in canonical form.
+    """
+    if _NUMBER_REGEX.match(value):
+        return str(int(value, 0))
+    if _IPV4_VALUE_REGEX.match(value) and '/' in value:
+        network = netaddr.IPNetwork(value)
+        return str(network.ip) if network.prefixlen == 32 else str(network.cidr)
+    return value.lower()
+
+def parse_flow(flow_str, default_priority=_DEFAULT_PRIORITY):
+    """Parse flow string into normalized key and actions.
+
+    Flow string can be a line of ``ovs-ofctl dump-flows`` output or
+    a flow created by ``flow_key()``. Shorthand notations (e.g. ``udp``),
+    field synonyms (e.g. ``udp_dst``), numbers and IPv4 CIDR forms are
+    normalized.
+
+    :param flow_str: Flow string
+    :param default_priority: Priority of flow without explicit priority
+
+    :return: Tuple ((table, priority, match), actions); actions are None
+        if flow string doesn't define them
+    """
+    flow_str = flow_str.strip().replace('action=', 'actions=')
+    (fields, _, actions) = flow_str.partition('actions=')
+    table = '0'
+    priority = default_priority
+    match = set()
+    for field in fields.replace(' ', ',').split(','):
+        if not field:
+            continue
+        (name, _, value) = field.partition('=')
+        if name == 'table':
+            table = str(int(value, 0)) if _NUMBER_REGEX.match(value) else value
+        elif name == 'priority':
+            priority = str(int(value))
+        elif name in _FLOW_SHORTHANDS and not value:
+            match.update(_FLOW_SHORTHANDS[name])
+        elif name not in _FLOW_NON_MATCH:
+            match.add((_FLOW_FIELDS.get(name, name), _normalize_value(value)))
+    return ((table, priority, frozenset(match)),
+            _split_actions(actions) if actions else None)
+
+
+def _get_bundle_args(ofctl_args):
+    """Return ``ovs-ofctl`` arguments with ``--bundle`` option.
+
+    OpenFlow bundles require OpenFlow 1.4 or later, so it is added to
+    the list of protocols if needed.
+
+    :param ofctl_args: Arguments of ``ovs-ofctl``, e.g. OVS_OFCTL_ARGS
+
+    :return: List of arguments
+    """
+    args = list(ofctl_args)
+    for (index, arg) in enumerate(args):
+        if arg == '-O' and index + 1 < len(args):
+            index += 1
+            protocols = args[index]
+        elif arg.startswith('--protocols='):
+            protocols = arg[len('--protocols='):]
+        else:
+            continue
+        if 'OpenFlow14' not in protocols and 'OpenFlow15' not in protocols:
+            args[index] += ',OpenFlow14'
+    return args + ['--bundle']
+
+
 def flow_key(flow):
     """Model a flow key string for ``ovs-ofctl``.
 
@@ -455,3 +1123,24 @@ def flow_match(flow_dump, flow_src):
         if rule in flow_dump_list:
             flow_src_ctrl.remove(rule)
     return True if not flow_src_ctrl else False
+
+def parse_pmd_rxqs(output):
+    """Parse assignment of rxqs to PMD threads
+
+    :param output: Output of ``ovs-appctl dpif-netdev/pmd-rxq-show``
+
+    :return: Dictionary with list of (port, queue, usage) tuples indexed
+        by PMD core id; usage is 0 if it is not available
+    """
+    rxqs = {}
+    core = None
+    for line in output.splitlines():
+        match = _PMD_THREAD_REGEX.match(line)
+        if match:
+            core = int(match.group(1))
+            continue
+        match = _PMD_RXQ_REGEX.match(line)
+        if match and core is not None:
+            rxqs.setdefault(core, []).append(
+                (match.group(1), int(match.group(2)), int(match.group(3) or 0)))
+    return rxqs
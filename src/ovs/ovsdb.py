@@ -0,0 +1,681 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Native client of OVSDB management protocol (RFC 7047).
+
+Client keeps a single persistent JSON-RPC connection to ``ovsdb-server``
+and a local replica of tables used by VSPERF, which is kept up to date
+by the ``monitor`` method. Subset of ``ovs-vsctl`` commands used by
+VSPERF is translated into OVSDB transactions, so bridges and ports can
+be configured without spawning ``ovs-vsctl`` processes.
+
+Supported ``ovs-vsctl`` commands are ``add-br``, ``del-br``, ``add-port``,
+``del-port``, ``set``, ``clear`` and ``list``. Any other command or
+option raises ``UnsupportedCommand`` before anything is sent to the
+server, so the caller can execute ``ovs-vsctl`` instead.
+"""
+
+import codecs
+import json
+import logging
+import re
+import select
+import socket
+import threading
+import time
+
+_MONITORED_TABLES = ['Open_vSwitch', 'Bridge', 'Port', 'Interface']
+_MONITOR_ID = 'vsperf'
+
+# string values matching this pattern are printed without quotes by list
+_BARE_STRING_REGEX = re.compile(r'^[a-zA-Z_][\w./-]*$')
+
+# client shared by all OFBase instances; see connect() and get_client()
+_CLIENT = {'client': None}
+
+class OVSDBError(RuntimeError):
+    """OVSDB request, transaction or ovs-vsctl command has failed
+    """
+
+class UnsupportedCommand(Exception):
+    """ovs-vsctl command can't be executed by native client
+    """
+
+class Uuid(str):
+    """UUID of OVSDB row; it is printed without quotes
+    """
+
+def _from_json(value):
+    """Convert OVSDB JSON value into python value
+
+    Sets are converted into lists, maps into dictionaries and UUIDs
+    into ``Uuid`` strings.
+    """
+    if isinstance(value, list):
+        if value[0] == 'set':
+            return [_from_json(item) for item in value[1]]
+        if value[0] == 'map':
+            return {_from_json(key): _from_json(val) for (key, val) in value[1]}
+        return Uuid(value[1])
+    return value
+
+def as_list(value):
+    """Return value of set column as a list
+
+    OVSDB sends sets with exactly one element as a plain atom.
+    """
+    return value if isinstance(value, list) else [value]
+
+def _format_atom(value):
+    """Format atom in the same way as ``ovs-vsctl list``
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, Uuid) or not isinstance(value, str):
+        return str(value)
+    return value if _BARE_STRING_REGEX.match(value) else json.dumps(value)
+
+def _format_value(value):
+    """Format column value in the same way as ``ovs-vsctl list``
+    """
+    if isinstance(value, dict):
+        return '{' + ', '.join('{}={}'.format(_format_atom(key), _format_atom(value[key]))
+                               for key in sorted(value)) + '}'
+    if isinstance(value, list):
+        return '[' + ', '.join(_format_atom(item) for item in value) + ']'
+    return _format_atom(value)
+
+def _base_type(base):
+    """Return atomic type of the key or value of column type
+    """
+    return base if isinstance(base, str) else base['type']
+
+def _parse_atom(atomic_type, text):
+    """Parse atom from ``ovs-vsctl`` command line
+    """
+    try:
+        if atomic_type == 'string':
+            return json.loads(text) if text.startswith('"') else text
+        if atomic_type == 'integer':
+            return int(text)
+        if atomic_type == 'real':
+            return float(text)
+        if atomic_type == 'boolean' and text in ('true', 'false'):
+            return text == 'true'
+    except ValueError:
+        pass
+    raise UnsupportedCommand('value {} of type {}'.format(text, atomic_type))
+
+def _split_commands(args):
+    """Split ``ovs-vsctl`` arguments into a list of commands
+    """
+    commands = [[]]
+    for arg in args:
+        if arg == '--':
+            commands.append([])
+        elif arg.startswith('-'):
+            raise UnsupportedCommand('option {}'.format(arg))
+        else:
+            commands[-1].append(arg)
+    return [command for command in commands if command]
+
+class OVSDBClient(object):
+    """Persistent connection to ``ovsdb-server`` with replica of monitored tables
+    """
+    def __init__(self, sock_path, database='Open_vSwitch', timeout=10):
+        """Initialise client; connection is opened by ``connect()``
+
+        :param sock_path: Path to UNIX socket of ``ovsdb-server``
+        :param database: Name of database
+        :param timeout: Default timeout of requests in seconds
+        """
+        self.logger = logging.getLogger(__name__)
+        self.sock_path = sock_path
+        self.database = database
+        self.timeout = timeout
+        self._sock = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._request_id = 0
+        self._responses = {}
+        self._lock = threading.RLock()
+        self._schema = {}
+        self._tables = {}
+
+    def open(self):
+        """Open connection to ``ovsdb-server`` without monitoring
+
+        :raises: OSError if socket is not accessible
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.sock_path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def connect(self):
+        """Connect to ``ovsdb-server``, read the schema and start monitoring
+
+        :raises: OSError if socket is not accessible
+        """
+        self.open()
+        self._schema = self.request('get_schema', [self.database])
+        tables = [table for table in _MONITORED_TABLES if table in self._schema['tables']]
+        self._tables = {table: {} for table in tables}
+        self._apply_updates(self.request(
+            'monitor', [self.database, _MONITOR_ID, {table: {} for table in tables}]))
+
+    def close(self):
+        """Close connection to ``ovsdb-server``
+        """
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        self._buffer = ''
+        self._responses = {}
+
+    def is_connected(self):
+        """Return True if connection is opened
+        """
+        return self._sock is not None
+
+    # JSON-RPC
+
+    def _send(self, message):
+        """Send JSON-RPC message
+        """
+        self._sock.sendall(json.dumps(message).encode())
+
+    def _pop_message(self):
+        """Return the first complete message from receive buffer or None
+        """
+        self._buffer = self._buffer.lstrip()
+        if not self._buffer:
+            return None
+        try:
+            (message, end) = json.JSONDecoder().raw_decode(self._buffer)
+        except ValueError:
+            # message is not complete yet
+            return None
+        self._buffer = self._buffer[end:]
+        return message
+
+    def _read(self, deadline):
+        """Read data from socket into receive buffer
+
+        :returns: False if nothing has arrived before ``deadline``
+        """
+        remaining = deadline - time.time() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            return False
+        if not select.select([self._sock], [], [], remaining)[0]:
+            return False
+        data = self._sock.recv(65536)
+        if not data:
+            self.close()
+            raise ConnectionError('connection closed by ovsdb-server')
+        self._buffer += self._decoder.decode(data)
+        return True
+
+    def _dispatch(self, message):
+        """Process message received from the server
+        """
+        method = message.get('method')
+        if method == 'echo':
+            self._send({'id': message['id'], 'result': message['params'], 'error': None})
+        elif method == 'update':
+            self._apply_updates(message['params'][1])
+        elif method is None:
+            self._responses[message['id']] = message
+
+    def _process(self, condition, timeout):
+        """Process received messages until ``condition()`` returns True
+
+        :param timeout: Timeout in seconds; None means to wait forever
+        :raises: OVSDBError if ``condition()`` is not met before timeout
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while not condition():
+            message = self._pop_message()
+            if message is not None:
+                self._dispatch(message)
+            elif not self._read(deadline):
+                raise OVSDBError('timeout after {} s'.format(timeout))
+
+    def _get_timeout(self, timeout):
+        """Return timeout in seconds to be used by request; 0 means no timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return timeout if timeout > 0 else None
+
+    def request(self, method, params, timeout=None):
+        """Send JSON-RPC request and wait for its result
+
+        :raises: OVSDBError if request fails or times out,
+                 OSError if connection fails
+        """
+        with self._lock:
+            if not self._sock:
+                raise ConnectionError('not connected to ovsdb-server')
+            self._request_id += 1
+            request_id = self._request_id
+            self._send({'method': method, 'params': params, 'id': request_id})
+            try:
+                self._process(lambda: request_id in self._responses,
+                              self._get_timeout(timeout))
+            except OVSDBError as exc:
+                raise OVSDBError('{} request: {}'.format(method, exc))
+            response = self._responses.pop(request_id)
+        if response.get('error') is not None:
+            raise OVSDBError('{} request failed: {}'.format(method, response['error']))
+        return response['result']
+
+    def poll(self, timeout=0):
+        """Process notifications received from the server
+
+        :param timeout: Time in seconds to wait for notifications
+        """
+        with self._lock:
+            try:
+                self._process(lambda: False, timeout)
+            except OVSDBError:
+                pass
+
+    def wait_for(self, condition, timeout=None):
+        """Process notifications until ``condition()`` is met
+
+        It can be used to wait for columns updated by ``ovs-vswitchd``,
+        e.g. ``ofport`` of a new interface.
+
+        :raises: OVSDBError if ``condition()`` is not met before timeout
+        """
+        with self._lock:
+            self._process(condition, self._get_timeout(timeout))
+
+    def transact(self, operations, wait=True, timeout=None):
+        """Execute ``operations`` as a single transaction
+
+        :param operations: List of OVSDB operations
+        :param wait: Wait until ``ovs-vswitchd`` applies the changes,
+            i.e. until ``cur_cfg`` reaches incremented ``next_cfg``
+        :param timeout: Timeout in seconds
+
+        :returns: List of results of ``operations``
+        :raises: OVSDBError if any of operations fails
+        """
+        with self._lock:
+            count = len(operations)
+            if wait:
+                operations = operations + [
+                    {'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+                     'mutations': [['next_cfg', '+=', 1]]},
+                    {'op': 'select', 'table': 'Open_vSwitch', 'where': [],
+                     'columns': ['next_cfg']}]
+            results = self.request('transact', [self.database] + operations, timeout)
+            errors = ['{}: {}'.format(result['error'], result.get('details', ''))
+                      for result in results if result and 'error' in result]
+            if errors:
+                raise OVSDBError('transaction failed: {}'.format('; '.join(errors)))
+            if wait:
+                next_cfg = results[-1]['rows'][0]['next_cfg']
+                try:
+                    self._process(lambda: self._get_cur_cfg() >= next_cfg,
+                                  self._get_timeout(timeout))
+                except OVSDBError as exc:
+                    raise OVSDBError('waiting for ovs-vswitchd reconfiguration: {}'.format(exc))
+            return results[:count]
+
+    # replica
+
+    def _apply_updates(self, updates):
+        """Apply ``table-updates`` object to the replica
+        """
+        for (table, rows) in updates.items():
+            replica = self._tables.setdefault(table, {})
+            for (row_uuid, row_update) in rows.items():
+                new = row_update.get('new')
+                if new is None:
+                    replica.pop(row_uuid, None)
+                    continue
+                row = replica.setdefault(row_uuid, {'_uuid': Uuid(row_uuid)})
+                row.update((column, _from_json(value)) for (column, value) in new.items())
+
+    def _get_cur_cfg(self):
+        """Return ``cur_cfg`` of ``Open_vSwitch`` record
+        """
+        for row in self._tables['Open_vSwitch'].values():
+            return row.get('cur_cfg', 0)
+        return 0
+
+    def get_rows(self, table):
+        """Return list of replicated rows of ``table``
+        """
+        return list(self._tables.get(table, {}).values())
+
+    def find_row(self, table, name):
+        """Return replicated row of ``table`` with given ``name`` or None
+
+        Name ``.`` refers to the only record of ``Open_vSwitch`` table.
+        """
+        for row in self._tables.get(table, {}).values():
+            if name == '.' or row.get('name') == name:
+                return row
+        return None
+
+    def get_table_name(self, name):
+        """Return name of monitored table matching ``name`` case insensitively
+        """
+        for table in self._tables:
+            if table.lower() == name.lower():
+                return table
+        raise UnsupportedCommand('table {}'.format(name))
+
+    def get_columns(self, table):
+        """Return sorted list of columns of ``table``
+        """
+        return sorted(self._schema['tables'][table]['columns'])
+
+    def get_column_type(self, table, column):
+        """Return (key type, value type, min, max) of ``column``
+
+        Value type is None for scalars and sets.
+        """
+        try:
+            col_type = self._schema['tables'][table]['columns'][column]['type']
+        except KeyError:
+            raise UnsupportedCommand('column {} of table {}'.format(column, table))
+        if isinstance(col_type, str):
+            return (col_type, None, 1, 1)
+        value_type = _base_type(col_type['value']) if 'value' in col_type else None
+        return (_base_type(col_type['key']), value_type,
+                col_type.get('min', 1), col_type.get('max', 1))
+
+    # ovs-vsctl
+
+    def run_vsctl(self, args, wait=True, timeout=None):
+        """Execute ``ovs-vsctl`` arguments by a single transaction
+
+        :param args: Arguments of ``ovs-vsctl``, e.g. ``['add-port', 'br0',
+            'dpdk0', '--', 'set', 'Interface', 'dpdk0', 'type=dpdk']``
+        :param wait: Wait until ``ovs-vswitchd`` applies the changes; It
+            corresponds to omitted ``--no-wait`` option.
+        :param timeout: Timeout in seconds
+
+        :returns: Output of ``list`` command or an empty string
+        :raises: UnsupportedCommand if ``args`` can't be executed natively,
+                 OVSDBError if any of commands or the transaction fails
+        """
+        with self._lock:
+            self.poll()
+            transaction = _VsctlTransaction(self)
+            for command in _split_commands(args):
+                transaction.add_command(command)
+            if transaction.operations:
+                self.transact(transaction.operations, wait, timeout)
+            return transaction.output
+
+class _VsctlTransaction(object):
+    """Translation of ``ovs-vsctl`` commands into OVSDB operations
+    """
+    def __init__(self, client):
+        self._client = client
+        self.operations = []
+        self.output = ''
+        # rows inserted by this transaction; (table, name) -> uuid-name
+        self._inserted = {}
+        if not client.get_rows('Open_vSwitch'):
+            # ovs-vsctl initializes empty database in the same way
+            self.operations.append({'op': 'insert', 'table': 'Open_vSwitch', 'row': {}})
+
+    def add_command(self, command):
+        """Append operations implementing a single ``ovs-vsctl`` command
+        """
+        handlers = {'add-br': self._add_br, 'del-br': self._del_br,
+                    'add-port': self._add_port, 'del-port': self._del_port,
+                    'set': self._set, 'clear': self._clear, 'list': self._list}
+        handler = handlers.get(command[0])
+        if not handler:
+            raise UnsupportedCommand('command {}'.format(command[0]))
+        if self.output or (command[0] == 'list' and self.operations):
+            raise UnsupportedCommand('list combined with other commands')
+        handler(*command[1:])
+
+    def _exists(self, table, name):
+        """Return True if record exists or it is inserted by this transaction
+        """
+        return (table, name) in self._inserted or self._client.find_row(table, name)
+
+    def _get_row(self, table, name):
+        """Return existing row, which is not modified by this transaction
+        """
+        if (table, name) in self._inserted:
+            raise UnsupportedCommand('removal of {} {} inserted by the same '
+                                     'transaction'.format(table, name))
+        row = self._client.find_row(table, name)
+        if row is None:
+            raise OVSDBError('no row "{}" in table {}'.format(name, table))
+        return row
+
+    def _insert(self, table, name, row):
+        """Insert named row and return its uuid-name
+        """
+        uuid_name = 'row{}'.format(len(self.operations))
+        row['name'] = name
+        self.operations.append({'op': 'insert', 'table': table, 'row': row,
+                                'uuid-name': uuid_name})
+        self._inserted[(table, name)] = uuid_name
+        return uuid_name
+
+    def _insert_port(self, bridge, port, iface_type=None):
+        """Insert port with the interface of the same name into the bridge
+        """
+        if self._exists('Port', port):
+            raise OVSDBError('cannot create a port named {} because a port named '
+                             '{} already exists'.format(port, port))
+        iface = self._insert('Interface', port, {'type': iface_type} if iface_type else {})
+        port_uuid = self._insert('Port', port, {'interfaces': ['named-uuid', iface]})
+        if bridge is not None:
+            self.operations.append({'op': 'mutate', 'table': 'Bridge', 'where': self._where(bridge),
+                                    'mutations': [['ports', 'insert',
+                                                   ['set', [['named-uuid', port_uuid]]]]]})
+        return port_uuid
+
+    def _delete_port(self, row):
+        """Delete port ``row`` with all its interfaces
+
+        References to the port must be removed by preceding operations.
+        """
+        for iface in as_list(row.get('interfaces', [])):
+            self.operations.append({'op': 'delete', 'table': 'Interface',
+                                    'where': [['_uuid', '==', ['uuid', iface]]]})
+        self.operations.append({'op': 'delete', 'table': 'Port',
+                                'where': [['_uuid', '==', ['uuid', row['_uuid']]]]})
+
+    @staticmethod
+    def _where(name):
+        """Return condition selecting record by its name
+        """
+        return [] if name == '.' else [['name', '==', name]]
+
+    def _add_br(self, bridge):
+        """ovs-vsctl add-br BRIDGE
+        """
+        if self._exists('Bridge', bridge):
+            raise OVSDBError('cannot create a bridge named {} because a bridge '
+                             'named {} already exists'.format(bridge, bridge))
+        port_uuid = self._insert_port(None, bridge, 'internal')
+        bridge_uuid = self._insert('Bridge', bridge, {'ports': ['named-uuid', port_uuid]})
+        self.operations.append({'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+                                'mutations': [['bridges', 'insert',
+                                               ['set', [['named-uuid', bridge_uuid]]]]]})
+
+    def _del_br(self, bridge):
+        """ovs-vsctl del-br BRIDGE
+        """
+        row = self._get_row('Bridge', bridge)
+        self.operations.append({'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+                                'mutations': [['bridges', 'delete',
+                                               ['set', [['uuid', row['_uuid']]]]]]})
+        ports = as_list(row.get('ports', []))
+        for port in self._client.get_rows('Port'):
+            if port['_uuid'] in ports:
+                self._delete_port(port)
+        self.operations.append({'op': 'delete', 'table': 'Bridge',
+                                'where': [['_uuid', '==', ['uuid', row['_uuid']]]]})
+
+    def _add_port(self, bridge, port, *columns):
+        """ovs-vsctl add-port BRIDGE PORT [COLUMN[:KEY]=VALUE]...
+        """
+        if not self._exists('Bridge', bridge):
+            raise OVSDBError('no bridge named {}'.format(bridge))
+        self._insert_port(bridge, port)
+        if columns:
+            self._set('Port', port, *columns)
+
+    def _del_port(self, *args):
+        """ovs-vsctl del-port [BRIDGE] PORT
+        """
+        port = self._get_row('Port', args[-1])
+        if len(args) > 1:
+            bridges = [self._get_row('Bridge', args[0])]
+            if port['_uuid'] not in as_list(bridges[0].get('ports', [])):
+                raise OVSDBError('bridge {} does not have a port {}'.format(args[0], args[-1]))
+        else:
+            bridges = [row for row in self._client.get_rows('Bridge')
+                       if port['_uuid'] in as_list(row.get('ports', []))]
+        for bridge in bridges:
+            self.operations.append({'op': 'mutate', 'table': 'Bridge',
+                                    'where': [['_uuid', '==', ['uuid', bridge['_uuid']]]],
+                                    'mutations': [['ports', 'delete',
+                                                   ['set', [['uuid', port['_uuid']]]]]]})
+        self._delete_port(port)
+
+    def _set(self, table, record, *assignments):
+        """ovs-vsctl set TABLE RECORD COLUMN[:KEY]=VALUE...
+        """
+        table = self._client.get_table_name(table)
+        if not self._exists(table, record):
+            raise OVSDBError('no row "{}" in table {}'.format(record, table))
+        row = {}
+        mutations = []
+        for assignment in assignments:
+            if '=' not in assignment:
+                raise UnsupportedCommand('assignment {}'.format(assignment))
+            (column, value) = assignment.split('=', 1)
+            (column, _, key) = column.partition(':')
+            (key_type, value_type, _, max_count) = self._client.get_column_type(table, column)
+            if key:
+                if value_type is None:
+                    raise UnsupportedCommand('key of column {}'.format(column))
+                key = _parse_atom(key_type, key)
+                mutations += [[column, 'delete', ['set', [key]]],
+                              [column, 'insert', ['map', [[key, _parse_atom(value_type, value)]]]]]
+            elif value_type is not None or value.startswith(('[', '{')):
+                raise UnsupportedCommand('value {} of column {}'.format(value, column))
+            else:
+                atom = _parse_atom(key_type, value)
+                row[column] = atom if max_count == 1 else ['set', [atom]]
+        if row:
+            self.operations.append({'op': 'update', 'table': table,
+                                    'where': self._where(record), 'row': row})
+        if mutations:
+            self.operations.append({'op': 'mutate', 'table': table,
+                                    'where': self._where(record), 'mutations': mutations})
+
+    def _clear(self, table, record, *columns):
+        """ovs-vsctl clear TABLE RECORD COLUMN...
+        """
+        table = self._client.get_table_name(table)
+        if not self._exists(table, record):
+            raise OVSDBError('no row "{}" in table {}'.format(record, table))
+        row = {}
+        for column in columns:
+            (_, value_type, min_count, _) = self._client.get_column_type(table, column)
+            if min_count != 0:
+                raise UnsupportedCommand('clear of mandatory column {}'.format(column))
+            row[column] = ['map', []] if value_type else ['set', []]
+        self.operations.append({'op': 'update', 'table': table,
+                                'where': self._where(record), 'row': row})
+
+    def _list(self, table, *records):
+        """ovs-vsctl list TABLE [RECORD]...
+        """
+        table = self._client.get_table_name(table)
+        if records:
+            rows = [self._get_row(table, record) for record in records]
+        else:
+            rows = self._client.get_rows(table)
+        columns = ['_uuid'] + self._client.get_columns(table)
+        output = []
+        for row in rows:
+            output.append(''.join('{:<20}: {}\n'.format(column, _format_value(row.get(column, [])))
+                                  for column in columns))
+        self.output = '\n'.join(output)
+
+def probe(sock_path, database='Open_vSwitch', timeout=1):
+    """Readiness probe of ``ovsdb-server``
+
+    Connects to the socket and lists served databases.
+
+    :returns: True if ``ovsdb-server`` serves ``database``
+    :raises: PermissionError if socket is not accessible by VSPERF
+    """
+    client = OVSDBClient(sock_path, database, timeout)
+    try:
+        client.open()
+        return database in client.request('list_dbs', [])
+    except PermissionError:
+        raise
+    except (OSError, OVSDBError):
+        return False
+    finally:
+        client.close()
+
+#
+# client shared by the whole VSPERF process
+#
+def connect(sock_path, logger=None):
+    """Open shared connection to ``ovsdb-server`` listening at ``sock_path``
+
+    Failure is only logged, so callers will use ``ovs-vsctl`` instead.
+    """
+    logger = logger or logging.getLogger(__name__)
+    disconnect()
+    client = OVSDBClient(sock_path)
+    try:
+        client.connect()
+    except (OSError, OVSDBError) as exc:
+        client.close()
+        logger.warning('Native OVSDB client is not available, ovs-vsctl will '
+                       'be used: %s', exc)
+        return None
+    logger.debug('Native OVSDB client connected to %s', sock_path)
+    _CLIENT['client'] = client
+    return client
+
+def disconnect():
+    """Close shared connection to ``ovsdb-server``
+    """
+    if _CLIENT['client']:
+        _CLIENT['client'].close()
+        _CLIENT['client'] = None
+
+def get_client():
+    """Return shared client if it is connected, otherwise None
+    """
+    client = _CLIENT['client']
+    return client if client and client.is_connected() else None
@@ -0,0 +1,237 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent session to VPP command line interface.
+
+VPP CLI socket (``unix { cli-listen <path> }``) speaks a telnet-like
+protocol. Session negotiates a dumb terminal with a very large window,
+so VPP neither uses ANSI escape sequences nor pages long outputs, and
+disables the pager explicitly. Every command output is terminated by
+the CLI prompt, which allows several commands to be sent at once and
+their outputs to be split afterwards.
+"""
+
+import logging
+import select
+import socket
+import time
+
+# telnet protocol constants
+_IAC = 255
+_DONT = 254
+_DO = 253
+_WONT = 252
+_WILL = 251
+_SB = 250
+_SE = 240
+_TELOPT_ECHO = 1
+_TELOPT_SGA = 3
+_TELOPT_TTYPE = 24
+_TELOPT_NAWS = 31
+_TTYPE_IS = 0
+
+# terminal type, which is neither ANSI nor the non-interactive 'vppctl' one
+_TERMINAL_TYPE = b'dumb'
+# window height reported to VPP; large value disables paging of long outputs
+_TERMINAL_HEIGHT = 32767
+
+_PROMPT = 'vpp# '
+
+class VppCliError(RuntimeError):
+    """Error of communication with VPP CLI
+    """
+    pass
+
+class VppCli(object):
+    """Session to VPP CLI socket kept open for the whole VPP lifetime.
+    """
+    def __init__(self, sock_path, timeout=10, prompt=_PROMPT):
+        """Initialise session; connection is opened by ``connect()``
+
+        :param sock_path: Path to VPP CLI socket
+        :param timeout: Default timeout of commands in seconds
+        :param prompt: VPP CLI prompt
+        """
+        self.logger = logging.getLogger(__name__)
+        self.sock_path = sock_path
+        self.timeout = timeout
+        self.prompt = prompt
+        self._sock = None
+        self._data = b''
+        self._text = ''
+
+    def connect(self):
+        """Connect to VPP CLI and wait for the first prompt
+
+        :raises: OSError if socket is not accessible,
+                 VppCliError if prompt is not received in time
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.sock_path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._data = b''
+        self._text = ''
+        try:
+            # banner is discarded
+            self._read_outputs(1, time.time() + self.timeout)
+            self.execute('set terminal pager off')
+        except (OSError, VppCliError):
+            self.close()
+            raise
+
+    def close(self):
+        """Close connection to VPP CLI
+        """
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def is_connected(self):
+        """Return True if connection is opened
+        """
+        return self._sock is not None
+
+    def execute(self, command, timeout=None):
+        """Execute a single CLI command
+
+        :param command: Command as a string
+        :param timeout: Timeout in seconds; default timeout is used if None
+
+        :returns: Output of the command
+        """
+        return self.execute_batch([command], timeout)[0]
+
+    def execute_batch(self, commands, timeout=None):
+        """Execute several CLI commands at once
+
+        Commands are pipelined, i.e. all of them are sent before their
+        outputs are read, so VPP executes them without waiting for
+        the client.
+
+        :param commands: List of commands as strings
+        :param timeout: Timeout in seconds for all commands; default
+            timeout is used if None
+
+        :returns: List of outputs in the order of commands
+        :raises: VppCliError if outputs are not received in time,
+                 OSError if connection fails; attribute ``outputs`` of
+                 the exception contains outputs received before the failure,
+                 i.e. outputs of the first commands of the batch
+        """
+        if not self._sock:
+            raise VppCliError('not connected to VPP CLI')
+        if not commands:
+            return []
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        outputs = []
+        try:
+            self._sock.sendall(''.join(command + '\n' for command in commands).encode())
+            self._read_outputs(len(commands), deadline, outputs)
+        except (OSError, VppCliError) as exc:
+            # session state is unknown, so it can't be used anymore
+            self.close()
+            exc.outputs = [_strip_echo(output, command)
+                           for (output, command) in zip(outputs, commands)]
+            raise
+        return [_strip_echo(output, command) for (output, command) in zip(outputs, commands)]
+
+    def _read_outputs(self, count, deadline, outputs=None):
+        """Read ``count`` outputs terminated by the prompt
+
+        :param outputs: List to append outputs to as they are received
+
+        :returns: List of outputs
+        """
+        outputs = [] if outputs is None else outputs
+        count += len(outputs)
+        while len(outputs) < count:
+            index = self._text.find(self.prompt)
+            if index >= 0:
+                outputs.append(self._text[:index])
+                self._text = self._text[index + len(self.prompt):]
+                continue
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([self._sock], [], [], remaining)[0]:
+                raise VppCliError('timeout while waiting for VPP CLI prompt')
+            data = self._sock.recv(65536)
+            if not data:
+                raise VppCliError('connection closed by VPP')
+            self._data += data
+            self._process_data()
+        return outputs
+
+    def _process_data(self):
+        """Handle telnet commands and append received text to the buffer
+        """
+        text = bytearray()
+        data = self._data
+        index = 0
+        while index < len(data):
+            if data[index] != _IAC:
+                text.append(data[index])
+                index += 1
+                continue
+            # incomplete telnet command is processed after more data arrive
+            if index + 1 >= len(data):
+                break
+            command = data[index + 1]
+            if command == _IAC:
+                text.append(_IAC)
+                index += 2
+            elif command in (_DO, _DONT, _WILL, _WONT):
+                if index + 2 >= len(data):
+                    break
+                self._negotiate(command, data[index + 2])
+                index += 3
+            elif command == _SB:
+                end = data.find(bytes([_IAC, _SE]), index)
+                if end < 0:
+                    break
+                if data[index + 2:index + 4] == bytes([_TELOPT_TTYPE, 1]):
+                    self._sock.sendall(bytes([_IAC, _SB, _TELOPT_TTYPE, _TTYPE_IS]) +
+                                       _TERMINAL_TYPE + bytes([_IAC, _SE]))
+                index = end + 2
+            else:
+                index += 2
+        self._data = data[index:]
+        self._text += text.decode('utf-8', 'replace').replace('\r\n', '\n').replace('\r', '')
+
+    def _negotiate(self, command, option):
+        """Reply to telnet option negotiation
+        """
+        if command == _DO and option == _TELOPT_NAWS:
+            height = _TERMINAL_HEIGHT.to_bytes(2, 'big')
+            self._sock.sendall(bytes([_IAC, _WILL, _TELOPT_NAWS, _IAC, _SB, _TELOPT_NAWS,
+                                      0, 80]) + height + bytes([_IAC, _SE]))
+        elif command == _DO and option == _TELOPT_TTYPE:
+            self._sock.sendall(bytes([_IAC, _WILL, _TELOPT_TTYPE]))
+        elif command == _WILL and option in (_TELOPT_ECHO, _TELOPT_SGA):
+            self._sock.sendall(bytes([_IAC, _DO, option]))
+        elif command == _DO:
+            self._sock.sendall(bytes([_IAC, _WONT, option]))
+        elif command == _WILL:
+            self._sock.sendall(bytes([_IAC, _DONT, option]))
+
+def _strip_echo(output, command):
+    """Remove command echoed by VPP from the beginning of its output
+    """
+    (first, _, rest) = output.partition('\n')
+    if first.strip() == command.strip():
+        return rest
+    return output
@@ -28,6 +28,8 @@ from datetime import datetime as dt
 from conf import settings as S
 from conf import merge_spec
 import core.component_factory as component_factory
+from core import search_history
+from core import vswitch_controller
 from core.loader import Loader
 from core.results.results_constants import ResultsConstants
 from tools import tasks
@@ -35,6 +37,7 @@ from tools import hugepages
 from tools import functions
 from tools import namespace
 from tools import veth
+from tools import systeminfo
 from tools.teststepstools import TestStepsTools
 from tools.llc_management import rmd
 
@@ -84,6 +87,7 @@ class TestCase(object):
         self._testcast_run_time = None
         self._versions = []
         self._k8s = False
+        self._pmd_rxq_search = None
         # initialization of step driven specific members
         self._step_check = False    # by default don't check result for step driven testcases
         self._step_vnf_list = {}
@@ -309,17 +313,14 @@ class TestCase(object):
             namespace_list = os.listdir('/tmp/namespaces')
             if namespace_list:
                 self._logger.info('Cleaning up namespaces')
-            for name in namespace_list:
-                namespace.delete_namespace(name)
+            namespace.delete_namespaces(namespace_list)
             os.rmdir('/tmp/namespaces')
         # cleanup any veth ports created
         if os.path.isdir('/tmp/veth'):
             veth_list = os.listdir('/tmp/veth')
             if veth_list:
                 self._logger.info('Cleaning up veth ports')
-            for eth in veth_list:
-                port1, port2 = eth.split('-')
-                veth.del_veth_port(port1, port2)
+            veth.del_veth_ports([eth.split('-') for eth in veth_list])
             os.rmdir('/tmp/veth')
 
     def run_report(self):
@@ -377,6 +378,7 @@ class TestCase(object):
                         self._add_connections()
 
                     self._versions += self._vswitch_ctl.get_vswitch().get_version()
+                    self._set_search_history_key()
 
                     with self._traffic_ctl:
                         # execute test based on TestSteps definition if needed...
@@ -385,6 +387,7 @@ class TestCase(object):
                             # in mind, that clean deployment does not configure
                             # OVS nor executes the traffic
                             if self.deployment != 'clean' and not self._step_send_traffic:
+                                self._search_pmd_rxq_layout()
                                 self._traffic_ctl.send_traffic(self._traffic)
 
                         # dump vswitch flows before they are affected by VNF termination
@@ -406,6 +409,74 @@ class TestCase(object):
         # report test results
         self.run_report()
 
+    def _search_pmd_rxq_layout(self):
+        """Select PMD rxq layout with the highest forwarding rate
+
+        Every rxq layout supported by vSwitch is applied and measured by
+        a short calibration trial. Layouts, which can't be applied or which
+        result in the same assignment of rxqs as a layout measured before,
+        are skipped. Assignment of rxqs measured with the best layout is
+        restored for the rest of the testcase.
+        """
+        if not S.getValue('VSWITCH_PMD_RXQ_SEARCH') or self._vswitch_none:
+            return
+        vswitch = self._vswitch_ctl.get_vswitch()
+        layouts = vswitch.get_rxq_layouts()
+        if not layouts:
+            self._logger.warning('PMD rxq layout search is not supported by %s',
+                                 S.getValue('VSWITCH'))
+            return
+        rates = OrderedDict()
+        rxq_maps = {}
+        for layout in layouts:
+            rxq_map = vswitch.set_rxq_layout(layout)
+            if rxq_map is None:
+                self._logger.warning('PMD rxq layout %s can not be applied, skipping', layout)
+                continue
+            same = [other for other in rxq_maps if rxq_maps[other] == rxq_map]
+            if same:
+                self._logger.info('PMD rxq layout %s assigns rxqs as layout %s, skipping',
+                                  layout, same[0])
+                continue
+            rate = self._traffic_ctl.send_calibration_traffic(
+                self._traffic, S.getValue('VSWITCH_PMD_RXQ_CALIBRATION_DURATION'))
+            if rate is None:
+                self._logger.info('PMD rxq layout search is skipped in mode %s', S.getValue('mode'))
+                return
+            self._logger.info('PMD rxq layout %s: %s', layout, vswitch.get_rxq_mapping())
+            self._logger.info('PMD rxq layout %s: %.0f fps received', layout, rate)
+            rates[layout] = rate
+            rxq_maps[layout] = rxq_map
+        if not rates:
+            self._logger.warning('None of PMD rxq layouts %s can be applied', layouts)
+            return
+        best = max(rates, key=rates.get)
+        # layout itself is not applied again, because e.g. 'cycles' would
+        # be based on rxq cycles measured by the last calibration trial
+        vswitch.set_rxq_mapping(rxq_maps[best])
+        self._pmd_rxq_search = {'layout': best, 'mapping': vswitch.get_rxq_mapping(),
+                                'rates': rates}
+        self._logger.info('PMD rxq layout %s is used: %s', best, self._pmd_rxq_search['mapping'])
+
+    def _set_search_history_key(self):
+        """Set key of this testcase in the history of throughput search
+
+        The key is set only if TRAFFICGEN_RFC2544_SEARCH_HISTORY is enabled.
+        """
+        key = ''
+        if S.getValue('TRAFFICGEN_RFC2544_SEARCH_HISTORY'):
+            version = None
+            for item in self._versions:
+                if item.get()['name'] == S.getValue('VSWITCH'):
+                    version = item
+            if not version and not self._vswitch_none:
+                version = systeminfo.get_version(S.getValue('VSWITCH'))
+            key = search_history.get_key(
+                self.name, self.deployment,
+                '{} {}'.format(version.get()['version'], version.get()['git_tag']) if version
+                else S.getValue('VSWITCH'), S.getValue('TEST_PARAMS'))
+        S.setValue('_SEARCH_HISTORY_KEY', key)
+
     def _append_results(self, results):
         """
         Method appends mandatory Test Case results to list of dictionaries.
@@ -415,6 +486,9 @@ class TestCase(object):
 
         :returns: modified list of dictionaries.
         """
+        startup_timings = {}
+        if not self._vswitch_none:
+            startup_timings = self._vswitch_ctl.get_vswitch().get_startup_timings()
         for item in results:
             item[ResultsConstants.ID] = self.name
             item[ResultsConstants.DEPLOYMENT] = self.deployment
@@ -426,6 +500,14 @@ class TestCase(object):
                 self._testcase_start_time).strftime('%Y-%m-%d %H:%M:%S')
             item[ResultsConstants.TEST_STOP_TIME] = dt.fromtimestamp(
                 self._testcase_stop_time).strftime('%Y-%m-%d %H:%M:%S')
+            for (phase, duration) in startup_timings.items():
+                item[ResultsConstants.VSWITCH_STARTUP_TIME.format(phase)] = '{:.3f}'.format(duration)
+            if self._pmd_rxq_search:
+                item[ResultsConstants.PMD_RXQ_LAYOUT] = self._pmd_rxq_search['layout']
+                item[ResultsConstants.PMD_RXQ_MAPPING] = self._pmd_rxq_search['mapping']
+                for (layout, rate) in self._pmd_rxq_search['rates'].items():
+                    item[ResultsConstants.PMD_RXQ_LAYOUT_RX_FPS.format(layout)] = \
+                        '{:.2f}'.format(rate)
             if self._traffic['multistream']:
                 item[ResultsConstants.SCAL_STREAM_COUNT] = self._traffic['multistream']
                 item[ResultsConstants.SCAL_STREAM_TYPE] = self._traffic['stream_type']
@@ -509,6 +591,9 @@ class TestCase(object):
     def _umount_hugepages(self):
         """Umount hugepages if they were mounted before
         """
+        # hugepages are used by vswitch kept running for the next testcase
+        if vswitch_controller.is_vswitch_warm():
+            self._hugepages_mounted = False
         if self._hugepages_mounted:
             hugepages.umount_hugepages()
             self._hugepages_mounted = False
@@ -0,0 +1,128 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of multistream flow generation.
+
+Flows of a single connection are generated by the original per-stream
+dictionary approach and by the generator from ``src.ovs.flowgen`` and
+written into a flow spool, i.e. into the file processed by
+``ovs-ofctl add-flows``. Generation rate and peak memory usage are
+reported for every stream type. Neither OVS nor root privileges are
+required.
+"""
+
+import argparse
+import os
+import socket
+import time
+import tracemalloc
+
+import netaddr
+
+from conf import settings
+
+_CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+
+_TRAFFIC = {
+    'l2': {'dstmac': '00:00:00:00:00:00'},
+    'l3': {'dstip': '2.2.2.2', 'proto': 'udp'},
+    'l4': {'dstport': 3000},
+    'pre_installed_flows': 'Yes',
+}
+
+def legacy_flows(flow, traffic):
+    """Return list of stream specific flows as dictionaries
+
+    It is the original implementation of IVSwitchOvs._prepare_flows().
+    """
+    flows = []
+    for stream in range(traffic['multistream']):
+        tmp_flow = flow.copy()
+        if traffic['stream_type'] == 'L2':
+            dst_mac_value = netaddr.EUI(traffic['l2']['dstmac']).value
+            tmp_mac = netaddr.EUI(dst_mac_value + stream)
+            tmp_mac.dialect = netaddr.mac_unix_expanded
+            tmp_flow.update({'dl_dst':tmp_mac})
+        elif traffic['stream_type'] == 'L3':
+            dst_ip_value = netaddr.IPAddress(traffic['l3']['dstip']).value
+            tmp_ip = netaddr.IPAddress(dst_ip_value + stream)
+            tmp_flow.update({'dl_type':'0x0800', 'nw_dst':tmp_ip})
+        elif traffic['stream_type'] == 'L4':
+            tmp_flow.update({'dl_type':'0x0800',
+                             'nw_proto':socket.getprotobyname(traffic['l3']['proto'].lower()),
+                             'tp_dst':(traffic['l4']['dstport'] + stream) % 65536})
+        flows.append(tmp_flow)
+    return flows
+
+def bench_legacy(flow, traffic):
+    """Generate flows by original implementation and write them into spool
+    """
+    # ofctl depends on configuration loaded by main()
+    from src.ovs import ofctl
+
+    spool = ofctl.FlowSpool('bench')
+    for tmp_flow in legacy_flows(flow, traffic):
+        spool.write(ofctl.flow_key(tmp_flow))
+    spool.close()
+    return spool
+
+def bench_flowgen(flow, traffic):
+    """Generate flows by flowgen module and write them into spool
+    """
+    from src.ovs import ofctl, flowgen
+
+    spool = ofctl.FlowSpool('bench')
+    for flow_str in flowgen.multistream_flows(flow, traffic):
+        spool.write(flow_str)
+    spool.close()
+    return spool
+
+def measure(function, flow, traffic):
+    """Return (duration, peak memory in MB, content of spool) of function call
+    """
+    tracemalloc.start()
+    start = time.time()
+    spool = function(flow, traffic)
+    duration = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    with open(spool.files[0][0]) as spool_file:
+        content = spool_file.read()
+    spool.remove()
+    return (duration, peak, content)
+
+def main():
+    """Run benchmark and print results
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--streams', type=int, default=100000, help='number of streams')
+    parser.add_argument('--stream-types', default='L2,L3,L4',
+                        help='comma separated list of stream types')
+    args = parser.parse_args()
+
+    settings.load_from_dir(os.path.join(_CURR_DIR, '../../conf'))
+    flow = dict(settings.getValue('OVS_FLOW_TEMPLATE'), in_port='1', actions=['output:2'])
+    print('Generation of {} flows'.format(args.streams))
+    for stream_type in args.stream_types.split(','):
+        traffic = dict(_TRAFFIC, multistream=args.streams, stream_type=stream_type)
+        (legacy_time, legacy_peak, expected) = measure(bench_legacy, flow, traffic)
+        (flowgen_time, flowgen_peak, content) = measure(bench_flowgen, flow, traffic)
+        assert content == expected, 'generated flows differ'
+        for (name, duration, peak) in [('legacy', legacy_time, legacy_peak),
+                                       ('flowgen', flowgen_time, flowgen_peak)]:
+            print('  {} {:8} {:12.0f} flows/s {:8.1f} MB peak'.format(
+                stream_type, name, args.streams / duration if duration else 0, peak))
+
+if __name__ == "__main__":
+    main()
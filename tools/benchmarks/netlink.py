@@ -0,0 +1,100 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of veth pair creation and deletion.
+
+N veth pairs are created, brought up and deleted inside a scratch network
+namespace, so the host configuration is not touched. Every pass is
+measured by ``ip`` process executed per operation, by a single
+``ip -batch`` process and by a netlink batch sent directly by VSPERF.
+Root privileges are required; netlink is skipped if it is not available.
+"""
+
+import argparse
+import os
+import subprocess
+import time
+
+from conf import settings
+from tools import netlink
+
+_CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+
+def bench_ip(netns, pairs):
+    """Measure configuration by ``ip`` process executed per operation
+    """
+    cmd = ['ip', '-n', netns, 'link']
+    start = time.time()
+    for (port, peer) in pairs:
+        subprocess.check_call(cmd + ['add', port, 'type', 'veth', 'peer', 'name', peer])
+        subprocess.check_call(cmd + ['set', 'dev', port, 'up'])
+    created = time.time()
+    for (port, _) in pairs:
+        subprocess.check_call(cmd + ['del', port])
+    return (created - start, time.time() - created)
+
+def bench_batch(iproute, pairs):
+    """Measure configuration by batch of given backend
+    """
+    start = time.time()
+    with iproute.batch():
+        for (port, peer) in pairs:
+            iproute.link_add_veth(port, peer)
+            iproute.link_set(port, up=True)
+    created = time.time()
+    with iproute.batch():
+        for (port, _) in pairs:
+            iproute.link_del(port)
+    return (created - start, time.time() - created)
+
+def count_links(netns):
+    """Return number of links in namespace
+    """
+    return len(subprocess.check_output(['ip', '-n', netns, '-o', 'link']).splitlines())
+
+def main():
+    """Run benchmark and print results
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pairs', type=int, default=100, help='number of veth pairs')
+    parser.add_argument('--netns', default='vsperf_bench_{}'.format(os.getpid()),
+                        help='name of scratch namespace')
+    args = parser.parse_args()
+
+    settings.load_from_dir(os.path.join(_CURR_DIR, '../../conf'))
+    pairs = [('vbench{}a'.format(i), 'vbench{}b'.format(i)) for i in range(args.pairs)]
+    subprocess.check_call(['ip', 'netns', 'add', args.netns])
+    results = []
+    try:
+        links = count_links(args.netns)
+        results.append(('ip', bench_ip(args.netns, pairs)))
+        results.append(('ip-batch', bench_batch(netlink.IPCommand(args.netns, sudo=False),
+                                                pairs)))
+        if netlink.is_available():
+            iproute = netlink.IPRoute(args.netns)
+            try:
+                results.append(('netlink', bench_batch(iproute, pairs)))
+            finally:
+                iproute.close()
+        assert count_links(args.netns) == links, 'veth pairs were not deleted'
+    finally:
+        subprocess.check_call(['ip', 'netns', 'delete', args.netns])
+
+    print('Creation and deletion of {} veth pairs'.format(args.pairs))
+    for (name, (create, delete)) in results:
+        print('  {:8} create {:.4f} s  delete {:.4f} s {:10.0f} pairs/s'.format(
+            name, create, delete, args.pairs / (create + delete) if create + delete else 0))
+
+if __name__ == "__main__":
+    main()
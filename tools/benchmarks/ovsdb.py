@@ -0,0 +1,140 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of bridge and port setup by ovs-vsctl and native OVSDB client.
+
+A private ``ovsdb-server`` with a scratch database is started inside
+a temporary directory, so neither root privileges nor running OVS are
+required. ``ovs-vswitchd`` is not started, so all commands are executed
+without waiting for its reconfiguration (i.e. ``ovs-vsctl --no-wait``).
+Content of the database created by the native client is verified by
+``ovs-vsctl``.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from conf import settings
+
+_CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+
+def start_ovsdb(args, tmp_dir):
+    """Create scratch database and start ``ovsdb-server`` on top of it
+    """
+    db_file = os.path.join(tmp_dir, 'conf.db')
+    sock_path = os.path.join(tmp_dir, 'db.sock')
+    subprocess.check_call([args.ovsdb_tool, 'create', db_file, args.schema])
+    proc = subprocess.Popen([args.ovsdb_server, db_file,
+                             '--remote=punix:' + sock_path,
+                             '--unixctl=' + os.path.join(tmp_dir, 'ovsdb-server.ctl')])
+    for _ in range(100):
+        if os.path.exists(sock_path):
+            break
+        time.sleep(0.05)
+    return (proc, sock_path)
+
+def vsctl(args, sock_path, cmd):
+    """Execute ``ovs-vsctl`` connected to the scratch database
+    """
+    return subprocess.check_output([args.vsctl, '--db=unix:' + sock_path,
+                                    '--no-wait'] + cmd).decode()
+
+def get_commands(bridges, ports):
+    """Return list of ``ovs-vsctl`` commands creating bridges and vhost ports
+    """
+    commands = []
+    for bridge in range(bridges):
+        br_name = 'br{}'.format(bridge)
+        commands.append(['add-br', br_name, '--', 'set', 'bridge', br_name,
+                         'datapath_type=netdev'])
+        for port in range(ports):
+            port_name = 'dpdkvhostuserclient{}'.format(bridge * ports + port)
+            commands.append(['add-port', br_name, port_name, '--', 'set', 'Interface',
+                             port_name, 'type=dpdkvhostuserclient',
+                             'options:vhost-server-path=/tmp/' + port_name])
+    return commands
+
+def bench_vsctl(args, sock_path, commands):
+    """Measure execution of ``commands`` by ``ovs-vsctl`` processes
+    """
+    start = time.time()
+    for cmd in commands:
+        vsctl(args, sock_path, cmd)
+    return time.time() - start
+
+def bench_native(sock_path, commands):
+    """Measure execution of ``commands`` by native OVSDB client
+    """
+    # ovsdb depends on configuration loaded by main()
+    from src.ovs import ovsdb
+
+    start = time.time()
+    client = ovsdb.OVSDBClient(sock_path)
+    client.connect()
+    for cmd in commands:
+        client.run_vsctl(cmd, wait=False)
+    client.close()
+    return time.time() - start
+
+def cleanup(args, sock_path, bridges):
+    """Remove all bridges from the database
+    """
+    for bridge in range(bridges):
+        vsctl(args, sock_path, ['del-br', 'br{}'.format(bridge)])
+
+def main():
+    """Run benchmark and print results
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bridges', type=int, default=2, help='number of bridges')
+    parser.add_argument('--ports', type=int, default=100, help='number of ports per bridge')
+    parser.add_argument('--ovsdb-server', default='ovsdb-server', help='ovsdb-server binary')
+    parser.add_argument('--ovsdb-tool', default='ovsdb-tool', help='ovsdb-tool binary')
+    parser.add_argument('--vsctl', default='ovs-vsctl', help='ovs-vsctl binary')
+    parser.add_argument('--schema', default='/usr/share/openvswitch/vswitch.ovsschema',
+                        help='OVSDB schema of Open_vSwitch database')
+    args = parser.parse_args()
+
+    settings.load_from_dir(os.path.join(_CURR_DIR, '../../conf'))
+    commands = get_commands(args.bridges, args.ports)
+    tmp_dir = tempfile.mkdtemp(prefix='vsperf_ovsdb_')
+    (proc, sock_path) = start_ovsdb(args, tmp_dir)
+    try:
+        vsctl(args, sock_path, ['init'])
+        vsctl_time = bench_vsctl(args, sock_path, commands)
+        expected = vsctl(args, sock_path, ['show'])
+        cleanup(args, sock_path, args.bridges)
+
+        native_time = bench_native(sock_path, commands)
+        # ports are listed by show in order of their UUIDs, so compare sorted lines
+        assert sorted(vsctl(args, sock_path, ['show']).splitlines()[1:]) == \
+            sorted(expected.splitlines()[1:]), 'database content differs'
+        cleanup(args, sock_path, args.bridges)
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(tmp_dir)
+
+    print('Setup of {} bridges with {} ports each ({} commands)'.format(
+        args.bridges, args.ports, len(commands)))
+    for (name, duration) in [('ovs-vsctl', vsctl_time), ('native', native_time)]:
+        print('  {:10} {:.4f} s ({:.1f}x)'.format(
+            name, duration, vsctl_time / duration if duration else 0))
+
+if __name__ == "__main__":
+    main()
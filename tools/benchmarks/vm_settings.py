@@ -0,0 +1,138 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of VM settings expansion (#VMINDEX, #MAC, #IP and #EVAL macros).
+
+Regex based expansion used by VSPERF before introduction of compiled
+templates is compared with the current implementation of
+``Settings.check_vm_settings``.
+"""
+
+import argparse
+import ast
+import os
+import re
+import time
+
+import netaddr
+
+from conf import settings
+# pylint: disable=protected-access
+from conf import _PARSE_PATTERN
+
+_CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+
+def regex_expansion(master_value, vm_number):
+    """Expand ``master_value`` by the original regex based algorithm
+    """
+    result = []
+    master_value_str = str(master_value)
+    for vmindex in range(vm_number):
+        value = master_value_str.replace('#VMINDEX', str(vmindex))
+        for macro, args, param, _, step in re.findall(_PARSE_PATTERN, value):
+            multi = int(step) if step and int(step) else 1
+            if macro == '#EVAL':
+                # pylint: disable=eval-used
+                tmp_result = str(eval(param))
+            elif macro == '#MAC':
+                mac_value = netaddr.EUI(param).value
+                mac = netaddr.EUI(mac_value + vmindex * multi)
+                mac.dialect = netaddr.mac_unix_expanded
+                tmp_result = str(mac)
+            else:
+                ip_value = netaddr.IPAddress(param).value
+                tmp_result = str(netaddr.IPAddress(ip_value + vmindex * multi))
+            value = value.replace("{}{}".format(macro, args), tmp_result)
+        if not isinstance(master_value, str):
+            value = ast.literal_eval(value)
+        result.append(value)
+    return result
+
+def get_master_values():
+    """Return master values of GUEST_ settings items with configuration macros
+    """
+    master_values = {}
+    for key in settings.__dict__:
+        value = settings.getValue(key)
+        if key.startswith('GUEST_') and '#' in str(value):
+            master_values[key] = value if isinstance(value, str) else value[0]
+    return master_values
+
+def bench_regex(master_values, vm_number, rounds):
+    """Measure original expansion of all ``master_values``
+    """
+    start = time.time()
+    for _ in range(rounds):
+        for master_value in master_values.values():
+            regex_expansion(master_value, vm_number)
+    return time.time() - start
+
+def bench_templates(master_values, vm_number, rounds, compiled):
+    """Measure expansion of all ``master_values`` by compiled templates
+    """
+    # pylint: disable=protected-access
+    start = time.time()
+    for _ in range(rounds):
+        if not compiled:
+            settings._vm_templates.clear()
+        for (key, master_value) in master_values.items():
+            settings._get_vm_expansion(key, master_value, vm_number)
+    return time.time() - start
+
+def bench_check_vm_settings(vm_number, rounds):
+    """Measure check_vm_settings() with cached expansions
+    """
+    start = time.time()
+    for _ in range(rounds):
+        settings.push_layer()
+        settings.check_vm_settings(vm_number)
+        settings.pop_layer()
+    return time.time() - start
+
+def main():
+    """Run benchmark and print results
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vms', type=int, default=16, help='number of VMs')
+    parser.add_argument('--rounds', type=int, default=50,
+                        help='number of repeated expansions, e.g. testcases')
+    args = parser.parse_args()
+
+    settings.load_from_dir(os.path.join(_CURR_DIR, '../../conf'))
+    master_values = get_master_values()
+
+    # verify, that both implementations produce identical results
+    settings.push_layer()
+    settings.check_vm_settings(args.vms)
+    for (key, master_value) in master_values.items():
+        expected = regex_expansion(master_value, args.vms)
+        value = settings.getValue(key)
+        if isinstance(value, list):
+            assert value == expected, key
+        else:
+            assert value == expected[0], key
+    settings.pop_layer()
+
+    results = [('regex', bench_regex(master_values, args.vms, args.rounds)),
+               ('template', bench_templates(master_values, args.vms, args.rounds, False)),
+               ('compiled', bench_templates(master_values, args.vms, args.rounds, True)),
+               ('cached', bench_check_vm_settings(args.vms, args.rounds))]
+    print('Expansion of {} items for {} VMs, {} rounds'.format(
+        len(master_values), args.vms, args.rounds))
+    for (name, duration) in results:
+        print('  {:10} {:.4f} s ({:.1f}x)'.format(
+            name, duration, results[0][1] / duration if duration else 0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of VPP CLI commands executed by vppctl and persistent session.
+
+By default a fake VPP CLI server is started at a temporary socket. It
+negotiates telnet options, echoes commands and replies with canned
+outputs, so neither VPP nor root privileges are required. Commands are
+executed by a single persistent session one by one and in batches. If
+``--vppctl`` is given, the same commands are also executed by ``vppctl``
+processes connected to the fake server. Use ``--socket`` to run the
+benchmark against a real VPP instead.
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from src.vpp import VppCli
+
+_BANNER = b'\r\n    _______    _        _   _____  ___ \r\n vpp CLI (fake)\r\n\r\n'
+_OUTPUT = ('              Name                Idx   Link  Hardware\n'
+           'TenGigabitEthernet5/0/0            1     up   TenGigabitEthernet5/0/0\n'
+           '  Link speed: 10 Gbps\n'
+           '  Ethernet address 3c:fd:fe:9c:8a:40\n')
+
+class FakeVppCli(threading.Thread):
+    """Fake VPP CLI server listening at unix socket
+    """
+    def __init__(self, sock_path):
+        super().__init__(daemon=True)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(sock_path)
+        self._server.listen(16)
+
+    def run(self):
+        while True:
+            try:
+                (conn, _) = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _serve(conn):
+        """Serve a single client connection
+        """
+        # IAC WILL ECHO, IAC WILL SGA, IAC DO NAWS, IAC DO TTYPE
+        conn.sendall(bytes([255, 251, 1, 255, 251, 3, 255, 253, 31, 255, 253, 24]) +
+                     _BANNER + b'vpp# ')
+        data = b''
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except OSError:
+                break
+            if not chunk:
+                break
+            data += chunk
+            # telnet replies of the client are ignored
+            while b'\n' in data:
+                (line, data) = data.split(b'\n', 1)
+                line = bytes(byte for byte in line if byte < 128).strip()
+                if not line:
+                    continue
+                reply = line + b'\r\n'
+                if line.startswith(b'show'):
+                    reply += _OUTPUT.replace('\n', '\r\n').encode()
+                reply += b'vpp# '
+                conn.sendall(reply)
+                if line == b'quit':
+                    conn.close()
+                    return
+        conn.close()
+
+    def stop(self):
+        """Stop accepting new connections
+        """
+        self._server.close()
+
+def bench_session(sock_path, commands, batch):
+    """Measure execution of ``commands`` by persistent session
+    """
+    cli = VppCli(sock_path)
+    cli.connect()
+    start = time.time()
+    if batch:
+        outputs = cli.execute_batch(commands)
+    else:
+        outputs = [cli.execute(command) for command in commands]
+    duration = time.time() - start
+    cli.close()
+    return (duration, outputs)
+
+def bench_vppctl(vppctl, sock_path, commands):
+    """Measure execution of ``commands`` by ``vppctl`` processes
+    """
+    start = time.time()
+    for command in commands:
+        subprocess.check_output([vppctl, '-s', sock_path] + command.split())
+    return time.time() - start
+
+def main():
+    """Run benchmark and print results
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=1000, help='number of commands')
+    parser.add_argument('--socket', help='VPP CLI socket; fake server is used if not set')
+    parser.add_argument('--vppctl', help='vppctl binary; vppctl is not measured if not set')
+    args = parser.parse_args()
+
+    commands = ['show hardware-interfaces'] * args.commands
+    tmp_dir = None
+    server = None
+    sock_path = args.socket
+    if not sock_path:
+        tmp_dir = tempfile.mkdtemp(prefix='vsperf_vppcli_')
+        sock_path = os.path.join(tmp_dir, 'cli.sock')
+        server = FakeVppCli(sock_path)
+        server.start()
+    results = []
+    try:
+        if args.vppctl:
+            results.append(('vppctl', bench_vppctl(args.vppctl, sock_path, commands)))
+        (single_time, single_outputs) = bench_session(sock_path, commands, False)
+        (batch_time, batch_outputs) = bench_session(sock_path, commands, True)
+        assert single_outputs == batch_outputs, 'outputs of commands differ'
+        results.extend([('session', single_time), ('batch', batch_time)])
+    finally:
+        if server:
+            server.stop()
+            shutil.rmtree(tmp_dir)
+
+    print('Execution of {} commands'.format(args.commands))
+    for (name, duration) in results:
+        print('  {:8} {:.4f} s {:10.0f} commands/s'.format(
+            name, duration, args.commands / duration if duration else 0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Privileged command broker.
+
+Broker is a long-lived process started once per VSPERF run by sudo. It
+executes commands sent over a local UNIX socket with root privileges,
+so VSPERF doesn't have to spawn a new sudo process for every privileged
+command. Only commands with binaries from the allow-list are executed;
+the allow-list contains absolute paths resolved at broker startup and
+binaries must match them exactly. Only connections from the user, who
+has started the broker, are accepted.
+
+Protocol is line based. Every request and response is a single line
+with JSON encoded dictionary:
+
+    request:  {"cmd": ["/usr/bin/ovs-vsctl", "show"], "timeout": 10}
+    response: {"returncode": 0, "stdout": "<base64>", "stderr": "<base64>"}
+
+Response to a request exceeding its timeout contains ``"timeout": true``.
+Request ``{"shutdown": true}`` terminates the broker.
+
+NOTE: This module is executed by sudo as a standalone script, so it must
+not import any VSPERF modules.
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+
+# options of taskset allowed by is_unsafe(); one of them must select a pid
+_TASKSET_OPTIONS = frozenset(['-c', '--cpu-list', '-p', '--pid', '-cp', '-pc'])
+_TASKSET_PID_OPTIONS = frozenset(['-p', '--pid', '-cp', '-pc'])
+
+def _encode(data):
+    """Encode bytes to be sent inside JSON message
+    """
+    return base64.b64encode(data).decode('ascii')
+
+def _decode(data):
+    """Decode bytes received inside JSON message
+    """
+    return base64.b64decode(data.encode('ascii'))
+
+def resolve(binary):
+    """Return canonical absolute path of ``binary`` or None if it is not found
+
+    Binaries without a path are looked up in PATH.
+    """
+    path = binary if os.path.isabs(binary) else shutil.which(binary)
+    return os.path.realpath(path) if path else None
+
+def resolve_allowed(allowed):
+    """Return set of canonical absolute paths of allowed binaries
+    """
+    return set(path for path in map(resolve, allowed) if path)
+
+def is_unsafe(cmd):
+    """Check if allowed binary is asked to execute another command
+
+    ``ip netns exec`` and ``ip -batch`` (which may contain ``netns exec``)
+    would execute any command, so they are refused. ``ip`` accepts
+    abbreviated keywords, so any abbreviation of ``exec`` is refused.
+    ``taskset`` is allowed only to change affinity of an existing process,
+    i.e. ``taskset [-c] -p <mask> <pid>``; other forms execute a command.
+    """
+    name = os.path.basename(cmd[0])
+    if name == 'ip':
+        return any(arg.startswith('-b') or (arg and 'exec'.startswith(arg))
+                   for arg in cmd[1:])
+    if name == 'taskset':
+        options = [arg for arg in cmd[1:] if arg.startswith('-')]
+        params = [arg for arg in cmd[1:] if not arg.startswith('-')]
+        return not (set(options) <= _TASKSET_OPTIONS and
+                    set(options) & _TASKSET_PID_OPTIONS and
+                    len(params) == 2 and params[1].isdigit())
+    return False
+
+#
+# client side
+#
+def is_allowed(cmd, allowed):
+    """Check if sudo command ``cmd`` can be executed by broker
+
+    Only plain ``sudo <binary> [args]`` commands without sudo options
+    are supported.
+
+    :param cmd: Command as a list of strings
+    :param allowed: Set of canonical absolute paths of allowed binaries,
+        see resolve_allowed(); binary must match exactly
+    """
+    return (len(cmd) > 1 and cmd[0] == 'sudo' and not cmd[1].startswith('-') and
+            resolve(cmd[1]) in allowed and not is_unsafe([resolve(cmd[1])] + cmd[2:]))
+
+def encode_request(cmd, timeout=None):
+    """Return request for execution of ``cmd`` without leading sudo
+
+    The binary is sent with its canonical absolute path.
+    """
+    return (json.dumps({'cmd': [resolve(cmd[1])] + cmd[2:], 'timeout': timeout}) +
+            '\n').encode()
+
+def decode_response(line):
+    """Return (returncode, stdout, stderr) from broker response
+
+    :raises: subprocess.TimeoutExpired if command has exceeded its timeout
+    """
+    response = json.loads(line.decode())
+    stdout = _decode(response['stdout'])
+    stderr = _decode(response['stderr'])
+    if response.get('timeout'):
+        raise subprocess.TimeoutExpired(response['cmd'], response['timeout'],
+                                        output=stdout, stderr=stderr)
+    return (response['returncode'], stdout, stderr)
+
+def request(socket_path, message, timeout=None):
+    """Send request to the broker and return the response line
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(message)
+        with sock.makefile('rb') as sock_file:
+            return sock_file.readline()
+
+def shutdown(socket_path):
+    """Ask the broker to terminate
+    """
+    request(socket_path, (json.dumps({'shutdown': True}) + '\n').encode(), timeout=5)
+
+#
+# server side
+#
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Executes commands received from VSPERF
+    """
+    def handle(self):
+        creds = self.request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                        struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        if uid not in (0, self.server.uid):
+            return
+
+        for line in self.rfile:
+            message = json.loads(line.decode())
+            if message.get('shutdown'):
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            response = self._execute(message['cmd'], message.get('timeout'))
+            self.wfile.write((json.dumps(response) + '\n').encode())
+
+    def _execute(self, cmd, timeout):
+        """Execute command and return response dictionary
+        """
+        response = {'cmd': cmd, 'returncode': None, 'stdout': '', 'stderr': ''}
+        # binary must be given by absolute path matching the allow-list exactly
+        path = os.path.realpath(cmd[0]) if cmd and os.path.isabs(cmd[0]) else None
+        if path not in self.server.allowed or is_unsafe([path] + cmd[1:]):
+            response['returncode'] = 126
+            response['stderr'] = _encode(
+                'broker: command {} is not allowed\n'.format(cmd).encode())
+            return response
+
+        try:
+            proc = subprocess.Popen(cmd, executable=path, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE)
+        except OSError as ex:
+            response['returncode'] = 127
+            response['stderr'] = _encode('broker: {}\n'.format(ex).encode())
+            return response
+
+        try:
+            (stdout, stderr) = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            (stdout, stderr) = proc.communicate()
+            response['timeout'] = timeout
+        response['returncode'] = proc.returncode
+        response['stdout'] = _encode(stdout)
+        response['stderr'] = _encode(stderr)
+        return response
+
+class _BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threading server, so independent commands can be executed in parallel
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, uid, allowed):
+        self.uid = uid
+        # paths are resolved once, so later changes of PATH or symlinks
+        # don't extend the allow-list
+        self.allowed = resolve_allowed(path for path in allowed if os.path.isabs(path))
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+def serve(socket_path, uid, allowed):
+    """Run the broker until shutdown request is received
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _BrokerServer(socket_path, uid, allowed)
+    os.chown(socket_path, uid, -1)
+    os.chmod(socket_path, 0o600)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+def main():
+    """Parse arguments and run the broker
+    """
+    parser = argparse.ArgumentParser(description='VSPERF privileged command broker')
+    parser.add_argument('--socket', required=True, help='path to UNIX socket')
+    parser.add_argument('--uid', type=int, required=True,
+                        help='ID of user allowed to connect')
+    parser.add_argument('--allow', required=True,
+                        help='comma separated list of absolute paths of allowed binaries')
+    args = parser.parse_args()
+    serve(args.socket, args.uid, set(args.allow.split(',')))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,3 +16,4 @@
 """
 
 from tools.collectors.collector.collector import *
+from tools.collectors.collector.periodic import *
@@ -0,0 +1,181 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Abstract collector of periodically sampled counters.
+
+Counters are sampled by a background thread between calls of start() and
+stop(). Traffic generators execute trials of RFC2544 searches internally,
+so trials are detected from the counters themselves: a trial starts with
+the first sample showing traffic activity and ends with the first idle
+sample. Differences of counters between samples are stored as a time
+series and summarized for every trial.
+"""
+
+import csv
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from tools.collectors.collector import collector
+
+class ICollectorPeriodic(collector.ICollector):
+    """Abstract collector of counters sampled in given interval
+
+    Implementations sample counters by ``_sample()`` and decide about
+    traffic activity by ``_is_active()``. Summary of every trial is
+    created by ``_summarize()``.
+    """
+    def __init__(self, interval, series_file, trials_file):
+        """Initialize collector
+
+        :param interval: Sampling interval in seconds
+        :param series_file: CSV file for time series of counter deltas
+        :param trials_file: CSV file for trial summaries
+        """
+        self._logger = logging.getLogger(__name__)
+        self._interval = interval
+        self._series_file = series_file
+        self._trials_file = trials_file
+        self._results = OrderedDict()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _sample(self):
+        """Return cumulative counters
+
+        :returns: Dictionary with counter values indexed by tuple
+            (group, object, counter), e.g. (thread, node, 'vectors')
+        """
+        raise NotImplementedError('Please call an implementation.')
+
+    def _is_active(self, deltas):
+        """Return True if counter deltas show traffic activity
+
+        :param deltas: Dictionary of counter deltas indexed like ``_sample()``
+        """
+        raise NotImplementedError('Please call an implementation.')
+
+    def _summarize(self, deltas, duration):
+        """Return summary of a single trial
+
+        :param deltas: Dictionary of counter deltas for the whole trial
+        :param duration: Trial duration in seconds
+
+        :returns: List of (key, OrderedDict of statistics) tuples
+        """
+        raise NotImplementedError('Please call an implementation.')
+
+    def _clear(self):
+        """Clear counters after the trial; counters are kept by default
+        """
+        pass
+
+    def start(self):
+        """Start sampling of counters in the background
+        """
+        self._results = OrderedDict()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and store summary of all trials
+        """
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self._logger.info('Time series of counters available at %s', self._series_file)
+
+    def get_results(self):
+        """Returns summary of trials
+        """
+        return self._results
+
+    def print_results(self):
+        """Logs summary of trials
+        """
+        for (key, stats) in self._results.items():
+            logging.info("Trial: %s", key)
+            for (stat, value) in stats.items():
+                logging.info("         Statistic: %s, Value: %s", stat, value)
+
+    def _run(self):
+        """Sample counters until collector is stopped
+        """
+        with open(self._series_file, 'w') as series_file, \
+             open(self._trials_file, 'w') as trials_file:
+            series = csv.writer(series_file)
+            series.writerow(['time', 'trial', 'group', 'object', 'counter', 'delta'])
+            trials = csv.writer(trials_file)
+            trials.writerow(['trial', 'key', 'statistic', 'value'])
+            try:
+                start = time.time()
+                prev = self._sample()
+                prev_time = start
+                trial = 0
+                trial_start = None
+                while not self._stop_event.wait(self._interval):
+                    curr = self._sample()
+                    now = time.time()
+                    deltas = _get_deltas(prev, curr)
+                    active = self._is_active(deltas)
+                    if active and trial_start is None:
+                        trial += 1
+                        trial_start = (prev_time, prev)
+                    for (key, value) in deltas.items():
+                        if value:
+                            series.writerow(['{:.3f}'.format(now - start),
+                                             trial if active else ''] + list(key) +
+                                            [_format_value(value)])
+                    if not active and trial_start is not None:
+                        self._store_trial(trials, trial, trial_start, (now, curr))
+                        trial_start = None
+                        self._clear()
+                        curr = self._sample()
+                        now = time.time()
+                    (prev, prev_time) = (curr, now)
+                if trial_start is not None:
+                    self._store_trial(trials, trial, trial_start, (prev_time, prev))
+            except (OSError, RuntimeError) as exc:
+                self._logger.warning('Sampling of counters has failed: %s', exc)
+
+    def _store_trial(self, trials, trial, first, last):
+        """Summarize trial and store it into results and trials file
+        """
+        summary = self._summarize(_get_deltas(first[1], last[1]), last[0] - first[0])
+        for (key, stats) in summary:
+            self._results['trial_{}_{}'.format(trial, key)] = stats
+            for (stat, value) in stats.items():
+                trials.writerow([trial, key, stat, _format_value(value)])
+
+def _get_deltas(prev, curr):
+    """Return differences of cumulative counters
+
+    Counters missing in ``prev`` or decreased since ``prev`` (e.g. cleared)
+    are considered to start from zero.
+    """
+    deltas = OrderedDict()
+    for (key, value) in curr.items():
+        old = prev.get(key, 0)
+        deltas[key] = value - old if value >= old else value
+    return deltas
+
+def _format_value(value):
+    """Format counter or statistic value for CSV file
+    """
+    if isinstance(value, float):
+        return '{:.6g}'.format(value)
+    return value
@@ -0,0 +1,185 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""module for collection of OVS DPDK PMD statistics
+
+Samples ``dpif-netdev/pmd-stats-show``, ``dpif-netdev/pmd-perf-show`` and
+``dpif-netdev/pmd-rxq-show`` of OVS started by OvsDpdkVhost between calls
+of start() and stop(). For every trial, i.e. for every period with
+packets received by PMD threads, processing cycles per packet, idle
+percentage and EMC/SMC/megaflow hit rates of every PMD thread are
+reported together with the imbalance of load among PMD threads and
+their rxq assignment. PMD counters are cleared after every trial.
+
+This requires the following setting in your config:
+
+* OVS_PMD_SAMPLE_INTERVAL = 1
+    sampling interval in seconds
+
+* LOG_FILE_OVS_PMD = 'ovs_pmd'
+    prefix of CSV files with the time series of counter deltas and
+    with the summary of trials; they are stored separately for every
+    testcase in the directory with results
+"""
+
+import os
+import re
+from collections import OrderedDict
+
+from conf import settings
+from src.ovs.ofctl import OFBase, parse_pmd_rxqs
+from tools.collectors.collector import periodic
+
+# e.g. "pmd thread numa_id 0 core_id 2:" or "main thread:"
+_THREAD = re.compile(r'^(?:pmd thread numa_id \d+ core_id (\d+)|(main) thread):')
+# e.g. "  emc hits: 1000", "  - EMC hits:   1000  ( 99.9 %)" or "  idle cycles:12345 (90.00%)"
+_COUNTER = re.compile(r'^\s+(?:- )?([A-Za-z][\w .]*?):\s*(\d+)(?![\d.])')
+
+# names of counters in various OVS versions
+_PACKETS = ('packets received',)
+_RECIRCULATIONS = ('packet recirculations',)
+_EMC_HITS = ('emc hits',)
+_SMC_HITS = ('smc hits',)
+_MEGAFLOW_HITS = ('megaflow hits',)
+_UPCALLS = ('miss with success upcall', 'miss')
+_LOST_UPCALLS = ('miss with failed upcall', 'lost')
+_IDLE_CYCLES = ('idle cycles',)
+_PROCESSING_CYCLES = ('processing cycles',)
+
+class OvsPmd(periodic.ICollectorPeriodic):
+    """A logger of OVS DPDK PMD statistics
+
+    Statistics are read by ``ovs-appctl``.
+    """
+    def __init__(self, results_dir, test_name):
+        """
+        Initialize collection of statistics
+        """
+        log_file = os.path.join(results_dir, settings.getValue('LOG_FILE_OVS_PMD') +
+                                '_' + test_name)
+        super().__init__(settings.getValue('OVS_PMD_SAMPLE_INTERVAL'),
+                         log_file + '.csv', log_file + '_trials.csv')
+        self._ovs = OFBase()
+        self._rxqs = {}
+
+    def _run_appctl(self, args):
+        """Return output of ``ovs-appctl``; output of failed command is empty
+        """
+        (output, error) = self._ovs.run_appctl(args)
+        return '' if error else output
+
+    def _sample(self):
+        """Read PMD statistics and rxq assignment
+        """
+        counters = _parse_counters(self._run_appctl(['dpif-netdev/pmd-stats-show']), 'stats')
+        counters.update(_parse_counters(self._run_appctl(['dpif-netdev/pmd-perf-show']),
+                                        'perf'))
+        rxqs = parse_pmd_rxqs(self._run_appctl(['dpif-netdev/pmd-rxq-show']))
+        self._rxqs = {'pmd_core_{}'.format(core): rxq_list for (core, rxq_list) in rxqs.items()}
+        return counters
+
+    def _clear(self):
+        """Clear PMD statistics, so every trial starts from zero
+        """
+        self._run_appctl(['dpif-netdev/pmd-stats-clear'])
+
+    def _is_active(self, deltas):
+        """Traffic is active if any PMD thread has received packets
+        """
+        return any(value for ((thread, obj, counter), value) in deltas.items()
+                   if thread.startswith('pmd') and obj == 'stats' and counter in _PACKETS)
+
+    def _summarize(self, deltas, duration):
+        """Return summary of every PMD thread and of PMD load imbalance
+        """
+        threads = {}
+        for ((thread, obj, counter), value) in deltas.items():
+            if thread.startswith('pmd') and obj == 'stats':
+                threads.setdefault(thread, {})[counter] = value
+
+        summary = []
+        packets = {}
+        cycles = {}
+        for (thread, stats) in sorted(threads.items()):
+            packets[thread] = _get_counter(stats, _PACKETS)
+            cycles[thread] = _get_counter(stats, _PROCESSING_CYCLES)
+            passes = packets[thread] + _get_counter(stats, _RECIRCULATIONS)
+            total_cycles = cycles[thread] + _get_counter(stats, _IDLE_CYCLES)
+            result = OrderedDict()
+            result['duration'] = duration
+            result['rx_packets'] = packets[thread]
+            result['rx_mpps'] = packets[thread] / duration / 1e6 if duration else 0
+            result['processing_cycles_per_packet'] = \
+                cycles[thread] / packets[thread] if packets[thread] else 0
+            result['idle_percent'] = \
+                100.0 * _get_counter(stats, _IDLE_CYCLES) / total_cycles if total_cycles else 0
+            for (name, keys) in [('emc', _EMC_HITS), ('smc', _SMC_HITS),
+                                 ('megaflow', _MEGAFLOW_HITS)]:
+                result[name + '_hit_percent'] = \
+                    100.0 * _get_counter(stats, keys) / passes if passes else 0
+            result['upcalls'] = _get_counter(stats, _UPCALLS)
+            result['lost_upcalls'] = _get_counter(stats, _LOST_UPCALLS)
+            result['rxqs'] = ' '.join('{}/{}({}%)'.format(port, queue, usage)
+                                      for (port, queue, usage) in self._rxqs.get(thread, []))
+            summary.append((thread, result))
+
+        if threads:
+            result = OrderedDict()
+            result['pmd_threads'] = len(threads)
+            result['packets_imbalance'] = _get_imbalance(packets.values())
+            result['cycles_imbalance'] = _get_imbalance(cycles.values())
+            result['rxq_usage_imbalance'] = _get_imbalance(
+                [sum(usage for (_, _, usage) in self._rxqs.get(thread, []))
+                 for thread in threads])
+            summary.append(('pmds', result))
+        return summary
+
+def _get_counter(stats, keys):
+    """Return value of the first counter from ``keys`` found in ``stats``
+    """
+    for key in keys:
+        if key in stats:
+            return stats[key]
+    return 0
+
+def _get_imbalance(values):
+    """Return ratio between maximum and average of ``values``
+
+    Value 1.0 means, that load is perfectly balanced.
+    """
+    values = list(values)
+    total = sum(values)
+    if not total:
+        return 0
+    return max(values) * len(values) / total
+
+def _parse_counters(output, obj):
+    """Parse integer counters of PMD and main threads
+
+    :param output: Output of ``pmd-stats-show`` or ``pmd-perf-show``
+    :param obj: Name of the object used in the counter key
+
+    :returns: Dictionary indexed by tuple (thread, obj, counter)
+    """
+    counters = {}
+    thread = None
+    for line in output.splitlines():
+        match = _THREAD.match(line)
+        if match:
+            thread = 'pmd_core_' + match.group(1) if match.group(1) else match.group(2)
+            continue
+        match = _COUNTER.match(line)
+        if match and thread and not match.group(1).startswith('avg'):
+            counters[(thread, obj, match.group(1).lower())] = int(match.group(2))
+    return counters
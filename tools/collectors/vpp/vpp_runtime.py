@@ -0,0 +1,225 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""module for collection of VPP runtime statistics
+
+Samples ``show runtime``, ``show hardware-interfaces`` and ``show errors``
+of VPP started by VppDpdkVhost between calls of start() and stop().
+For every trial, i.e. for every period with packets received by VPP
+input nodes, vectors per call, clocks per packet and drops of every
+worker are reported together with the most expensive graph node.
+
+This requires the following setting in your config:
+
+* VPP_RUNTIME_SAMPLE_INTERVAL = 1
+    sampling interval in seconds
+
+* LOG_FILE_VPP_RUNTIME = 'vpp_runtime'
+    prefix of CSV files with the time series of counter deltas and
+    with the summary of trials; they are stored separately for every
+    testcase in the directory with results
+"""
+
+import os
+import re
+from collections import OrderedDict
+
+from conf import settings
+from src.vpp import VppCli, VppCliError
+from tools import tasks
+from tools.collectors.collector import periodic
+
+_COMMANDS = ['show runtime', 'show hardware-interfaces', 'show errors']
+
+# e.g. "Thread 1 vpp_wk_0 (lcore 2)"
+_RUNTIME_THREAD = re.compile(r'^Thread\s+\d+\s+(\S+)')
+# e.g. "dpdk-input   polling   1234   5678   0   1.23e2   4.60"
+_RUNTIME_NODE = re.compile(r'^(\S+)\s+(.+?)\s+(\d+)\s+(\d+)\s+(\d+)\s+([\d.e+-]+)\s+[\d.]+\s*$')
+# e.g. "TenGigabitEthernet5/0/0            1     up   TenGigabitEthernet5/0/0"
+_HW_INTERFACE = re.compile(r'^(\S+)\s+\d+\s+(up|down)\b')
+# e.g. "    rx missed                                          4"
+_HW_COUNTER = re.compile(r'^\s+([a-z][\w ]*?)\s{2,}(\d+)\s*$')
+# e.g. "        10                dpdk-input              no error    error"
+_ERROR = re.compile(r'^\s*(\d+)\s+(\S+)\s+(.*?)(?:\s{2,}(?:error|warn|info|unknown))?\s*$')
+_ERROR_THREAD = re.compile(r'^Thread\s+\d+\s+\((\S+)\)')
+
+_MAIN_THREAD = 'vpp_main'
+_DROP_NODES = ('error-drop',)
+
+class VppRuntime(periodic.ICollectorPeriodic):
+    """A logger of VPP runtime statistics
+
+    Statistics are read through VPP CLI socket; ``vppctl`` is used
+    if the socket is not accessible.
+    """
+    def __init__(self, results_dir, test_name):
+        """
+        Initialize collection of statistics
+        """
+        log_file = os.path.join(results_dir, settings.getValue('LOG_FILE_VPP_RUNTIME') +
+                                '_' + test_name)
+        super().__init__(settings.getValue('VPP_RUNTIME_SAMPLE_INTERVAL'),
+                         log_file + '.csv', log_file + '_trials.csv')
+        self._cli = None
+        self._input_nodes = set()
+
+    def start(self):
+        """
+        Connects to VPP CLI and starts collection of statistics
+        """
+        self._cli = VppCli(settings.getValue('VSWITCH_VPP_CLI_SOCK'))
+        try:
+            self._cli.connect()
+        except (OSError, VppCliError) as exc:
+            self._logger.debug('VPP CLI session is not available, vppctl will be used: %s', exc)
+            self._cli = None
+        super().start()
+
+    def stop(self):
+        """
+        Stops collection of statistics and closes VPP CLI session
+        """
+        super().stop()
+        if self._cli:
+            self._cli.close()
+            self._cli = None
+
+    def _execute(self):
+        """Return outputs of all commands
+        """
+        if self._cli:
+            return self._cli.execute_batch(_COMMANDS)
+        vppctl = ['sudo', settings.getValue('TOOLS')['vppctl']]
+        if settings.getValue('VSWITCH_VPP_CLI_SOCK'):
+            vppctl += ['-s', settings.getValue('VSWITCH_VPP_CLI_SOCK')]
+        return [tasks.run_task(vppctl + cmd.split(), self._logger, check_error=True)[0]
+                for cmd in _COMMANDS]
+
+    def _sample(self):
+        """Read VPP runtime, hardware and error counters
+        """
+        (runtime, hardware, errors) = self._execute()
+        counters = self._parse_runtime(runtime)
+        counters.update(_parse_hardware(hardware))
+        counters.update(_parse_errors(errors))
+        return counters
+
+    def _parse_runtime(self, output):
+        """Parse ``show runtime`` output
+
+        VPP reports average clocks per call, vector or suspend (whichever
+        is the highest), so total clocks are computed to allow deltas.
+        """
+        counters = {}
+        thread = _MAIN_THREAD
+        for line in output.splitlines():
+            match = _RUNTIME_THREAD.match(line)
+            if match:
+                thread = match.group(1)
+                continue
+            match = _RUNTIME_NODE.match(line)
+            if not match:
+                continue
+            (node, state) = (match.group(1), match.group(2))
+            (calls, vectors, suspends) = (int(match.group(i)) for i in (3, 4, 5))
+            if state == 'polling':
+                self._input_nodes.add((thread, node))
+            counters[(thread, node, 'calls')] = calls
+            counters[(thread, node, 'vectors')] = vectors
+            counters[(thread, node, 'clocks')] = \
+                float(match.group(6)) * max(calls, vectors, suspends)
+        return counters
+
+    def _is_active(self, deltas):
+        """Traffic is active if any input node has received packets
+        """
+        return any(value for ((thread, node, counter), value) in deltas.items()
+                   if counter == 'vectors' and (thread, node) in self._input_nodes)
+
+    def _summarize(self, deltas, duration):
+        """Return summary of every thread with input nodes, NIC and error counters
+
+        Threads without received packets are reported too, as they
+        indicate starved workers.
+        """
+        threads = {}
+        for ((thread, node, counter), value) in deltas.items():
+            if counter in ('calls', 'vectors', 'clocks'):
+                stats = threads.setdefault(thread, {}).setdefault(node, {})
+                stats[counter] = value
+
+        summary = []
+        for (thread, nodes) in sorted(threads.items()):
+            inputs = [node for node in nodes if (thread, node) in self._input_nodes]
+            if not inputs:
+                continue
+            rx_calls = sum(nodes[node]['calls'] for node in inputs)
+            packets = sum(nodes[node]['vectors'] for node in inputs)
+            # only nodes, which have processed packets, are taken into account
+            nodes = {node: stats for (node, stats) in nodes.items() if stats['vectors']}
+            clocks = sum(stats['clocks'] for stats in nodes.values())
+            top_node = max(nodes, key=lambda node: nodes[node]['clocks']) if nodes else ''
+            stats = OrderedDict()
+            stats['duration'] = duration
+            stats['rx_packets'] = packets
+            stats['rx_mpps'] = packets / duration / 1e6 if duration else 0
+            stats['vectors_per_call'] = packets / rx_calls if rx_calls else 0
+            stats['clocks_per_packet'] = clocks / packets if packets else 0
+            stats['drops'] = sum(nodes[node]['vectors'] for node in _DROP_NODES
+                                 if node in nodes)
+            stats['top_node'] = top_node
+            stats['top_node_clocks_per_packet'] = \
+                nodes[top_node]['clocks'] / packets if packets else 0
+            stats['top_node_clocks_share'] = \
+                100.0 * nodes[top_node]['clocks'] / clocks if clocks else 0
+            summary.append((thread, stats))
+
+        counters = OrderedDict()
+        for ((group, obj, counter), value) in deltas.items():
+            if value and group in ('hardware', 'errors'):
+                counters['{} {}'.format(obj, counter)] = value
+        if counters:
+            summary.append(('counters', counters))
+        return summary
+
+def _parse_hardware(output):
+    """Parse interface counters from ``show hardware-interfaces`` output
+    """
+    counters = {}
+    interface = None
+    for line in output.splitlines():
+        match = _HW_INTERFACE.match(line)
+        if match:
+            interface = match.group(1)
+            continue
+        match = _HW_COUNTER.match(line)
+        if match and interface:
+            counters[('hardware', interface, match.group(1).replace(' ', '_'))] = \
+                int(match.group(2))
+    return counters
+
+def _parse_errors(output):
+    """Parse error counters from ``show errors`` output
+
+    Counters of individual threads are summed up.
+    """
+    counters = {}
+    for line in output.splitlines():
+        if _ERROR_THREAD.match(line):
+            continue
+        match = _ERROR.match(line)
+        if match:
+            key = ('errors', match.group(2), match.group(3))
+            counters[key] = counters.get(key, 0) + int(match.group(1))
+    return counters
@@ -15,11 +15,14 @@
 
 """
 Network namespace emulation
+
+Links inside namespaces are configured by netlink, see tools.netlink.
 """
 
 import logging
 import os
 
+from tools import netlink
 from tools import tasks
 
 _LOGGER = logging.getLogger(__name__)
@@ -34,10 +37,9 @@ def add_ip_to_namespace_eth(port, name, ip_addr, cidr):
     :param cidr: cidr as string
     :return:
     """
-    ip_string = '{}/{}'.format(ip_addr, cidr)
-    tasks.run_task(['sudo', 'ip', 'netns', 'exec', name,
-                    'ip', 'addr', 'add', ip_string, 'dev', port],
-                   _LOGGER, 'Assigning ip to port {}...'.format(port), False)
+    _LOGGER.info('Assigning ip to port %s...', port)
+    with netlink.batch(name) as iproute:
+        iproute.addr_add(port, ip_addr, cidr)
 
 
 def assign_port_to_namespace(port, name, port_up=False):
@@ -48,14 +50,13 @@ def assign_port_to_namespace(port, name, port_up=False):
     :param port_up: Boolean if the port should be brought up on assignment
     :return: None
     """
-    tasks.run_task(['sudo', 'ip', 'link', 'set',
-                    'netns', name, 'dev', port],
-                   _LOGGER, 'Assigning port {} to namespace {}...'.format(
-                       port, name), False)
+    _LOGGER.info('Assigning port %s to namespace %s...', port, name)
+    with netlink.batch() as iproute:
+        iproute.link_set(port, netns=name)
     if port_up:
-        tasks.run_task(['sudo', 'ip', 'netns', 'exec', name,
-                        'ip', 'link', 'set', port, 'up'],
-                       _LOGGER, 'Bringing up port {}...'.format(port), False)
+        _LOGGER.info('Bringing up port %s...', port)
+        with netlink.batch(name) as iproute:
+            iproute.link_set(port, up=True)
 
 
 def create_namespace(name):
@@ -65,7 +66,18 @@ def create_namespace(name):
     :param name: name of the namespace to be created as string
     :return: None
     """
-    if name in get_system_namespace_list():
+    create_namespaces([name])
+
+
+def create_namespaces(names):
+    """
+    Create linux namespaces. Namespaces are created by a single ``ip -batch``
+    process. Raises RuntimeError if any namespace already exists in the system.
+    :param names: list of names of namespaces to be created
+    :return: None
+    """
+    existing = get_system_namespace_list()
+    if any(name in existing for name in names):
         raise RuntimeError('Namespace already exists in system')
 
     # touch some files in a tmp area so we can track them separately from
@@ -79,15 +91,19 @@ def create_namespace(name):
             _LOGGER.error('Unable to create namespace temp folder.')
             _LOGGER.error(
                 'Namespaces will not be removed on test case completion')
-    if os.path.isdir('/tmp/namespaces'):
-        with open('/tmp/namespaces/{}'.format(name), 'a'):
-            os.utime('/tmp/namespaces/{}'.format(name), None)
-
-    tasks.run_task(['sudo', 'ip', 'netns', 'add', name], _LOGGER,
-                   'Creating namespace {}...'.format(name), False)
-    tasks.run_task(['sudo', 'ip', 'netns', 'exec', name,
-                    'ip', 'link', 'set', 'lo', 'up'], _LOGGER,
-                   'Enabling loopback interface...', False)
+    # namespaces are persisted by bind mounts, so they are created by ip
+    ipcmd = netlink.IPCommand()
+    with ipcmd.batch():
+        for name in names:
+            if os.path.isdir('/tmp/namespaces'):
+                with open('/tmp/namespaces/{}'.format(name), 'a'):
+                    os.utime('/tmp/namespaces/{}'.format(name), None)
+            _LOGGER.info('Creating namespace %s...', name)
+            ipcmd.netns_add(name)
+    for name in names:
+        _LOGGER.info('Enabling loopback interface in namespace %s...', name)
+        with netlink.batch(name) as iproute:
+            iproute.link_set('lo', up=True)
 
 
 def delete_namespace(name):
@@ -96,11 +112,23 @@ def delete_namespace(name):
     :param name: namespace to delete
     :return: None
     """
-    # delete the file if it exists in the temp area
-    if os.path.exists('/tmp/namespaces/{}'.format(name)):
-        os.remove('/tmp/namespaces/{}'.format(name))
-    tasks.run_task(['sudo', 'ip', 'netns', 'delete', name], _LOGGER,
-                   'Deleting namespace {}...'.format(name), False)
+    delete_namespaces([name])
+
+
+def delete_namespaces(names):
+    """
+    Delete linux network namespaces by a single ``ip -batch`` process
+    :param names: list of namespaces to delete
+    :return: None
+    """
+    ipcmd = netlink.IPCommand()
+    with ipcmd.batch():
+        for name in names:
+            # delete the file if it exists in the temp area
+            if os.path.exists('/tmp/namespaces/{}'.format(name)):
+                os.remove('/tmp/namespaces/{}'.format(name))
+            _LOGGER.info('Deleting namespace %s...', name)
+            ipcmd.netns_del(name)
 
 
 def get_system_namespace_list():
@@ -129,10 +157,10 @@ def reset_port_to_root(port, name):
     :param name: namespace the port currently resides
     :return: None
     """
-    tasks.run_task(['sudo', 'ip', 'netns', 'exec', name,
-                    'ip', 'link', 'set', port, 'netns', '1'],
-                   _LOGGER, 'Assigning port {} to namespace {}...'.format(
-                       port, name), False)
+    _LOGGER.info('Returning port %s from namespace %s to root namespace...', port, name)
+    with netlink.batch(name) as iproute:
+        # PID 1 is always running in the root namespace
+        iproute.link_set(port, netns=1)
 
 
 # pylint: disable=invalid-name
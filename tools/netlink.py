@@ -0,0 +1,484 @@
+# Copyright 2020 Intel Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Configuration of network links and addresses
+
+Links and addresses are configured by rtnetlink messages sent directly
+by VSPERF if it has sufficient privileges (i.e. it runs as root).
+Otherwise ``ip`` command executed by sudo is used. Both backends provide
+the same interface and they can execute a set of operations as a single
+batch, i.e. by a single netlink send or by a single ``ip -batch`` process.
+"""
+
+import contextlib
+import ctypes
+import ipaddress
+import logging
+import os
+import platform
+import socket
+import struct
+import sys
+import tempfile
+
+from tools import tasks
+
+_LOGGER = logging.getLogger(__name__)
+
+# netlink and rtnetlink constants, see linux/netlink.h, linux/rtnetlink.h
+# and linux/if_link.h
+_NETLINK_ROUTE = 0
+_NLMSG_ERROR = 2
+_NLMSG_DONE = 3
+_NLM_F_REQUEST = 0x1
+_NLM_F_ACK = 0x4
+_NLM_F_EXCL = 0x200
+_NLM_F_CREATE = 0x400
+_RTM_NEWLINK = 16
+_RTM_DELLINK = 17
+_RTM_GETLINK = 18
+_RTM_SETLINK = 19
+_RTM_NEWADDR = 20
+_IFLA_IFNAME = 3
+_IFLA_LINKINFO = 18
+_IFLA_NET_NS_PID = 19
+_IFLA_NET_NS_FD = 28
+_IFLA_INFO_KIND = 1
+_IFLA_INFO_DATA = 2
+_VETH_INFO_PEER = 1
+_IFA_ADDRESS = 1
+_IFA_LOCAL = 2
+_IFF_UP = 0x1
+_CLONE_NEWNET = 0x40000000
+# number of gettid syscall used if /proc/thread-self is not available
+_SYS_GETTID = {'x86_64': 186, 'aarch64': 178, 'ppc64le': 207}
+
+_NLMSGHDR = struct.Struct('=IHHII')
+_NLMSGERR = struct.Struct('=i')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_IFADDRMSG = struct.Struct('=BBBBi')
+_RTATTR = struct.Struct('=HH')
+
+_NETNS_DIR = '/var/run/netns'
+# maximum size and count of messages sent at once; acks are read after
+# every chunk, so socket buffers can't overflow
+_MAX_CHUNK = 32768
+_MAX_CHUNK_MESSAGES = 64
+_SOCK_BUFFER = 1048576
+_RECV_SIZE = 65536
+
+class NetlinkError(OSError):
+    """Error reported by kernel for netlink request
+    """
+    pass
+
+def is_available():
+    """Return True if links can be configured by netlink directly
+    """
+    return sys.platform.startswith('linux') and os.geteuid() == 0
+
+def _attr(attr_type, data):
+    """Return netlink attribute with given binary data
+    """
+    length = _RTATTR.size + len(data)
+    return _RTATTR.pack(length, attr_type) + data + b'\0' * (-length % 4)
+
+def _attr_str(attr_type, value):
+    """Return netlink attribute with zero terminated string
+    """
+    return _attr(attr_type, value.encode() + b'\0')
+
+def _attr_u32(attr_type, value):
+    """Return netlink attribute with 32 bit integer
+    """
+    return _attr(attr_type, struct.pack('=I', value))
+
+def _setns(fd):
+    """Move calling thread into network namespace given by ``fd``
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.setns(fd, _CLONE_NEWNET) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+def _get_own_netns_path():
+    """Return path to the network namespace of the calling thread
+
+    /proc/thread-self is available since Linux 3.17; thread id is read by
+    gettid syscall on older kernels.
+    """
+    if os.path.exists('/proc/thread-self'):
+        return '/proc/thread-self/ns/net'
+    tid = ctypes.CDLL(None, use_errno=True).syscall(_SYS_GETTID[platform.machine()])
+    return '/proc/self/task/{}/ns/net'.format(tid)
+
+def _open_netns(netns):
+    """Return file descriptor of named network namespace
+    """
+    return os.open(os.path.join(_NETNS_DIR, netns), os.O_RDONLY)
+
+@contextlib.contextmanager
+def _enter_netns(netns):
+    """Context manager executing its body inside named network namespace
+    """
+    own_fd = os.open(_get_own_netns_path(), os.O_RDONLY)
+    try:
+        netns_fd = _open_netns(netns)
+        try:
+            _setns(netns_fd)
+            try:
+                yield
+            finally:
+                _setns(own_fd)
+        finally:
+            os.close(netns_fd)
+    finally:
+        os.close(own_fd)
+
+class IPRoute(object):
+    """Minimal rtnetlink client for configuration of links and addresses
+    """
+    def __init__(self, netns=None):
+        """Open netlink socket
+
+        :param netns: Name of network namespace to be configured; current
+            namespace is configured if it is not set
+        """
+        self._netns = netns
+        if netns:
+            # netlink socket is bound to the namespace of its creator
+            with _enter_netns(netns):
+                self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, _NETLINK_ROUTE)
+        else:
+            self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, _NETLINK_ROUTE)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SOCK_BUFFER)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCK_BUFFER)
+        self._sock.bind((0, 0))
+        self._seq = 0
+        self._pending = []
+        self._fds = []
+        self._batch = False
+
+    def close(self):
+        """Close netlink socket
+        """
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager sending all requests at once
+
+        Kernel processes all requests even if some of them fail;
+        :class NetlinkError: describing all failures is raised afterwards.
+        """
+        if self._batch:
+            yield self
+            return
+        self._batch = True
+        try:
+            yield self
+        except BaseException:
+            self._pending = []
+            self._close_fds()
+            raise
+        finally:
+            self._batch = False
+        self._flush()
+
+    def link_add_veth(self, name, peer, peer_netns=None):
+        """Create veth pair
+
+        :param name: Name of the first veth port
+        :param peer: Name of the peer port
+        :param peer_netns: Optional namespace of the peer port
+        """
+        peer_info = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0) + \
+                    _attr_str(_IFLA_IFNAME, peer) + self._netns_attr(peer_netns)
+        link_info = _attr_str(_IFLA_INFO_KIND, 'veth') + \
+                    _attr(_IFLA_INFO_DATA, _attr(_VETH_INFO_PEER, peer_info))
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0) + \
+                  _attr_str(_IFLA_IFNAME, name) + _attr(_IFLA_LINKINFO, link_info)
+        self._request(_RTM_NEWLINK, _NLM_F_CREATE | _NLM_F_EXCL, payload,
+                      'add veth {} peer {}'.format(name, peer))
+
+    def link_del(self, name):
+        """Delete link; peer of veth port is deleted too
+
+        :param name: Name of the link
+        """
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0) + _attr_str(_IFLA_IFNAME, name)
+        self._request(_RTM_DELLINK, 0, payload, 'delete link {}'.format(name))
+
+    def link_set(self, name, up=None, netns=None):
+        """Change state or namespace of the link
+
+        :param name: Name of the link
+        :param up: True or False to bring the link up or down
+        :param netns: Name of namespace or PID of process (e.g. 1 for root
+            namespace) where the link should be moved
+        """
+        (flags, change) = (0, 0)
+        if up is not None:
+            (flags, change) = (_IFF_UP if up else 0, _IFF_UP)
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, flags, change) + \
+                  _attr_str(_IFLA_IFNAME, name) + self._netns_attr(netns)
+        self._request(_RTM_SETLINK, 0, payload, 'set link {}'.format(name))
+
+    def addr_add(self, name, address, prefixlen):
+        """Assign IP address to the link
+
+        :param name: Name of the link
+        :param address: IPv4 or IPv6 address as a string
+        :param prefixlen: Length of network prefix
+        """
+        addr = ipaddress.ip_address(address)
+        family = socket.AF_INET if addr.version == 4 else socket.AF_INET6
+        payload = _IFADDRMSG.pack(family, int(prefixlen), 0, 0, self.get_link_index(name)) + \
+                  _attr(_IFA_LOCAL, addr.packed) + _attr(_IFA_ADDRESS, addr.packed)
+        self._request(_RTM_NEWADDR, _NLM_F_CREATE | _NLM_F_EXCL, payload,
+                      'add address {}/{} to {}'.format(address, prefixlen, name))
+
+    def get_link_index(self, name):
+        """Return interface index of the link
+
+        Pending requests of the batch are sent first, so links created
+        inside the batch can be found.
+        """
+        self._flush()
+        self._seq += 1
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0) + _attr_str(_IFLA_IFNAME, name)
+        self._sock.sendall(_NLMSGHDR.pack(_NLMSGHDR.size + len(payload), _RTM_GETLINK,
+                                          _NLM_F_REQUEST, self._seq, 0) + payload)
+        for (msg_type, seq, data) in self._receive():
+            if seq != self._seq:
+                continue
+            if msg_type == _NLMSG_ERROR:
+                error = -_NLMSGERR.unpack_from(data)[0]
+                raise NetlinkError(error, '{}: link {}'.format(os.strerror(error), name))
+            return _IFINFOMSG.unpack_from(data)[2]
+
+    def _netns_attr(self, netns):
+        """Return attribute moving link into given namespace
+        """
+        if netns is None:
+            return b''
+        if isinstance(netns, int):
+            return _attr_u32(_IFLA_NET_NS_PID, netns)
+        # descriptor must stay open until the request is processed
+        netns_fd = _open_netns(netns)
+        self._fds.append(netns_fd)
+        return _attr_u32(_IFLA_NET_NS_FD, netns_fd)
+
+    def _close_fds(self):
+        """Close descriptors of namespaces used by requests
+        """
+        for netns_fd in self._fds:
+            os.close(netns_fd)
+        self._fds = []
+
+    def _request(self, msg_type, flags, payload, description):
+        """Send request or add it into the active batch
+        """
+        self._seq += 1
+        message = _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type,
+                                 _NLM_F_REQUEST | _NLM_F_ACK | flags, self._seq, 0) + payload
+        self._pending.append((self._seq, message, description))
+        if not self._batch:
+            self._flush()
+
+    def _flush(self):
+        """Send pending requests in chunks and wait for their acks
+        """
+        (pending, self._pending) = (self._pending, [])
+        errors = []
+        try:
+            while pending:
+                (chunk, size) = ([], 0)
+                while pending and (not chunk or (size + len(pending[0][1]) <= _MAX_CHUNK and
+                                                 len(chunk) < _MAX_CHUNK_MESSAGES)):
+                    chunk.append(pending.pop(0))
+                    size += len(chunk[-1][1])
+                self._sock.sendall(b''.join(message for (_, message, _) in chunk))
+                errors += self._wait_acks({seq: description for (seq, _, description) in chunk})
+        finally:
+            self._close_fds()
+        if errors:
+            raise NetlinkError(errors[0][0], '; '.join(
+                '{}: {}'.format(description, os.strerror(error)) for (error, description) in errors))
+
+    def _wait_acks(self, requests):
+        """Wait for acks of given requests
+
+        :param requests: Dictionary with request descriptions indexed by seq
+        :returns: List of (errno, description) of failed requests
+        """
+        errors = []
+        while requests:
+            for (msg_type, seq, data) in self._receive():
+                if msg_type != _NLMSG_ERROR or seq not in requests:
+                    continue
+                description = requests.pop(seq)
+                error = -_NLMSGERR.unpack_from(data)[0]
+                if error:
+                    errors.append((error, description))
+        return errors
+
+    def _receive(self):
+        """Receive netlink messages
+
+        :returns: List of (type, seq, payload) tuples
+        """
+        data = self._sock.recv(_RECV_SIZE)
+        messages = []
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            (length, msg_type, _, seq, _) = _NLMSGHDR.unpack_from(data, offset)
+            if length < _NLMSGHDR.size:
+                break
+            if msg_type != _NLMSG_DONE:
+                messages.append((msg_type, seq, data[offset + _NLMSGHDR.size:offset + length]))
+            offset += (length + 3) & ~3
+        return messages
+
+class IPCommand(object):
+    """Configuration of links and addresses by ``ip`` command
+
+    It provides the same interface as :class IPRoute:. Operations of
+    a batch are executed by a single ``ip -batch`` process.
+    """
+    def __init__(self, netns=None, sudo=None):
+        """Initialize command
+
+        :param netns: Name of network namespace to be configured
+        :param sudo: Execute ``ip`` by sudo; by default sudo is used
+            unless VSPERF runs as root
+        """
+        if sudo is None:
+            sudo = os.geteuid() != 0
+        self._netns = netns
+        self._cmd = (['sudo'] if sudo else []) + ['ip'] + (['-n', netns] if netns else [])
+        self._pending = []
+        self._batch = False
+
+    def close(self):
+        """Nothing to close, defined for compatibility with :class IPRoute:
+        """
+        pass
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager executing all operations by a single process
+        """
+        if self._batch:
+            yield self
+            return
+        self._batch = True
+        try:
+            yield self
+        except BaseException:
+            self._pending = []
+            raise
+        finally:
+            self._batch = False
+        self._flush()
+
+    def link_add_veth(self, name, peer, peer_netns=None):
+        """See IPRoute for description
+        """
+        self._request(['link', 'add', name, 'type', 'veth', 'peer', 'name', peer] +
+                      (['netns', peer_netns] if peer_netns else []))
+
+    def link_del(self, name):
+        """See IPRoute for description
+        """
+        self._request(['link', 'del', name])
+
+    def link_set(self, name, up=None, netns=None):
+        """See IPRoute for description
+        """
+        args = ['link', 'set', 'dev', name]
+        if netns is not None:
+            args += ['netns', str(netns)]
+        if up is not None:
+            args.append('up' if up else 'down')
+        self._request(args)
+
+    def addr_add(self, name, address, prefixlen):
+        """See IPRoute for description
+        """
+        self._request(['addr', 'add', '{}/{}'.format(address, prefixlen), 'dev', name])
+
+    def netns_add(self, name):
+        """Create named network namespace
+        """
+        self._request(['netns', 'add', name])
+
+    def netns_del(self, name):
+        """Delete named network namespace
+        """
+        self._request(['netns', 'delete', name])
+
+    def _request(self, args):
+        """Execute ``ip`` or add its arguments into the active batch
+        """
+        self._pending.append(args)
+        if not self._batch:
+            self._flush()
+
+    def _flush(self):
+        """Execute pending operations
+        """
+        (pending, self._pending) = (self._pending, [])
+        if len(pending) == 1:
+            tasks.run_task(self._cmd + pending[0], _LOGGER, check_error=False)
+        elif pending:
+            with tempfile.NamedTemporaryFile('w', prefix='vsperf_ip_', suffix='.batch') as batch:
+                batch.write(''.join(' '.join(args) + '\n' for args in pending))
+                batch.flush()
+                # all operations are executed regardless of errors
+                tasks.run_task(self._cmd + ['-force', '-batch', batch.name], _LOGGER,
+                               check_error=False)
+
+def get_iproute(netns=None):
+    """Return netlink client if possible, otherwise ``ip`` command wrapper
+
+    :param netns: Name of network namespace to be configured
+    """
+    if is_available():
+        try:
+            return IPRoute(netns)
+        except OSError as exc:
+            _LOGGER.debug('Netlink is not available, ip command will be used: %s', exc)
+    return IPCommand(netns)
+
+@contextlib.contextmanager
+def batch(netns=None):
+    """Context manager executing link and address operations as a batch
+
+    Failures are logged and they are not raised, i.e. behaviour is the
+    same as in case of ``ip`` command executed without error checking.
+
+    :param netns: Name of network namespace to be configured
+    """
+    iproute = get_iproute(netns)
+    try:
+        with iproute.batch():
+            yield iproute
+    except NetlinkError as exc:
+        _LOGGER.error('Netlink request has failed: %s', exc)
+    finally:
+        iproute.close()
@@ -30,6 +30,7 @@ import netaddr
 from conf import settings
 from conf import merge_spec
 from core.results.results_constants import ResultsConstants
+from core.throughput_search import ThroughputSearch
 from tools.pkt_gen.trafficgen.trafficgen import ITrafficGenerator
 try:
     # pylint: disable=wrong-import-position, import-error
@@ -103,6 +104,7 @@ class Trex(ITrafficGenerator):
         self._stlclient = None
         self._verification_params = None
         self._show_packet_data = False
+        self._searches = []
 
     def show_packet_info(self, packet_a, packet_b):
         """
@@ -598,54 +600,30 @@ class Trex(ITrafficGenerator):
         loss_verification = settings.getValue('TRAFFICGEN_TREX_RFC2544_BINARY_SEARCH_LOSS_VERIFICATION')
         if loss_verification:
             self._logger.info("Running Binary Search with Loss Verification")
-        stats_ok = _EMPTY_STATS
-        new_params = copy.deepcopy(traffic)
-        iteration = 1
-        repeat = 0
-        left = boundaries['left']
-        right = boundaries['right']
-        center = boundaries['center']
+        trial_stats = []
+
+        def trial(rate, trial_duration):
+            """Send traffic at given rate and keep T-Rex statistics
+            """
+            new_params = copy.deepcopy(traffic)
+            new_params['frame_rate'] = rate
+            trial_stats.append(self.generate_traffic(new_params, trial_duration))
+            return self.calculate_results(trial_stats[-1])
+
+        search = ThroughputSearch(
+            trial, lossrate, threshold, max_repeat=max_repeat if loss_verification else 0,
+            min_duration=int(settings.getValue('TRAFFICGEN_RFC2544_SEARCH_MIN_DURATION')))
+        self._searches.append(search)
         self._logger.info('Starting RFC2544 trials')
-        while (right - left) > threshold:
-            stats = self.generate_traffic(new_params, duration)
-            test_lossrate = ((stats["total"]["opackets"] - stats[
-                "total"]["ipackets"]) * 100) / stats["total"]["opackets"]
-            if stats["total"]["ipackets"] == 0:
-                self._logger.error('No packets recieved. Test failed')
-                return _EMPTY_STATS
-            if settings.getValue('TRAFFICGEN_TREX_VERIFICATION_MODE'):
-                if test_lossrate <= lossrate:
-                    # save the last passing trial for verification
-                    self._verification_params = copy.deepcopy(new_params)
-            packets_lost = stats['total']['opackets'] - stats['total']['ipackets']
-            self._logger.debug("Iteration: %s, frame rate: %s, throughput_rx_fps: %s," +
-                               " frames lost %s, frame_loss_percent: %s", iteration,
-                               "{:.3f}".format(new_params['frame_rate']), stats['total']['rx_pps'],
-                               packets_lost, "{:.3f}".format(test_lossrate))
-            if test_lossrate == 0.0 and new_params['frame_rate'] == traffic['frame_rate']:
-                return copy.deepcopy(stats)
-            elif test_lossrate > lossrate:
-                if loss_verification:
-                    if repeat < max_repeat:
-                        repeat += 1
-                        iteration += 1
-                        continue
-                    else:
-                        repeat = 0
-                right = center
-                center = (left + right) / 2
-                new_params = copy.deepcopy(traffic)
-                new_params['frame_rate'] = center
-            else:
-                if loss_verification:
-                    repeat = 0
-                stats_ok = copy.deepcopy(stats)
-                left = center
-                center = (left + right) / 2
-                new_params = copy.deepcopy(traffic)
-                new_params['frame_rate'] = center
-            iteration += 1
-        return stats_ok
+        best = search.search(boundaries['right'], duration, min_rate=boundaries['left'],
+                             initial_rate=boundaries['center'])
+        if not best:
+            return _EMPTY_STATS
+        if settings.getValue('TRAFFICGEN_TREX_VERIFICATION_MODE'):
+            # save the last passing trial for verification
+            self._verification_params = copy.deepcopy(traffic)
+            self._verification_params['frame_rate'] = best.rate
+        return copy.deepcopy(trial_stats[best.index - 1])
 
     def send_cont_traffic(self, traffic=None, duration=30):
         """See ITrafficGenerator for description
@@ -691,6 +669,7 @@ class Trex(ITrafficGenerator):
         if settings.getValue('TRAFFICGEN_TREX_LEARNING_MODE'):
             self.learning_packets(traffic)
         self._verification_params = copy.deepcopy(traffic)
+        self._searches = []
 
         binary_bounds = {'right' : traffic['frame_rate'],
                          'left'  : 0,
@@ -729,7 +708,15 @@ class Trex(ITrafficGenerator):
                 verification_iterations += 1
             else:
                 self._logger.error('Could not pass Trex Verification. Test failed')
-        return self.calculate_results(stats_ok)
+        result = self.calculate_results(stats_ok)
+        if settings.getValue('TRAFFICGEN_RFC2544_SEARCH_MIN_DURATION'):
+            result[ResultsConstants.SEARCH_TRIALS] = sum(
+                len(search.trials) for search in self._searches)
+            result[ResultsConstants.SEARCH_TIME] = '{:.3f}'.format(
+                sum(search.search_time for search in self._searches))
+            result[ResultsConstants.SEARCH_TIME_SAVED] = sum(
+                search.time_saved for search in self._searches)
+        return result
 
     def start_rfc2544_throughput(self, traffic=None, tests=1, duration=60,
                                  lossrate=0.0):
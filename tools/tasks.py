@@ -15,6 +15,7 @@
 """Task management helper functions and classes.
 """
 
+import asyncio
 import select
 import subprocess
 import logging
@@ -23,14 +24,40 @@ import sys
 import os
 import locale
 import time
+import tempfile
+import shutil
+import socket
 import pexpect
 
 from conf import settings
-from tools import systeminfo
+from tools import broker
 
 
 CMD_PREFIX = 'cmd : '
 
+# interval in seconds between checks of process state, which is used
+# if pidfd is not available
+_POLL_INTERVAL = 0.05
+
+# time in seconds reserved for termination of processes after SIGKILL,
+# see _terminate_pids()
+_KILL_WAIT = 1
+
+# maximum interval in seconds between two readiness probes, see wait_for()
+_MAX_PROBE_INTERVAL = 1.0
+
+# failures of readiness probes are expected until the probed daemon is ready,
+# so they are not reported, see run_probe()
+_PROBE_LOGGER = logging.getLogger(__name__ + '.probe')
+_PROBE_LOGGER.setLevel(logging.CRITICAL)
+
+# details about running privileged command broker, see start_broker()
+_BROKER = {'socket': None, 'process': None, 'dir': None, 'allowed': set()}
+
+# number of executions and overall execution time per command binary
+# and execution method
+_TASK_STATS = {}
+
 def _get_stdout():
     """Get stdout value for ``subprocess`` calls.
     """
@@ -42,20 +69,88 @@ def _get_stdout():
     return stdout
 
 
-def run_task(cmd, logger, msg=None, check_error=False):
-    """Run task, report errors and log overall status.
-
-    Run given task using ``subprocess.Popen``. Log the commands
-    used and any errors generated. Prints stdout to screen if
-    in verbose mode and returns it regardless. Prints stderr to
-    screen always.
-
-    :param cmd: Exact command to be executed
-    :param logger: Logger to write details to
-    :param msg: Message to be shown to user
-    :param check_error: Throw exception on error
+async def _read_stream(pipe, lines, echo, encoding):
+    """Read lines from ``pipe`` until EOF and optionally echo them to ``echo``
+    """
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if echo:
+                echo.write(line.decode(encoding))
+            lines.append(line)
+    finally:
+        transport.close()
+
+def _kill_process(proc):
+    """Kill process started by _execute_task(), which has exceeded its timeout
+    """
+    try:
+        proc.kill()
+    except PermissionError:
+        # process was started by sudo and thus it is owned by root
+        subprocess.call(['sudo', '-n', 'kill', '-9', str(proc.pid)])
+
+async def _execute_by_process(cmd, stdout, stderr, verbose, encoding, timeout):
+    """Execute command as a new process, stream its output into ``stdout`` and
+    ``stderr`` lists and return its exit code.
+    """
+    proc = subprocess.Popen(map(os.path.expanduser, cmd),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, bufsize=0)
+    loop = asyncio.get_event_loop()
+    task = asyncio.gather(
+        _read_stream(proc.stdout, stdout, sys.stdout if verbose else None, encoding),
+        _read_stream(proc.stderr, stderr, sys.stderr, encoding),
+        loop.run_in_executor(None, proc.wait))
+    try:
+        await asyncio.wait_for(task, timeout)
+    except asyncio.TimeoutError:
+        _kill_process(proc)
+        # wait for the process to avoid zombies
+        await loop.run_in_executor(None, proc.wait)
+        raise subprocess.TimeoutExpired(cmd, timeout, stderr=stderr)
+
+    return proc.returncode
+
+async def _execute_by_broker(cmd, stdout, stderr, verbose, encoding, timeout):
+    """Execute sudo command by privileged command broker, store its output
+    into ``stdout`` and ``stderr`` lists and return its exit code.
+    """
+    reader, writer = await asyncio.open_unix_connection(_BROKER['socket'])
+    try:
+        writer.write(broker.encode_request(list(map(os.path.expanduser, cmd)), timeout))
+        line = await reader.readline()
+    finally:
+        writer.close()
+    if not line:
+        raise ConnectionError('Connection closed by privileged command broker')
+
+    (returncode, out, err) = broker.decode_response(line)
+    for (data, lines, echo) in ((out, stdout, sys.stdout if verbose else None),
+                                (err, stderr, sys.stderr)):
+        for line in data.splitlines(True):
+            if echo:
+                echo.write(line.decode(encoding))
+            lines.append(line)
+
+    return returncode
+
+def _update_task_stats(cmd, method, duration):
+    """Account execution of command into _TASK_STATS
+    """
+    binary = os.path.basename(cmd[1] if cmd[0] == 'sudo' and len(cmd) > 1 else cmd[0])
+    stats = _TASK_STATS.setdefault((binary, method), [0, 0.0])
+    stats[0] += 1
+    stats[1] += duration
 
-    :returns: (stdout, stderr)
+async def _execute_task(cmd, logger, check_error, timeout):
+    """Coroutine executing given command, see run_task() for details.
     """
     def handle_error(exception):
         """Handle errors by logging and optionally raising an exception.
@@ -69,51 +164,234 @@ def run_task(cmd, logger, msg=None, check_error=False):
     stdout = []
     stderr = []
     my_encoding = locale.getdefaultlocale()[1]
+    verbose = settings.getValue('VERBOSITY') == 'debug'
 
-    if msg:
-        logger.info(msg)
-
-    # pylint: disable=too-many-nested-blocks
     logger.debug('%s%s', CMD_PREFIX, ' '.join(cmd))
+    start = time.time()
+    method = 'sudo' if cmd[0] == 'sudo' else 'exec'
     try:
-        proc = subprocess.Popen(map(os.path.expanduser, cmd),
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE, bufsize=0)
-
-        while True:
-            reads = [proc.stdout.fileno(), proc.stderr.fileno()]
-            ret = select.select(reads, [], [])
-
-            for file_d in ret[0]:
-                if file_d == proc.stdout.fileno():
-                    while True:
-                        line = proc.stdout.readline()
-                        if not line:
-                            break
-                        if settings.getValue('VERBOSITY') == 'debug':
-                            sys.stdout.write(line.decode(my_encoding))
-                        stdout.append(line)
-                if file_d == proc.stderr.fileno():
-                    while True:
-                        line = proc.stderr.readline()
-                        if not line:
-                            break
-                        sys.stderr.write(line.decode(my_encoding))
-                        stderr.append(line)
-
-            if proc.poll() is not None:
-                break
-
-    except OSError as ex:
+        returncode = None
+        if _BROKER['socket'] and broker.is_allowed(cmd, _BROKER['allowed']):
+            try:
+                returncode = await _execute_by_broker(cmd, stdout, stderr, verbose,
+                                                      my_encoding, timeout)
+                method = 'broker'
+            except (OSError, ValueError) as ex:
+                logger.warning('Privileged command broker has failed, sudo will '
+                               'be used instead: %s', ex)
+        if returncode is None:
+            returncode = await _execute_by_process(cmd, stdout, stderr, verbose,
+                                                   my_encoding, timeout)
+    except (OSError, subprocess.TimeoutExpired) as ex:
         handle_error(ex)
     else:
-        if proc.returncode:
-            ex = subprocess.CalledProcessError(proc.returncode, cmd, stderr)
+        _update_task_stats(cmd, method, time.time() - start)
+        if returncode:
+            ex = subprocess.CalledProcessError(returncode, cmd, stderr)
             handle_error(ex)
 
     return ('\n'.join(sout.decode(my_encoding).strip() for sout in stdout),
             ('\n'.join(sout.decode(my_encoding).strip() for sout in stderr)))
 
+def run_task(cmd, logger, msg=None, check_error=False, timeout=None):
+    """Run task, report errors and log overall status.
+
+    Run given task using ``subprocess.Popen``. Its outputs are processed
+    asynchronously as a stream of lines. Log the commands used and any
+    errors generated. Prints stdout to screen if in verbose mode and
+    returns it regardless. Prints stderr to screen always.
+
+    :param cmd: Exact command to be executed
+    :param logger: Logger to write details to
+    :param msg: Message to be shown to user
+    :param check_error: Throw exception on error
+    :param timeout: Maximum command execution time in seconds; process is
+        killed after timeout expiration; TASKS_TIMEOUT is used by default
+
+    :returns: (stdout, stderr)
+    """
+    if msg:
+        logger.info(msg)
+
+    if timeout is None:
+        timeout = settings.getValue('TASKS_TIMEOUT') or None
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_execute_task(cmd, logger, check_error, timeout))
+    finally:
+        loop.close()
+
+async def _execute_tasks(cmds, logger, check_error, timeout, max_concurrency):
+    """Coroutine executing given commands, see run_tasks_concurrently() for details.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def limited_task(cmd):
+        """Execute command when concurrency limit allows it
+        """
+        async with semaphore:
+            return await _execute_task(cmd, logger, check_error, timeout)
+
+    return await asyncio.gather(*[limited_task(cmd) for cmd in cmds],
+                                return_exceptions=True)
+
+def run_tasks_concurrently(cmds, logger, msg=None, check_error=False, timeout=None,
+                           max_concurrency=None):
+    """Run several independent tasks in parallel.
+
+    Commands are executed the same way as by ``run_task``, but up to
+    ``max_concurrency`` of them are running at the same time. Function
+    returns after all commands are finished. In case that ``check_error``
+    is True, then the first detected error is raised after that.
+
+    :param cmds: List of commands to be executed
+    :param logger: Logger to write details to
+    :param msg: Message to be shown to user
+    :param check_error: Throw exception on error
+    :param timeout: Maximum execution time of every command in seconds;
+        TASKS_TIMEOUT is used by default
+    :param max_concurrency: Maximum number of commands running at once;
+        TASKS_MAX_CONCURRENCY is used by default
+
+    :returns: list of (stdout, stderr) tuples in the order of ``cmds``
+    """
+    if msg:
+        logger.info(msg)
+
+    if timeout is None:
+        timeout = settings.getValue('TASKS_TIMEOUT') or None
+    if not max_concurrency:
+        max_concurrency = settings.getValue('TASKS_MAX_CONCURRENCY')
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(
+            _execute_tasks(cmds, logger, check_error, timeout, max_concurrency))
+    finally:
+        loop.close()
+
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+    return results
+
+def run_probe(cmd, timeout=None):
+    """Run command used as a readiness probe.
+
+    :param cmd: Exact command to be executed
+    :param timeout: Maximum command execution time in seconds
+
+    :returns: stdout of the command or None if it has failed
+    """
+    try:
+        return run_task(cmd, _PROBE_LOGGER, check_error=True, timeout=timeout)[0]
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+
+def wait_for(probe, deadline, logger, msg=None):
+    """Wait until readiness probe succeeds.
+
+    Probe is called repeatedly with exponential backoff, starting with
+    _POLL_INTERVAL and limited by _MAX_PROBE_INTERVAL, until it returns
+    True or ``deadline`` expires. Several probes can share one deadline,
+    so the whole startup sequence is limited by a single timeout.
+
+    :param probe: Function without arguments returning True on success
+    :param deadline: Time (as returned by ``time.time()``) to give up at
+    :param logger: Logger to write details to
+    :param msg: Description of the probed object used in log messages
+
+    :returns: True if probe has succeeded before the deadline
+    """
+    start = time.time()
+    interval = _POLL_INTERVAL
+    while True:
+        if probe():
+            logger.debug('%s is ready after %.3f s', msg or 'Probe', time.time() - start)
+            return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logger.error('%s is not ready after %.3f s', msg or 'Probe', time.time() - start)
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, _MAX_PROBE_INTERVAL)
+
+def start_broker(logger):
+    """Start privileged command broker if it is enabled by PRIVILEGED_BROKER.
+
+    All sudo commands with binaries listed in PRIVILEGED_BROKER_ALLOWED
+    executed by ``run_task`` and ``run_tasks_concurrently`` are passed
+    to the broker. In case that broker can't be started, then sudo is used.
+
+    :param logger: Logger to write details to
+    """
+    if not settings.getValue('PRIVILEGED_BROKER') or _BROKER['socket']:
+        return
+
+    socket_dir = tempfile.mkdtemp(prefix='vsperf_broker_')
+    socket_path = os.path.join(socket_dir, 'broker.sock')
+    allowed_names = settings.getValue('PRIVILEGED_BROKER_ALLOWED')
+    # binaries configured by TOOLS (e.g. OVS built from sources) are allowed
+    # by their configured paths too
+    tools = settings.getValue('TOOLS') if settings.hasValue('TOOLS') else {}
+    allowed = broker.resolve_allowed(allowed_names + [tools[name] for name in allowed_names
+                                                      if name in tools])
+    cmd = ['sudo', sys.executable, os.path.realpath(broker.__file__),
+           '--socket', socket_path, '--uid', str(os.getuid()),
+           '--allow', ','.join(sorted(allowed))]
+    logger.info('Starting privileged command broker')
+    logger.debug('%s%s', CMD_PREFIX, ' '.join(cmd))
+    proc = subprocess.Popen(cmd, stdout=_get_stdout())
+
+    # wait until broker accepts connections
+    deadline = time.time() + settings.getValue('PRIVILEGED_BROKER_TIMEOUT')
+    while time.time() < deadline and proc.poll() is None:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+            _BROKER.update({'socket': socket_path, 'process': proc, 'dir': socket_dir,
+                            'allowed': allowed})
+            return
+        except OSError:
+            time.sleep(_POLL_INTERVAL)
+
+    logger.warning('Privileged command broker is not available, sudo will be used instead')
+    if proc.poll() is None:
+        terminate_task(proc.pid, logger=logger)
+    shutil.rmtree(socket_dir, ignore_errors=True)
+
+def stop_broker(logger):
+    """Stop privileged command broker if it is running.
+
+    :param logger: Logger to write details to
+    """
+    if not _BROKER['socket']:
+        return
+
+    logger.info('Stopping privileged command broker')
+    try:
+        broker.shutdown(_BROKER['socket'])
+        _BROKER['process'].wait(settings.getValue('PRIVILEGED_BROKER_TIMEOUT'))
+    except (OSError, subprocess.TimeoutExpired):
+        terminate_task(_BROKER['process'].pid, logger=logger)
+    shutil.rmtree(_BROKER['dir'], ignore_errors=True)
+    _BROKER.update({'socket': None, 'process': None, 'dir': None, 'allowed': set()})
+
+def log_task_stats(logger):
+    """Log number of executions and average latency of executed commands.
+
+    Statistics are grouped by command binary and execution method, i.e.
+    'broker' for commands executed by privileged command broker, 'sudo'
+    for commands executed via sudo and 'exec' for other commands.
+
+    :param logger: Logger to write details to
+    """
+    for ((binary, method), (count, duration)) in sorted(_TASK_STATS.items()):
+        logger.debug('Command %s executed %d times by %s, average latency %.2f ms',
+                     binary, count, method, duration * 1000 / count)
+
 def update_pids(pid):
     """update list of running pids, so they can be terminated at the end
     """
@@ -167,31 +445,139 @@ def run_interactive_task(cmd, logger, msg):
 
     return child
 
+def _pid_isalive(pid):
+    """Check if process with given pid is running
+
+    Unlike ``systeminfo.pid_isalive``, zombie processes are considered
+    to be terminated.
+    """
+    try:
+        with open('/proc/{}/stat'.format(pid)) as stat_file:
+            # process state follows process name enclosed in brackets
+            return stat_file.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (OSError, IndexError):
+        return False
+
+def _get_descendants(pids):
+    """Return list of all descendants of given processes
+    """
+    descendants = []
+    while pids:
+        try:
+            pids = subprocess.check_output(
+                ['pgrep', '-P', ','.join(str(pid) for pid in pids)]).decode().split()
+        except subprocess.CalledProcessError:
+            pids = []
+        descendants.extend(pids)
+    return descendants
+
+def _wait_for_pids(pids, timeout):
+    """Wait until given processes terminate or timeout expires
+
+    Process termination is signaled by pidfd if it is supported by kernel
+    and python. Otherwise process state is checked every _POLL_INTERVAL.
+
+    :param pids: List of process IDs
+    :param timeout: Maximum delay in seconds
+
+    :returns: Dictionary with time of termination of every terminated process
+    """
+    deadline = time.time() + timeout
+    terminated = {}
+    pidfds = {}
+    polled = []
+    poller = select.poll()
+    for pid in pids:
+        try:
+            pidfd = os.pidfd_open(int(pid))
+        except ProcessLookupError:
+            terminated[pid] = time.time()
+            continue
+        except (AttributeError, OSError):
+            polled.append(pid)
+            continue
+        pidfds[pidfd] = pid
+        poller.register(pidfd, select.POLLIN)
+
+    try:
+        while True:
+            for pid in list(polled):
+                if not _pid_isalive(pid):
+                    terminated[pid] = time.time()
+                    polled.remove(pid)
+            remaining = max(0, deadline - time.time())
+            if not (pidfds or polled):
+                break
+            if polled:
+                remaining = min(remaining, _POLL_INTERVAL)
+            # processes are checked at least once, even if timeout has expired
+            for (pidfd, _) in poller.poll(remaining * 1000):
+                terminated[pidfds.pop(pidfd)] = time.time()
+                poller.unregister(pidfd)
+                os.close(pidfd)
+            if time.time() >= deadline:
+                break
+    finally:
+        for pidfd in pidfds:
+            os.close(pidfd)
+
+    return terminated
+
+def _terminate_pids(pids, signal, sleep, logger):
+    """Terminate given processes in parallel
+
+    Signal is sent to all processes at once. Processes, which do not
+    terminate in time, are killed by SIGKILL (unless SIGKILL was already
+    sent). The whole termination is bounded by ``sleep`` seconds; the last
+    ``_KILL_WAIT`` seconds of it are reserved for SIGKILL. Termination
+    latency of every process is logged.
+    """
+    if not logger:
+        logger = logging.getLogger(__name__)
+
+    start = time.time()
+    deadline = start + sleep
+    kill = signal.lstrip('-').upper() not in ('9', 'KILL', 'SIGKILL')
+    alive = [pid for pid in pids if _pid_isalive(pid)]
+    if alive:
+        run_task(['sudo', 'kill', signal] + [str(pid) for pid in alive], logger)
+        logger.debug('Wait for processes %s to terminate after signal %s', alive, signal)
+        kill_wait = min(_KILL_WAIT, sleep / 2) if kill else 0
+        terminated = _wait_for_pids(alive, deadline - kill_wait - time.time())
+
+        survivors = [pid for pid in alive if pid not in terminated]
+        if survivors and kill:
+            run_task(['sudo', 'kill', '-9'] + [str(pid) for pid in survivors], logger)
+            logger.debug('Wait for processes %s to terminate after signal -9', survivors)
+            terminated.update(_wait_for_pids(survivors, deadline - time.time()))
+
+        for pid in alive:
+            if pid in terminated:
+                logger.debug('Process %s terminated in %.3f s', pid, terminated[pid] - start)
+            else:
+                logger.warning('Process %s is still alive after %.3f s', pid,
+                               time.time() - start)
+
+    terminated_pids = [str(pid) for pid in pids]
+    executed_pids = settings.getValue('_EXECUTED_PIDS')
+    if any(str(pid) in terminated_pids for pid in executed_pids):
+        settings.setValue('_EXECUTED_PIDS', [pid for pid in executed_pids
+                                             if str(pid) not in terminated_pids])
+
 def terminate_task_subtree(pid, signal='-15', sleep=10, logger=None):
     """Terminate given process and all its children
 
-    Function will sent given signal to the process. In case
-    that process will not terminate within given sleep interval
-    and signal was not SIGKILL, then process will be killed by SIGKILL.
-    After that function will check if all children of the process
-    are terminated and if not the same terminating procedure is applied
-    on any living child (only one level of children is considered).
+    Function will sent given signal to the process and all its descendants
+    at once. In case that any of processes will not terminate within given
+    sleep interval and signal was not SIGKILL, then it will be killed
+    by SIGKILL.
 
     :param pid: Process ID to terminate
     :param signal: Signal to be sent to the process
     :param sleep: Maximum delay in seconds after signal is sent
     :param logger: Logger to write details to
     """
-    try:
-        children = subprocess.check_output("pgrep -P " + str(pid), shell=True).decode().rstrip('\n').split()
-    except subprocess.CalledProcessError:
-        children = []
-
-    terminate_task(pid, signal, sleep, logger)
-
-    # just for case children were kept alive
-    for child in children:
-        terminate_task(child, signal, sleep, logger)
+    _terminate_pids([pid] + _get_descendants([pid]), signal, sleep, logger)
 
 def terminate_task(pid, signal='-15', sleep=10, logger=None):
     """Terminate process with given pid
@@ -205,21 +591,7 @@ def terminate_task(pid, signal='-15', sleep=10, logger=None):
     :param sleep: Maximum delay in seconds after signal is sent
     :param logger: Logger to write details to
     """
-    if systeminfo.pid_isalive(pid):
-        run_task(['sudo', 'kill', signal, str(pid)], logger)
-        logger.debug('Wait for process %s to terminate after signal %s', pid, signal)
-        for dummy in range(sleep):
-            time.sleep(1)
-            if not systeminfo.pid_isalive(pid):
-                break
-
-        if signal.lstrip('-').upper() not in ('9', 'KILL', 'SIGKILL') and systeminfo.pid_isalive(pid):
-            terminate_task(pid, '-9', sleep, logger)
-
-    pids = settings.getValue('_EXECUTED_PIDS')
-    if pid in pids:
-        pids.remove(pid)
-        settings.setValue('_EXECUTED_PIDS', pids)
+    _terminate_pids([pid], signal, sleep, logger)
 
 def terminate_all_tasks(logger):
     """Terminate all processes executed by vsperf, just for case they were not
@@ -228,8 +600,7 @@ def terminate_all_tasks(logger):
     pids = settings.getValue('_EXECUTED_PIDS')
     if pids:
         logger.debug('Following processes will be terminated: %s', pids)
-        for pid in pids:
-            terminate_task_subtree(pid, logger=logger)
+        _terminate_pids(pids + _get_descendants(pids), '-15', 10, logger)
         settings.setValue('_EXECUTED_PIDS', [])
 
 class Process(object):
@@ -367,6 +738,17 @@ class Process(object):
                   str(pid)],
                  self._logger)
 
+    def _affinitize_pids(self, bindings):
+        """Affinitize several processes in parallel.
+
+        :param bindings: List of (core, pid) tuples.
+
+        :returns: None
+        """
+        run_tasks_concurrently([['sudo', 'taskset', '-c', '-p', str(core), str(pid)]
+                                for (core, pid) in bindings],
+                               self._logger)
+
     def affinitize(self, core):
         """Affinitize process to a specific ``core``.
 
@@ -14,25 +14,24 @@
 
 """
 veth port emulation
+
+veth ports are configured by netlink, see tools.netlink for details.
 """
 
 import logging
 import os
 
+from tools import netlink
 from tools import tasks
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def add_veth_port(port, peer_port):
+def _track_veth_port(port, peer_port):
     """
-    Add a veth port
-    :param port:port name for the first port
-    :param peer_port: port name for the peer port
-    :return: None
+    Touch a file in a tmp area so we can track VSPerf created veth ports
+    and clean them up if needed
     """
-    # touch some files in a tmp area so we can track them. This allows us to
-    # track VSPerf created veth ports so they can be cleaned up if needed.
     if not os.path.isdir('/tmp/veth'):
         try:
             os.mkdir('/tmp/veth')
@@ -44,10 +43,29 @@ def add_veth_port(port, peer_port):
     if os.path.isdir('/tmp/veth'):
         with open('/tmp/veth/{}-{}'.format(port, peer_port), 'a'):
             os.utime('/tmp/veth/{}-{}'.format(port, peer_port), None)
-    tasks.run_task(['sudo', 'ip', 'link', 'add',
-                    port, 'type', 'veth', 'peer', 'name', peer_port],
-                   _LOGGER, 'Adding veth port {} with peer port {}...'.format(
-                       port, peer_port), False)
+
+
+def add_veth_port(port, peer_port):
+    """
+    Add a veth port
+    :param port:port name for the first port
+    :param peer_port: port name for the peer port
+    :return: None
+    """
+    add_veth_ports([(port, peer_port)])
+
+
+def add_veth_ports(ports):
+    """
+    Add veth ports by a single netlink batch
+    :param ports: list of (port, peer_port) tuples
+    :return: None
+    """
+    with netlink.batch() as iproute:
+        for (port, peer_port) in ports:
+            _track_veth_port(port, peer_port)
+            _LOGGER.info('Adding veth port %s with peer port %s...', port, peer_port)
+            iproute.link_add_veth(port, peer_port)
 
 
 def bring_up_eth_port(eth_port, namespace=None):
@@ -57,15 +75,10 @@ def bring_up_eth_port(eth_port, namespace=None):
     :param namespace: Namespace eth port it located if needed
     :return: None
     """
-    if namespace:
-        tasks.run_task(['sudo', 'ip', 'netns', 'exec', namespace,
-                        'ip', 'link', 'set', eth_port, 'up'],
-                       _LOGGER,
-                       'Bringing up port {} in namespace {}...'.format(
-                           eth_port, namespace), False)
-    else:
-        tasks.run_task(['sudo', 'ip', 'link', 'set', eth_port, 'up'],
-                       _LOGGER, 'Bringing up port...', False)
+    _LOGGER.info('Bringing up port %s%s...', eth_port,
+                 ' in namespace {}'.format(namespace) if namespace else '')
+    with netlink.batch(namespace) as iproute:
+        iproute.link_set(eth_port, up=True)
 
 
 def del_veth_port(port, peer_port):
@@ -76,12 +89,22 @@ def del_veth_port(port, peer_port):
     :param port: peer port name
     :return: None
     """
-    # delete the file if it exists in the temp area
-    if os.path.exists('/tmp/veth/{}-{}'.format(port, peer_port)):
-        os.remove('/tmp/veth/{}-{}'.format(port, peer_port))
-    tasks.run_task(['sudo', 'ip', 'link', 'del', port],
-                   _LOGGER, 'Deleting veth port {} with peer {}...'.format(
-                       port, peer_port), False)
+    del_veth_ports([(port, peer_port)])
+
+
+def del_veth_ports(ports):
+    """
+    Delete veth ports by a single netlink batch
+    :param ports: list of (port, peer_port) tuples
+    :return: None
+    """
+    with netlink.batch() as iproute:
+        for (port, peer_port) in ports:
+            # delete the file if it exists in the temp area
+            if os.path.exists('/tmp/veth/{}-{}'.format(port, peer_port)):
+                os.remove('/tmp/veth/{}-{}'.format(port, peer_port))
+            _LOGGER.info('Deleting veth port %s with peer %s...', port, peer_port)
+            iproute.link_del(port)
 
 
 def validate_add_veth_port(_result, port, peer_port):
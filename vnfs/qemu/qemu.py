@@ -233,6 +233,7 @@ class IVnfQemu(IVnf):
         for i in re.findall(r'\d', S.getValue('GUEST_SMP')[self._number]):
             cpu_nr = cpu_nr * int(i)
         # pin each GUEST's core to host core based on configured BINDING
+        bindings = []
         for cpu in range(0, cpu_nr):
             match = None
             guest_thread_binding = S.getValue('GUEST_THREAD_BINDING')[self._number]
@@ -241,13 +242,15 @@ class IVnfQemu(IVnf):
             for line in output.decode(cur_locale).split('\n'):
                 match = re.search(thread_id % cpu, line)
                 if match:
-                    self._affinitize_pid(guest_thread_binding[cpu], match.group(1))
+                    bindings.append((guest_thread_binding[cpu], match.group(1)))
                     break
 
             if not match:
                 self._logger.error('Failed to affinitize guest core #%d. Could'
                                    ' not parse tid.', cpu)
 
+        self._affinitize_pids(bindings)
+
     def _affinitize_vhost_net(self):
         """
         Affinitize the vhost net threads for Vanilla OVS and guest nic queues.
@@ -266,14 +269,16 @@ class IVnfQemu(IVnf):
 
         cpumap = S.getValue('VSWITCH_VHOST_CPU_MAP')
         mapcount = 0
+        bindings = []
         for proc in processes:
-            self._affinitize_pid(cpumap[mapcount], proc)
+            bindings.append((cpumap[mapcount], proc))
             mapcount += 1
             if mapcount + 1 > len(cpumap):
                 # Not enough cpus were given in the mapping to cover all the
                 # threads on a 1 to 1 ratio with cpus so reset the list counter
                 #  to 0.
                 mapcount = 0
+        self._affinitize_pids(bindings)
 
     def _config_guest_loopback(self):
         """
@@ -18,20 +18,22 @@
 import os
 import re
 import time
+import contextlib
 import datetime
+import itertools
 import random
-import socket
-import netaddr
 import pexpect
 
 from conf import settings
-from src.ovs import OFBridge, flow_key, flow_match
+from src.ovs import OFBridge, install_flows, install_spools, ovsdb, flowgen, flow_key, parse_flow
 from vswitches.vswitch import IVSwitch
 from tools import tasks
 from tools.module_manager import ModuleManager
 
-# enable caching of flows if their number exceeds given limit
-_CACHE_FLOWS_LIMIT = 10
+# prefixes of other_config keys, which must not be changed by a testcase
+# to allow reuse of warm vswitchd; they define DPDK memory and EAL options,
+# which are applied only at vswitchd startup
+_WARM_OTHER_CONFIG = ('dpdk', 'per-port-memory')
 
 # pylint: disable=too-many-public-methods
 class IVSwitchOvs(IVSwitch, tasks.Process):
@@ -63,6 +65,9 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
                                '--overwrite-pidfile', '--log-file=' + self._logfile]
         self._cmd_template = ['sudo', '-E', settings.getValue('TOOLS')['ovs-vswitchd']]
         self._module_manager = ModuleManager()
+        self._batch = None
+        self._desired_flows = None
+        self._warm = None
         self._flow_template = settings.getValue('OVS_FLOW_TEMPLATE').copy()
         self._flow_actions = ['output:{}']
 
@@ -81,32 +86,156 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
 
         :raises: pexpect.EOF, pexpect.TIMEOUT
         """
+        if self._reuse_warm():
+            return
+
         self._logger.info("Starting vswitchd...")
+        self._startup_timings = {}
+        deadline = time.time() + settings.getValue('VSWITCH_STARTUP_TIMEOUT')
+        pids = settings.getValue('_EXECUTED_PIDS')
+
+        with self._startup_phase('init'):
+            self._init_environment()
+
+        self._cmd = self._cmd_template + self._vswitchd_args
+
+        # DB must be started and up before vswitchd config is altered or vswitchd started
+        with self._startup_phase('ovsdb'):
+            self._reset_ovsdb()
+            self._start_ovsdb()
+            if not tasks.wait_for(self._is_ovsdb_ready, deadline, self._logger, 'ovsdb-server'):
+                self._kill_ovsdb()
+                raise RuntimeError('ovsdb-server has not started in time')
+
+        with self._startup_phase('configure'):
+            if settings.getValue('OVS_OVSDB_NATIVE'):
+                ovsdb.connect(self.get_db_sock_path(), self._logger)
+
+            self.configure()
+
+        with self._startup_phase('vswitchd'):
+            try:
+                tasks.Process.start(self)
+                self.relinquish()
+            except (pexpect.EOF, pexpect.TIMEOUT) as exc:
+                self._logger.error("Exception during VSwitch start.")
+                self._kill_ovsdb()
+                raise exc
+            if not tasks.wait_for(self._is_vswitchd_ready, deadline, self._logger,
+                                  self._proc_name):
+                self.kill()
+                raise RuntimeError('{} has not started in time'.format(self._proc_name))
 
+        self._logger.info("Vswitchd...Started.")
+
+        if settings.getValue('VSWITCH_KEEP_WARM') and self.get_warm_signature() is not None:
+            self._warm = {'signature': self.get_warm_signature(),
+                          'other_config': self._get_warm_other_config(),
+                          'pids': [pid for pid in settings.getValue('_EXECUTED_PIDS')
+                                   if pid not in pids],
+                          'startup_time': sum(self._startup_timings.values()),
+                          'reuse_count': 0,
+                          'check_time': 0,
+                          'switches': {}}
+
+    def _init_environment(self):
+        """Prepare environment, e.g. kernel modules, before ovsdb-server is started
+        """
         # insert kernel modules if required
         if 'vswitch_modules' in settings.getValue('TOOLS'):
             self._module_manager.insert_modules(settings.getValue('TOOLS')['vswitch_modules'])
 
-        self._cmd = self._cmd_template + self._vswitchd_args
+    def _is_ovsdb_ready(self):
+        """Readiness probe of ovsdb-server
 
-        # DB must be started before vswitchd
-        self._reset_ovsdb()
-        self._start_ovsdb()
+        Socket is probed directly by a lightweight request if it is
+        accessible by VSPERF, otherwise by ovs-vsctl executed by sudo.
+        """
+        sock_path = self.get_db_sock_path()
+        if not os.path.exists(sock_path):
+            return False
+        try:
+            return ovsdb.probe(sock_path)
+        except PermissionError:
+            return tasks.run_probe(['sudo', settings.getValue('TOOLS')['ovs-vsctl'],
+                                    '--timeout', '1', '--no-wait', 'show'], timeout=2) is not None
 
-        # DB must be up before vswitchd config is altered or vswitchd started
-        time.sleep(3)
+    def _is_vswitchd_ready(self):
+        """Readiness probe of ovs-vswitchd; it must respond to ``ovs-appctl version``
+        """
+        output = tasks.run_probe(['sudo', settings.getValue('TOOLS')['ovs-appctl'],
+                                  '--timeout', '1'] + settings.getValue('OVS_APPCTL_ARGS') +
+                                 ['version'], timeout=2)
+        return output is not None and self._proc_name in output
 
-        self.configure()
+    def _reuse_warm(self):
+        """Reuse vswitchd kept running by previous testcase
 
-        try:
-            tasks.Process.start(self)
-            self.relinquish()
-        except (pexpect.EOF, pexpect.TIMEOUT) as exc:
-            self._logger.error("Exception during VSwitch start.")
-            self._kill_ovsdb()
-            raise exc
+        The instance is used by the next testcase only if can_reuse_warm()
+        has passed, see core.vswitch_controller.get_vswitch().
 
-        self._logger.info("Vswitchd...Started.")
+        :returns: True if warm vswitchd is reused
+        """
+        if not self._warm:
+            return False
+        self._startup_timings = {'warm_reuse': self._warm['check_time']}
+        self._warm['reuse_count'] += 1
+        self._logger.info('Reusing warm vswitchd; %.1f s of setup time saved',
+                          self._warm['startup_time'])
+        return True
+
+    def can_reuse_warm(self):
+        """See IVswitch for general description
+        """
+        if not self._warm:
+            return False
+        start_time = time.time()
+        if not settings.getValue('VSWITCH_KEEP_WARM'):
+            self._logger.info('Warm vswitchd is not allowed anymore, terminating...')
+        elif self.get_warm_signature() != self._warm['signature']:
+            self._logger.info('Configuration of warm vswitchd has changed, terminating...')
+        elif self._get_warm_other_config() != self._warm['other_config']:
+            self._logger.info('DPDK settings of warm vswitchd were changed, terminating...')
+        else:
+            self._warm['check_time'] = time.time() - start_time
+            return True
+        return False
+
+    # pylint: disable=no-self-use
+    def _get_warm_other_config(self):
+        """Return PMD and memory related items of Open_vSwitch other_config
+
+        :returns: Sorted list of 'key=value' strings
+        """
+        output = OFBridge(timeout=-1).run_vsctl(['get', 'Open_vSwitch', '.', 'other_config'])[0]
+        return sorted(item.strip() for item in output.strip().strip('{}').split(',')
+                      if item.strip().startswith(_WARM_OTHER_CONFIG))
+
+    def get_warm_signature(self):
+        """See IVswitch for general description
+
+        Reuse of vswitchd is not supported by default, because kernel
+        datapath and modules are removed by stop().
+        """
+        return None
+
+    def is_warm(self):
+        """See IVswitch for general description
+        """
+        return self._warm is not None
+
+    def terminate(self):
+        """See IVswitch for general description
+        """
+        if self._warm is None:
+            return
+        self._logger.info('Warm vswitchd was reused by %s testcase(s); %.1f s of setup time saved',
+                          self._warm['reuse_count'],
+                          self._warm['reuse_count'] * self._warm['startup_time'])
+        self._warm = None
+        self._logger.info("Terminating vswitchd...")
+        self.kill()
+        self._logger.info("Vswitchd...Terminated.")
 
     def restart(self):
         """ Restart ``ovs-vswitchd`` instance. ``ovsdb-server`` is not restarted.
@@ -144,7 +273,24 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
 
     def stop(self):
         """See IVswitch for general description
-        """
+
+        In case that vswitchd is kept warm, its processes are excluded from
+        cleanup at the end of testcase. Bridges are kept together with their
+        ports and reconciled flows, so the next testcase can reuse them, see
+        add_switch() and reconcile_connections().
+        """
+        if self._warm and self.is_running():
+            self._del_stale_switches()
+            for (switch_name, bridge) in self._switches.items():
+                bridge.keep_ports()
+                self._warm['switches'][switch_name] = bridge
+            self._switches = {}
+            settings.setValue('_EXECUTED_PIDS', [pid for pid in settings.getValue('_EXECUTED_PIDS')
+                                                 if pid not in self._warm['pids']])
+            self._logger.info("Keeping vswitchd running for the next testcase.")
+            return
+        self._warm = None
+
         for switch_name in list(self._switches):
             self.del_switch(switch_name)
         self._logger.info("Terminating vswitchd...")
@@ -154,15 +300,30 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
 
     def add_switch(self, switch_name, params=None):
         """See IVswitch for general description
+
+        Bridge kept by warm vswitchd is reused if it was created with the same
+        parameters. Only its flows added by reconcile_connections() are kept.
         """
-        # create and configure new ovs bridge and delete all default flows
-        bridge = OFBridge(switch_name)
-        bridge.create(params)
-        bridge.del_flow({})
+        bridge = self._warm['switches'].pop(switch_name, None) if self._warm else None
+        if bridge is not None and bridge.get_params() == (params or []):
+            self._logger.info('Reusing bridge %s kept by previous testcase', switch_name)
+            bridge.del_flow({'cookie': '0/-1'})
+        else:
+            if bridge is not None:
+                bridge.destroy()
+            # deployment differs from the previous one, so ports of other
+            # kept bridges are removed to avoid clashes of port names
+            self._del_stale_switches()
+            # create and configure new ovs bridge and delete all default flows
+            bridge = OFBridge(switch_name)
+            bridge.create(params)
+            bridge.del_flow({})
         bridge.set_db_attribute('Open_vSwitch', '.',
                                 'other_config:max-idle',
                                 settings.getValue('VSWITCH_FLOW_TIMEOUT'))
         self._switches[switch_name] = bridge
+        if self._batch is not None:
+            bridge.begin_batch(self._batch)
         if settings.getValue('OVS_ROUTING_TABLES'):
             # table#0 - flows designed to force 5 & 13 tuple matches go here
             flow = {'table':'0', 'priority':'1', 'actions': ['goto_table:1']}
@@ -198,6 +359,75 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
         self._switches.pop(switch_name)
         bridge.destroy()
 
+    def _del_stale_switches(self):
+        """Remove bridges and ports kept by warm vswitchd, which were not reused
+        """
+        if not self._warm:
+            return
+        for (switch_name, bridge) in self._switches.items():
+            port_names = bridge.del_kept_ports()
+            if port_names:
+                self._logger.info('Removing ports %s of bridge %s, which were not reused',
+                                  ', '.join(port_names), switch_name)
+        for (switch_name, bridge) in self._warm['switches'].items():
+            self._logger.info('Removing bridge %s, which was not reused', switch_name)
+            bridge.destroy()
+        self._warm['switches'] = {}
+
+    @contextlib.contextmanager
+    def batch(self):
+        """See IVswitch for general description
+
+        Changes of ports, interfaces and bridge attributes of all bridges
+        are applied by a single ovs-vsctl transaction. Bridges are created
+        immediately, so their flows can be modified inside the context.
+        Bridges must not be removed inside the context.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        for bridge in self._switches.values():
+            bridge.begin_batch(self._batch)
+        try:
+            yield
+        finally:
+            commands = self._batch
+            self._batch = None
+            for bridge in self._switches.values():
+                if bridge.in_batch():
+                    bridge.end_batch()
+        if commands:
+            OFBridge().run_batch(commands)
+            for bridge in self._switches.values():
+                bridge.update_ofports()
+
+    @contextlib.contextmanager
+    def reconcile_connections(self):
+        """See IVswitch for general description
+
+        Flows of connections added inside the context are marked by
+        a dedicated cookie. At the context exit, only differences between
+        desired and already installed connection flows are applied by
+        a single bundle per bridge. Connection flows left by previous
+        reconciliation, which are not desired anymore, are deleted. Flows
+        added by add_flow() are not affected. Bridges and ports kept by
+        warm vswitchd, which were not reused, are removed.
+        """
+        if self._desired_flows is not None:
+            yield
+            return
+        self._desired_flows = {}
+        try:
+            yield
+        finally:
+            desired_flows = self._desired_flows
+            self._desired_flows = None
+        self._del_stale_switches()
+        spools = [(self._switches[name], self._switches[name].get_reconcile_spool(
+            itertools.chain.from_iterable(flows))) for (name, flows) in desired_flows.items()]
+        install_spools(spools)
+
     def add_phy_port(self, switch_name):
         """See IVswitch for general description
         """
@@ -275,6 +505,19 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
         bridge = self._switches[switch_name]
         bridge.add_flow(flow, cache=cache)
 
+    def flush_flows(self, switch_names=None):
+        """Install flows cached by add_flow() with cache='on'
+
+        Flows of all bridges are installed concurrently.
+
+        :param switch_names: List of bridges; all bridges are used by default
+
+        :returns: Tuple of (number of flows, installation time in seconds)
+        """
+        if switch_names is None:
+            switch_names = list(self._switches)
+        return install_flows([self._switches[name] for name in switch_names])
+
     def del_flow(self, switch_name, flow=None):
         """See IVswitch for general description
         """
@@ -290,7 +533,10 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
 
     def _prepare_flows(self, operation, switch_name, port1, port2, traffic=None):
         """Prepare flows for add_connection, del_connection and validate methods
-           It returns a list of flows based on given parameters.
+           It returns flows based on given parameters. Flows to be added are
+           returned as flow strings; stream specific flows of multistream
+           feature are generated lazily. Flows to be deleted are returned
+           as a list of dictionaries.
         """
         flows = []
         if operation == 'add':
@@ -300,29 +546,13 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
             flow.update({'in_port': bridge.get_ports()[port1][0], 'actions': actions})
             # check if stream specific connection(s) should be crated for multistream feature
             if traffic and traffic['pre_installed_flows'].lower() == 'yes':
-                for stream in range(traffic['multistream']):
-                    tmp_flow = flow.copy()
-                    # update flow based on trafficgen settings
-                    if traffic['stream_type'] == 'L2':
-                        dst_mac_value = netaddr.EUI(traffic['l2']['dstmac']).value
-                        tmp_mac = netaddr.EUI(dst_mac_value + stream)
-                        tmp_mac.dialect = netaddr.mac_unix_expanded
-                        tmp_flow.update({'dl_dst':tmp_mac})
-                    elif traffic['stream_type'] == 'L3':
-                        dst_ip_value = netaddr.IPAddress(traffic['l3']['dstip']).value
-                        tmp_ip = netaddr.IPAddress(dst_ip_value + stream)
-                        tmp_flow.update({'dl_type':'0x0800', 'nw_dst':tmp_ip})
-                    elif traffic['stream_type'] == 'L4':
-                        tmp_flow.update({'dl_type':'0x0800',
-                                         'nw_proto':socket.getprotobyname(traffic['l3']['proto'].lower()),
-                                         'tp_dst':(traffic['l4']['dstport'] + stream) % 65536})
-                    flows.append(tmp_flow)
+                return flowgen.multistream_flows(flow, traffic)
             elif traffic and traffic['flow_type'].lower() == 'ip':
                 flow.update({'dl_type':'0x0800', 'nw_src':traffic['l3']['srcip'],
                              'nw_dst':traffic['l3']['dstip']})
-                flows.append(flow)
+                flows.append(flow_key(flow))
             else:
-                flows.append(flow)
+                flows.append(flow_key(flow))
         elif operation == 'del' and port1:
             bridge = self._switches[switch_name]
             flows.append({'in_port': bridge.get_ports()[port1][0]})
@@ -336,20 +566,29 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
         """
         flows = self._prepare_flows('add', switch_name, port1, port2, traffic)
 
-        # enable flows caching for large number of flows
-        cache = 'on' if len(flows) > _CACHE_FLOWS_LIMIT else 'off'
-
-        for flow in flows:
-            self.add_flow(switch_name, flow, cache)
+        # flows are consumed lazily at the exit of reconcile_connections()
+        if self._desired_flows is not None:
+            self._desired_flows.setdefault(switch_name, []).append(flows)
+            return
 
-        if cache == 'on':
-            self.add_flow(switch_name, [], cache='flush')
+        self._del_stale_switches()
+        # flows are streamed into a spool and installed by a single ovs-ofctl process
+        self._switches[switch_name].add_flows(flows)
 
     def del_connection(self, switch_name, port1=None, port2=None):
         """See IVswitch for general description
         """
         flows = self._prepare_flows('del', switch_name, port1, port2)
 
+        # flows not re-added inside reconcile_connections() are deleted at its exit
+        if self._desired_flows is not None:
+            match = parse_flow(flow_key(flows[0]))[0][2]
+            self._desired_flows[switch_name] = [
+                (desired for desired in desired_flows
+                 if not match.issubset(parse_flow(desired)[0][2]))
+                for desired_flows in self._desired_flows.get(switch_name, [])]
+            return
+
         for flow in flows:
             self.del_flow(switch_name, flow)
 
@@ -438,6 +677,7 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
                 vswitchd_pid = pidfile.read().strip()
                 tasks.terminate_task(vswitchd_pid, logger=self._logger)
 
+        ovsdb.disconnect()
         self._kill_ovsdb()  # ovsdb must be killed after vswitchd
 
         # just for case, that sudo envelope has not been terminated yet
@@ -571,20 +811,23 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
         assert 'Port "%s"' % port_name not in output[0]
         return True
 
-    def validate_add_connection(self, result, switch_name, port1, port2, traffic=None):
+    def validate_add_connection(self, _dummy_result, switch_name, port1, port2, traffic=None):
         """ Validate that connection was added
         """
-        for flow in self._prepare_flows('add', switch_name, port1, port2, traffic):
-            if not self.validate_add_flow(result, switch_name, flow):
+        # all flows are verified against a single dump of flows
+        flow_table = self._switches[switch_name].get_flow_table()
+        for flow_str in self._prepare_flows('add', switch_name, port1, port2, traffic):
+            if not flow_table.contains(flow_str):
                 return False
 
         return True
 
-    def validate_del_connection(self, result, switch_name, port1, port2):
+    def validate_del_connection(self, _dummy_result, switch_name, port1, port2):
         """ Validate that connection was deleted
         """
+        flow_table = self._switches[switch_name].get_flow_table()
         for flow in self._prepare_flows('del', switch_name, port1, port2):
-            if not self.validate_del_flow(result, switch_name, flow):
+            if flow and flow_table.contains(flow):
                 return False
 
         return True
@@ -603,17 +846,8 @@ class IVSwitchOvs(IVSwitch, tasks.Process):
 
         # Note: it should be possible to call `ovs-ofctl dump-flows switch flow`
         # to verify flow insertion, but it doesn't accept the same flow syntax
-        # as add-flow, so we have to compare it the hard way
-
-        # get dump of flows and compare them one by one
-        flow_src = flow_key(flow)
-        bridge = self._switches[switch_name]
-        output = bridge.run_ofctl(['dump-flows', switch_name], check_error=True)
-        for flow_dump in output[0].split('\n'):
-            if flow_match(flow_dump, flow_src):
-                # flow was added correctly
-                return True
-        return False
+        # as add-flow, so we have to compare it against normalized snapshot
+        return self._switches[switch_name].get_flow_table().contains(flow)
 
     def validate_del_flow(self, _dummy_result, switch_name, flow=None):
         """ Validate removal of the flow
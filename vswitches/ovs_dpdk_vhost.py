@@ -17,11 +17,15 @@
 
 import subprocess
 
-from src.ovs import OFBridge
+from src.ovs import OFBridge, parse_pmd_rxqs
 from src.dpdk import dpdk
 from conf import settings as S
+from tools import systeminfo
 from vswitches.ovs import IVSwitchOvs
 
+# minimal OVS version supporting given value of other_config:pmd-rxq-assign
+_RXQ_ASSIGN_MIN_VERSION = {'group': (2, 16)}
+
 class OvsDpdkVhost(IVSwitchOvs):
     """ Open vSwitch with DPDK support
 
@@ -37,6 +41,8 @@ class OvsDpdkVhost(IVSwitchOvs):
     def __init__(self):
         super().__init__()
         vswitchd_args = []
+        # rxq settings changed by set_rxq_layout(); they are restored by stop()
+        self._rxq_changes = None
 
         # legacy DPDK configuration through --dpdk option of vswitchd
         if self.old_dpdk_config():
@@ -71,7 +77,6 @@ class OvsDpdkVhost(IVSwitchOvs):
 
         Activates DPDK kernel modules, ovsdb and vswitchd.
         """
-        dpdk.init()
         super(OvsDpdkVhost, self).start()
         # old style OVS <= 2.5.0 multi-queue enable
         if S.getValue('OVS_OLD_STYLE_MQ') and \
@@ -81,14 +86,169 @@ class OvsDpdkVhost(IVSwitchOvs):
                 'Open_vSwitch', '.', 'other_config:' +
                 'n-dpdk-rxqs', S.getValue('VSWITCH_DPDK_MULTI_QUEUES'))
 
+    def _init_environment(self):
+        """See IVswitchOvs for general description
+
+        Activates DPDK kernel modules.
+        """
+        dpdk.init()
+        super(OvsDpdkVhost, self)._init_environment()
+
     def stop(self):
         """See IVswitch for general description
 
         Kills ovsdb and vswitchd and removes DPDK kernel modules.
         """
 
+        if self.is_warm():
+            self._restore_rxq_layout()
         super(OvsDpdkVhost, self).stop()
-        dpdk.cleanup()
+        if not self.is_warm():
+            dpdk.cleanup()
+
+    def terminate(self):
+        """See IVswitch for general description
+        """
+        if self.is_warm():
+            super(OvsDpdkVhost, self).terminate()
+            dpdk.cleanup()
+
+    def get_warm_signature(self):
+        """See IVswitch for general description
+
+        vswitchd can be reused if DPDK, PMD and multi-queue settings are
+        unchanged. Settings cached by the instance, i.e. vswitchd arguments
+        and flow template, must be unchanged too.
+        """
+        return {'class': self.__class__.__name__,
+                'vswitchd': S.getValue('TOOLS')['ovs-vswitchd'],
+                'ovs_var_tmp': S.getValue('TOOLS')['ovs_var_tmp'],
+                'log_file': S.getValue('LOG_FILE_VSWITCHD'),
+                'flow_template': S.getValue('OVS_FLOW_TEMPLATE'),
+                'routing_tables': S.getValue('OVS_ROUTING_TABLES'),
+                'dpdk_args': S.getValue('VSWITCHD_DPDK_ARGS'),
+                'dpdk_config': S.getValue('VSWITCHD_DPDK_CONFIG'),
+                'socket_mem': S.getValue('DPDK_SOCKET_MEM'),
+                'pmd_cpu_mask': S.getValue('VSWITCH_PMD_CPU_MASK'),
+                'affinitization': S.getValue('VSWITCH_AFFINITIZATION_ON'),
+                'multi_queues': S.getValue('VSWITCH_DPDK_MULTI_QUEUES'),
+                'old_style_mq': S.getValue('OVS_OLD_STYLE_MQ'),
+                'whitelist_nics': S.getValue('WHITELIST_NICS')}
+
+    def get_rxq_layouts(self):
+        """See IVswitch for general description
+        """
+        return S.getValue('VSWITCH_PMD_RXQ_LAYOUTS')
+
+    def set_rxq_layout(self, layout):
+        """See IVswitch for general description
+
+        Layout ``affinity`` pins rxqs to PMD cores from VSWITCH_PMD_CPU_MASK
+        by ``pmd-rxq-affinity`` in round robin manner. Other layouts are
+        values of ``pmd-rxq-assign`` applied by rxq rebalance. Actual
+        assignment is read back by ``pmd-rxq-show``.
+        """
+        self._save_rxq_layout()
+        rxq_map = self._get_rxq_map()
+        if layout == 'affinity':
+            mask = int(S.getValue('VSWITCH_PMD_CPU_MASK'), 16)
+            cores = [core for core in range(mask.bit_length()) if mask & (1 << core)]
+            rxqs = sorted(rxq_map, key=lambda rxq: (rxq[1], rxq[0]))
+            affinity = {rxq: cores[index % len(cores)] for (index, rxq) in enumerate(rxqs)}
+            self.set_rxq_mapping(affinity)
+            rxq_map = self._get_rxq_map()
+            return rxq_map if rxq_map == affinity else None
+
+        min_version = _RXQ_ASSIGN_MIN_VERSION.get(layout)
+        version = self._get_ovs_version()
+        if min_version and version and version < min_version:
+            self._logger.warning('PMD rxq layout %s requires OVS %s or newer',
+                                 layout, '.'.join(str(item) for item in min_version))
+            return None
+        tmp_br = OFBridge(timeout=-1)
+        for port in sorted(set(port for (port, _) in rxq_map)):
+            tmp_br.run_vsctl(['remove', 'Interface', port, 'other_config',
+                              'pmd-rxq-affinity'])
+        tmp_br.set_db_attribute('Open_vSwitch', '.', 'other_config:pmd-rxq-assign', layout)
+        tmp_br.run_appctl(['dpif-netdev/pmd-rxq-rebalance'])
+        return self._get_rxq_map()
+
+    def _save_rxq_layout(self):
+        """Remember pmd-rxq-assign before it is changed by set_rxq_layout()
+        """
+        if self._rxq_changes is None:
+            output = OFBridge(timeout=-1).run_vsctl(['--if-exists', 'get', 'Open_vSwitch', '.',
+                                                     'other_config:pmd-rxq-assign'])[0]
+            self._rxq_changes = {'assign': output.strip().strip('"'), 'ports': set()}
+
+    def _restore_rxq_layout(self):
+        """Remove pmd-rxq-affinity and restore pmd-rxq-assign changed by
+        set_rxq_layout(), so they are not inherited by the next testcase
+        reusing warm vswitchd
+        """
+        if self._rxq_changes is None:
+            return
+        tmp_br = OFBridge(timeout=-1)
+        for port in sorted(self._rxq_changes['ports']):
+            tmp_br.run_vsctl(['--if-exists', 'remove', 'Interface', port, 'other_config',
+                              'pmd-rxq-affinity'])
+        if self._rxq_changes['assign']:
+            tmp_br.set_db_attribute('Open_vSwitch', '.', 'other_config:pmd-rxq-assign',
+                                    self._rxq_changes['assign'])
+        else:
+            tmp_br.run_vsctl(['remove', 'Open_vSwitch', '.', 'other_config', 'pmd-rxq-assign'])
+        tmp_br.run_appctl(['dpif-netdev/pmd-rxq-rebalance'])
+        self._rxq_changes = None
+
+    def set_rxq_mapping(self, rxq_map):
+        """See IVswitch for general description
+
+        Every rxq is pinned to its PMD core by ``pmd-rxq-affinity``.
+        """
+        self._save_rxq_layout()
+        tmp_br = OFBridge(timeout=-1)
+        affinity = {}
+        for ((port, queue), core) in sorted(rxq_map.items()):
+            affinity.setdefault(port, []).append('{}:{}'.format(queue, core))
+        self._rxq_changes['ports'].update(affinity)
+        for (port, queues) in sorted(affinity.items()):
+            tmp_br.set_db_attribute('Interface', port, 'other_config:pmd-rxq-affinity',
+                                    '"{}"'.format(','.join(queues)))
+        if self._get_rxq_map() != rxq_map:
+            self._logger.warning('PMD rxq assignment differs from requested one: %s',
+                                 self.get_rxq_mapping())
+
+    def get_rxq_mapping(self):
+        """See IVswitch for general description
+        """
+        return '; '.join('core {}: {}'.format(core, ' '.join(
+            '{}/{}'.format(port, queue) for (port, queue, _) in rxq_list))
+                         for (core, rxq_list) in sorted(self._get_pmd_rxqs().items()))
+
+    def _get_rxq_map(self):
+        """Return actual assignment of rxqs to PMD threads
+
+        :returns: Dictionary with PMD core id indexed by (port, queue) tuple
+        """
+        return {(port, queue): core for (core, rxq_list) in self._get_pmd_rxqs().items()
+                for (port, queue, _) in rxq_list}
+
+    @staticmethod
+    def _get_pmd_rxqs():
+        """Return actual assignment of rxqs to PMD threads
+        """
+        output = OFBridge().run_appctl(['dpif-netdev/pmd-rxq-show'], True)[0]
+        return parse_pmd_rxqs(output)
+
+    @staticmethod
+    def _get_ovs_version():
+        """Return (major, minor) tuple with version of ovs-vswitchd or None
+        """
+        version = systeminfo.get_version('ovs').get()['version']
+        try:
+            return tuple(int(item) for item in version.split('.')[:2])
+        except (AttributeError, ValueError):
+            return None
 
     def add_switch(self, switch_name, params=None):
         """See IVswitch for general description
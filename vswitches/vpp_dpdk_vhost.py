@@ -18,9 +18,11 @@
 import os
 import copy
 import re
+import time
 import pexpect
 
 from src.dpdk import dpdk
+from src.vpp import VppCli, VppCliError
 from conf import settings as S
 from vswitches.vswitch import IVSwitch
 from tools import tasks
@@ -48,6 +50,9 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
         self._phy_ports = []
         self._virt_ports = []
         self._vpp_ctl = ['sudo', S.getValue('TOOLS')['vppctl']]
+        self._cli = None
+        self._cli_failed = False
+        self._nic_info = None
 
         # configure DPDK NICs
         tmp_args = copy.deepcopy(S.getValue('VSWITCH_VPP_ARGS'))
@@ -89,27 +94,41 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
         """Read NIC info from VPP and return NIC details in a dictionary
            indexed by given ``key``
 
+        NIC info is cached until an interface is created or deleted.
+
         :param key: Name of the key to be used for indexing result dictionary
 
         :returns: Dictionary with NIC infos including their PCI addresses
         """
-        result = {}
+        if self._nic_info is None:
+            self._nic_info = self._read_nic_info()
+        # store only NICs with reasonable index
+        return {nic[key]: nic for nic in self._nic_info if nic.get(key) is not None}
+
+    def _read_nic_info(self):
+        """Read NIC info from VPP
+
+        :returns: List of dictionaries with NIC infos including their PCI addresses
+        """
+        result = []
         output = self.run_vppctl(['show', 'hardware', 'brief'])
         # parse output and store basic info about NICS
         ifaces = output[0].split('\n')
         keys = ifaces[0].split()
         keys.append('Pci')
-        keyidx = keys.index(key)
+        nics = []
         for iface in ifaces[1:]:
             tmpif = iface.split()
             if not tmpif:
                 continue
             if 'Link' in iface or 'local' in iface:
                 continue
-            # get PCI address of given interface
-            output = self.run_vppctl(['show', 'hardware', tmpif[1], 'detail'])
+            nics.append(tmpif)
+        # get PCI addresses of all interfaces at once
+        details = self.run_vppctl_batch([['show', 'hardware', tmpif[1], 'detail']
+                                         for tmpif in nics])
+        for (tmpif, output) in zip(nics, details):
             lines = output[0].split('\n')
-            #match = re.search(r'pci address:\s*([\d:\.]+)', output[0])
             match = ''
             for line in lines:
                 if "pci:" in line:
@@ -117,14 +136,11 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
             if match:
                 # normalize PCI address, e.g. 0000:05:10.01 => 0000:05:10.1
                 tmp_pci = match.split('.')
-                # tmp_pci = match.group(1).split('.')
                 tmp_pci[1] = str(int(tmp_pci[1]))
                 tmpif.append('.'.join(tmp_pci))
             else:
                 tmpif.append(None)
-            # store only NICs with reasonable index
-            if tmpif[keyidx] is not None:
-                result[tmpif[keyidx]] = dict(zip(keys, tmpif))
+            result.append(dict(zip(keys, tmpif)))
 
         return result
 
@@ -147,20 +163,33 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
 
         :raises: pexpect.EOF, pexpect.TIMEOUT
         """
-        dpdk.init()
+        self._startup_timings = {}
+        deadline = time.time() + S.getValue('VSWITCH_STARTUP_TIMEOUT')
+        with self._startup_phase('init'):
+            dpdk.init()
         self._logger.info("Starting VPP...")
 
         self._cmd = self._cmd_template + self._vswitch_args
 
-        try:
-            tasks.Process.start(self)
-            self.relinquish()
-        except (pexpect.EOF, pexpect.TIMEOUT) as exc:
-            self._logger.error("Exception during VPP start.")
-            raise exc
+        with self._startup_phase('vpp'):
+            try:
+                tasks.Process.start(self)
+                self.relinquish()
+            except (pexpect.EOF, pexpect.TIMEOUT) as exc:
+                self._logger.error("Exception during VPP start.")
+                raise exc
+            if not tasks.wait_for(self._is_vpp_ready, deadline, self._logger, 'VPP'):
+                self.kill()
+                raise RuntimeError('VPP has not started in time')
 
         self._logger.info("VPP...Started.")
 
+    def _is_vpp_ready(self):
+        """Readiness probe of VPP; its CLI must respond to ``show version``
+        """
+        output = tasks.run_probe(self._vpp_ctl + ['show', 'version'], timeout=2)
+        return output is not None and output.startswith('vpp')
+
     def stop(self):
         """See IVswitch for general description
 
@@ -170,6 +199,7 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
         self.kill()
         self._logger.info("VPP...Terminated.")
         dpdk.cleanup()
+        self._nic_info = None
 
     def kill(self, signal='-15', sleep=10):
         """See IVswitch for general description
@@ -188,6 +218,11 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
             # has not been terminated yet
             tasks.Process.kill(self, signal, sleep)
 
+        if self._cli:
+            self._cli.close()
+            self._cli = None
+        self._cli_failed = False
+
     def get_version(self):
         """See IVswitch for general description
         """
@@ -257,6 +292,7 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
         if output[0].find('returned') >= 0:
             raise RuntimeError('VPP VhostUser interface cannot be created.')
         nic_name = output[0].strip()
+        self._nic_info = None
         self._virt_ports.append(nic_name)
         self.run_vppctl(['set', 'int', 'state', nic_name, 'up'])
         return (nic_name, None)
@@ -270,6 +306,7 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
         elif port_name in self._virt_ports:
             self.run_vppctl(['set', 'int', 'state', port_name, 'down'])
             self.run_vppctl(['delete', 'vhost-user', port_name])
+            self._nic_info = None
             self._virt_ports.remove(port_name)
         else:
             self._logger.warning("Port %s is not configured.", port_name)
@@ -287,10 +324,8 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
     def add_bridge(self, switch_name, port1, port2):
         """Add given ports to bridge ``switch_name``
         """
-        self.run_vppctl(['set', 'interface', 'l2', 'bridge', port1,
-                         str(self._switches[switch_name])])
-        self.run_vppctl(['set', 'interface', 'l2', 'bridge', port2,
-                         str(self._switches[switch_name])])
+        self.run_vppctl_batch([['set', 'interface', 'l2', 'bridge', port,
+                                str(self._switches[switch_name])] for port in (port1, port2)])
 
     def add_connection(self, switch_name, port1, port2, traffic=None):
         """See IVswitch for general description
@@ -321,14 +356,12 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
     def del_xconnect(self, port1, port2):
         """Remove xconnect connection between given ports
         """
-        self.run_vppctl(['set', 'interface', 'l3', port1])
-        self.run_vppctl(['set', 'interface', 'l3', port2])
+        self.run_vppctl_batch([['set', 'interface', 'l3', port] for port in (port1, port2)])
 
     def del_bridge(self, _dummy_switch_name, port1, port2):
         """Remove given ports from the bridge
         """
-        self.run_vppctl(['set', 'interface', 'l3', port1])
-        self.run_vppctl(['set', 'interface', 'l3', port2])
+        self.run_vppctl_batch([['set', 'interface', 'l3', port] for port in (port1, port2)])
 
     def del_connection(self, switch_name, port1=None, port2=None):
         """See IVswitch for general description
@@ -381,13 +414,64 @@ class VppDpdkVhost(IVSwitch, tasks.Process):
     def run_vppctl(self, args, check_error=False):
         """Run ``vppctl`` with supplied arguments.
 
+        Command is executed by persistent CLI session if it is enabled
+        by VSWITCH_VPP_CLI_SESSION.
+
         :param args: Arguments to pass to ``vppctl``
         :param check_error: Throw exception on error
 
-        :return: None
+        :return: (stdout, stderr)
         """
-        cmd = self._vpp_ctl + args
-        return tasks.run_task(cmd, self._logger, 'Running vppctl...', check_error)
+        return self.run_vppctl_batch([args], check_error)[0]
+
+    def run_vppctl_batch(self, commands, check_error=False):
+        """Run several ``vppctl`` commands.
+
+        Commands are pipelined by persistent CLI session if it is enabled
+        by VSWITCH_VPP_CLI_SESSION. Otherwise ``vppctl`` is executed for
+        every command. If CLI session fails, then ``vppctl`` is executed
+        only for commands, whose output was not received, so commands
+        already executed by VPP are not repeated.
+
+        :param commands: List of commands, i.e. lists of ``vppctl`` arguments
+        :param check_error: Throw exception on error
+
+        :return: List of (stdout, stderr) tuples
+        """
+        results = []
+        cli = self._get_cli()
+        if cli:
+            try:
+                self._logger.debug('Running vppctl by CLI session: %s',
+                                   '; '.join(' '.join(args) for args in commands))
+                return [(output.strip(), '') for output in
+                        cli.execute_batch([' '.join(args) for args in commands])]
+            except (OSError, VppCliError) as exc:
+                self._logger.warning('VPP CLI session has failed, vppctl will be used: %s', exc)
+                self._cli = None
+                self._cli_failed = True
+                results = [(output.strip(), '') for output in getattr(exc, 'outputs', [])]
+        return results + [tasks.run_task(self._vpp_ctl + args, self._logger, 'Running vppctl...',
+                                         check_error) for args in commands[len(results):]]
+
+    def _get_cli(self):
+        """Return persistent CLI session; it is connected on the first call
+
+        :return: Instance of :class VppCli: or None if session is not available
+        """
+        if self._cli or self._cli_failed:
+            return self._cli
+        if not S.getValue('VSWITCH_VPP_CLI_SESSION') or not S.getValue('VSWITCH_VPP_CLI_SOCK'):
+            return None
+        cli = VppCli(S.getValue('VSWITCH_VPP_CLI_SOCK'))
+        try:
+            cli.connect()
+        except (OSError, VppCliError) as exc:
+            self._logger.warning('VPP CLI session is not available, vppctl will be used: %s', exc)
+            self._cli_failed = True
+            return None
+        self._cli = cli
+        return cli
 
     #
     # Validate methods
@@ -15,6 +15,8 @@
 """Generic interface VSPERF uses for controlling a vSwitch
 """
 import logging
+import contextlib
+import time
 
 class IVSwitch(object):
     """Interface class that is implemented by vSwitch-specific classes
@@ -30,6 +32,7 @@ class IVSwitch(object):
         self._cmd = []
         self._vswitch_args = []
         self._stamp = None
+        self._startup_timings = {}
 
     def get_version(self):
         """Return version of vSwitch and DPDK (if used by vSwitch)
@@ -62,6 +65,89 @@ class IVSwitch(object):
         """
         raise NotImplementedError()
 
+    def get_startup_timings(self):
+        """Return durations of vSwitch startup phases
+
+        :returns: Dictionary with phase names as keys and durations
+            in seconds as values; it is empty if timings are not measured
+        """
+        return dict(self._startup_timings)
+
+    @contextlib.contextmanager
+    def _startup_phase(self, phase):
+        """Context manager measuring duration of vSwitch startup phase
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._startup_timings[phase] = time.time() - start
+
+    def get_warm_signature(self):
+        """Return description of configuration, which must not change
+        to allow reuse of vSwitch processes by the next testcase
+
+        vSwitch supporting reuse keeps its processes running after stop()
+        if VSWITCH_KEEP_WARM is enabled and the same instance is used by
+        the next testcase, see can_reuse_warm(). Signature must cover all
+        settings cached by the instance.
+
+        :returns: Comparable object or None if reuse is not supported
+        """
+        return None
+
+    def is_warm(self):
+        """Check if vSwitch processes were kept running by stop()
+        """
+        return False
+
+    def can_reuse_warm(self):
+        """Check if vSwitch processes kept running by stop() can be reused
+        with the current configuration
+
+        vSwitch instance is used by the next testcase only if this check
+        passes. Otherwise its processes are terminated and a new instance
+        is created, so settings cached by the instance are not reused.
+        """
+        return False
+
+    def terminate(self):
+        """Terminate vSwitch processes kept running by stop()
+        """
+        pass
+
+    def get_rxq_layouts(self):
+        """Return names of rxq to PMD thread layouts supported by vSwitch
+
+        :returns: List of layout names; empty list if vSwitch does not
+            support selection of rxq layout
+        """
+        return []
+
+    def set_rxq_layout(self, layout):
+        """Assign rxqs to PMD threads according to given layout
+
+        :param layout: Name of layout returned by get_rxq_layouts()
+
+        :returns: Actual assignment of rxqs as accepted by set_rxq_mapping()
+            or None if the layout can't be applied
+        """
+        raise NotImplementedError()
+
+    def set_rxq_mapping(self, rxq_map):
+        """Assign rxqs to PMD threads explicitly
+
+        :param rxq_map: Assignment of rxqs returned by set_rxq_layout()
+        """
+        raise NotImplementedError()
+
+    def get_rxq_mapping(self):
+        """Return actual assignment of rxqs to PMD threads
+
+        :returns: Human readable description of rxq assignment
+        """
+        return ''
+
     def add_switch(self, switch_name, params):
         """Create a new logical switch with no ports
 
@@ -80,6 +166,31 @@ class IVSwitch(object):
         """
         raise NotImplementedError()
 
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager grouping vSwitch configuration changes
+
+        vSwitch implementation can postpone port and switch attribute
+        changes made inside the context and apply them all at once at
+        its exit. Port numbers returned by add_*_port() methods inside
+        the context are provisional; get_ports() returns valid numbers
+        after the exit. Default implementation applies every change
+        immediately.
+        """
+        yield
+
+    @contextlib.contextmanager
+    def reconcile_connections(self):
+        """Context manager for incremental setup of connections
+
+        vSwitch implementation can collect connections added by
+        add_connection() inside the context and at its exit install
+        only those, which are not configured yet, and remove those
+        configured by previous context, which are not listed anymore.
+        Default implementation adds every connection immediately.
+        """
+        yield
+
     def add_phy_port(self, switch_name):
         """Create a new port to the logical switch that is attached to a
         physical port